@@ -1,17 +1,16 @@
 # app/__init__.py
 
+import math
 import os
-from flask import Flask, render_template
+import time
+from importlib import import_module
+from flask import Flask, render_template, request
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from dotenv import load_dotenv
 from decimal import Decimal
-
-# Carrega variáveis do arquivo .env se existir
-load_dotenv()
+from config import Config
 
 MONTHS_PT_BR = [
     "", "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
@@ -32,67 +31,116 @@ def format_currency(value):
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-app = Flask(__name__)
-
-# CONFIGURAÇÃO DE SEGURANÇA
-# Tenta pegar do sistema (.env), se não tiver, usa fallback (APENAS PARA DEV)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:////data/app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Blueprints sempre ativos (o layout base depende deles) e opcionais (ligados via ENABLED_BLUEPRINTS)
+CORE_BLUEPRINTS = ['auth', 'sessions', 'finance', 'events', 'audit']
+OPTIONAL_BLUEPRINTS = ['config', 'kanban', 'goals', 'crm', 'reports', 'api']
 
-# Configura Filtros Jinja
-app.jinja_env.filters['currency'] = format_currency
-
-# INICIALIZAÇÃO DAS EXTENSÕES
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login = LoginManager(app)
+# INICIALIZAÇÃO DAS EXTENSÕES (vinculadas à aplicação em create_app)
+# A sessão roteia os SELECTs de rotas @read_only para a engine de leitura (app/read_routing.py)
+from app.read_routing import RoutingSession, ReadRouter  # noqa: E402
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+login = LoginManager()
 login.login_view = 'auth.login'
 login.login_message = "Por favor, faça login para acessar esta página."
 
 # CONFIGURAÇÃO DO FLASK-LIMITER (Rate Limiting)
+# O armazenamento vem de RATELIMIT_STORAGE_URI (config.py); importar o módulo registra o esquema "sqlite://"
+from app import ratelimit_storage  # noqa: E402,F401
+from app import metrics  # noqa: E402
 limiter = Limiter(
     get_remote_address,
-    app=app,
-    default_limits=["2000 per day", "500 per hour"], # Limite geral para rotas não decoradas
-    storage_uri="memory://" # Armazena em memória (bom para SQLite/Dev). Use Redis em produção.
+    default_limits=["2000 per day", "500 per hour"] # Limite geral para rotas não decoradas
 )
 
 # MANIPULADOR DE ERRO 429 (BLOQUEIO) INTELIGENTE
-@app.errorhandler(429)
 def ratelimit_handler(e):
     """
-    Captura o erro de limite excedido e calcula o tempo de espera para o countdown do frontend.
+    Captura o erro de limite excedido e calcula o tempo de espera para o countdown do frontend
+    a partir da janela do limite que bloqueou a requisição (instante exato de reinício do contador).
     """
-    description = str(e.description).lower()
     wait_seconds = 60 # Valor padrão de segurança (1 minuto)
-    
-    # Tenta deduzir o tempo baseado na string do erro (ex: "10 per 1 minute")
-    if "day" in description:
-        wait_seconds = 86400 # 1 dia
-    elif "hour" in description:
-        wait_seconds = 3600 # 1 hora
-    elif "minute" in description:
-        wait_seconds = 60 # 1 minuto
-    elif "second" in description:
-        wait_seconds = 10 # 10 segundos
+
+    current = limiter.current_limit
+    if current is not None:
+        wait_seconds = max(1, math.ceil(current.window.reset_time - time.time()))
+    elif getattr(e, 'limit', None) is not None:
+        wait_seconds = e.limit.limit.get_expiry()
+
+    metrics.record_ratelimit_rejection(request.endpoint, getattr(getattr(e, 'limit', None), 'limit', ''))
 
     # Passa a variável wait_seconds para o template calcular o countdown
-    return render_template('429.html', error=e, wait_seconds=wait_seconds), 429
-
-# REGISTRO DOS BLUEPRINTS
-# Importa os módulos apenas após inicializar as extensões para evitar ciclos
-from app.blueprints import auth, sessions, finance # Importa blueprints ativos
-# from app.blueprints import config, kanban, goals, crm, reports # Comenta blueprints desativados
-
-app.register_blueprint(auth.bp)
-app.register_blueprint(sessions.bp)
-# app.register_blueprint(config.bp) # Comenta blueprint desativado
-app.register_blueprint(finance.bp)
-# app.register_blueprint(kanban.bp) # Comenta blueprint desativado
-# app.register_blueprint(goals.bp) # Comenta blueprint desativado
-# app.register_blueprint(crm.bp) # Comenta blueprint desativado
-# app.register_blueprint(reports.bp) # Comenta blueprint desativado
-
-# IMPORTA MODELOS PARA O CONTEXTO DO SHELL E MIGRAÇÕES
-from app import models
\ No newline at end of file
+    return render_template('429.html', error=e, wait_seconds=wait_seconds), 429, {'Retry-After': str(wait_seconds)}
+
+def create_app(config=Config):
+    """
+    Fábrica da aplicação. `config` pode ser uma classe/objeto de configuração ou um dicionário
+    com sobrescritas aplicadas sobre Config (útil para testes e benchmarks isolados).
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not Config:
+        app.config.from_object(config)
+
+    # Configura Filtros Jinja
+    app.jinja_env.filters['currency'] = format_currency
+
+    db.init_app(app)
+    with app.app_context():
+        ReadRouter().init_app(app, db.engine)
+    login.init_app(app)
+    limiter.init_app(app)
+
+    # O Alembic é pesado: só carrega o Flask-Migrate para a CLI (ou se pedido explicitamente)
+    enable_migrations = app.config.get('ENABLE_MIGRATIONS')
+    if enable_migrations is None:
+        enable_migrations = bool(os.environ.get('FLASK_RUN_FROM_CLI'))
+    if enable_migrations:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    app.register_error_handler(429, ratelimit_handler)
+
+    # COMPRESSÃO E ARQUIVOS ESTÁTICOS VERSIONADOS (flask assets-build)
+    from app import assets
+    assets.init_app(app)
+
+    # INSTRUMENTAÇÃO DE DESEMPENHO (desligada com PERF_INSTRUMENTATION=0)
+    from app.instrumentation import monitor
+    monitor.init_app(app)
+    if monitor.enabled and app.config.get('METRICS_ENABLED'):
+        metrics.init_app(app, monitor)
+
+    # VÁRIOS ESTÚDIOS: estúdio da requisição e filtro automático por tenant_id nas consultas do ORM
+    from app import tenancy
+    tenancy.init_app(app)
+
+    # IMPORTA MODELOS E REGISTRA OS EVENTOS (índice de saldo do livro-caixa, totais das metas, canal de alterações SSE,
+    # versões do cache HTTP e trilha de auditoria)
+    from app import models, ledger_service, goal_service, change_events, http_cache, audit
+    app.cli.add_command(ledger_service.ledger_rebuild_command)
+    app.cli.add_command(goal_service.goals_check_command)
+    from app import client_analytics
+    app.cli.add_command(client_analytics.clients_analytics_command)
+    from app import backup
+    app.cli.add_command(backup.backup_command)
+    # ARQUIVO E LIXEIRA (engine de leitura com o histórico arquivado, ?arquivo=1)
+    from app import archive
+    archive.init_app(app)
+    app.cli.add_command(archive.archive_command)
+
+    # REGISTRO DOS BLUEPRINTS
+    # Importa os módulos apenas após inicializar as extensões para evitar ciclos;
+    # blueprints opcionais desabilitados não são importados
+    requested = app.config.get('ENABLED_BLUEPRINTS') or []
+    if isinstance(requested, str):
+        requested = [name.strip() for name in requested.split(',')]
+    enabled = CORE_BLUEPRINTS + [name for name in OPTIONAL_BLUEPRINTS if name in requested]
+    app.config['ENABLED_BLUEPRINTS'] = enabled
+    if monitor.enabled:
+        enabled = enabled + ['monitoring']
+    for name in enabled:
+        app.register_blueprint(import_module(f'app.blueprints.{name}').bp)
+
+    return app
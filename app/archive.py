@@ -0,0 +1,334 @@
+# app/archive.py
+"""
+Arquivo (anos fechados) e lixeira de ensaios e lançamentos, nas tabelas session_archive e transaction_archive.
+
+- Arquivo: `flask archive run` move os ensaios na última etapa (KANBAN_STAGES[-1]) anteriores ao corte, com todos
+  os seus lançamentos, e os lançamentos efetivados avulsos anteriores ao corte (exceto os ligados a metas).
+  INSERT ... SELECT + DELETE na mesma transação. O índice de saldo (DailyBalance) continua contando o arquivado.
+- Lixeira: excluir um ensaio ou lançamento copia as linhas para o arquivo com deleted_at e as remove da tabela
+  quente (saldo, eventos e auditoria como numa exclusão). Restaurar devolve as linhas com os ids originais
+  (AUTOINCREMENT: nunca reaproveitados); `flask archive purge` apaga o que passou de ARCHIVE_TRASH_DAYS.
+- Leitura: as tabelas quentes só guardam dados ativos, então as varreduras acompanham o volume ativo.
+  Relatórios e listagens com ?arquivo=1 usam uma engine somente leitura em que "session" e "transaction" são
+  views TEMP (tabela quente UNION ALL arquivo, sem a lixeira) que sombreiam as tabelas: as mesmas consultas,
+  sem alteração, enxergam o histórico inteiro. No código, ArchiveService.union(Model) dá a mesma união.
+"""
+from datetime import date, datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+import sqlalchemy as sa
+from sqlalchemy import func
+from app import db
+from app.models import (Client, GoalContribution, Session, SessionArchive, SessionType, Transaction,
+                        TransactionArchive, KANBAN_STAGES)
+from app.audit import record_bulk
+from app.backup import sqlite_path
+from app.http_cache import mark_tables_changed
+from app.session_service import SessionBulkService
+from app.tenancy import for_each_tenant, require_tenant_id, tenant_filter, tenant_option
+
+ARCHIVE_STAGE = KANBAN_STAGES[-1]
+
+# Tabela quente -> tabela de arquivo
+ARCHIVES = {Session: SessionArchive, Transaction: TransactionArchive}
+ARCHIVE_TABLE_NAMES = tuple(archive.name for archive in ARCHIVES.values())
+
+TRASH_LIMIT = 200
+
+class ArchiveError(Exception):
+    pass
+
+def _columns(model):
+    return [column.name for column in model.__table__.columns]
+
+def union_view_statements(dialect):
+    """DDL das views TEMP que sombreiam as tabelas quentes com a união quente + arquivo (engine de ?arquivo=1)."""
+    quote = dialect.identifier_preparer.quote
+    for model, archive in ARCHIVES.items():
+        columns = ', '.join(quote(name) for name in _columns(model))
+        table = quote(model.__table__.name)
+        yield (f'CREATE TEMP VIEW IF NOT EXISTS {table} AS '
+               f'SELECT {columns} FROM main.{table} UNION ALL '
+               f'SELECT {columns} FROM main.{quote(archive.name)} WHERE deleted_at IS NULL')
+
+def init_app(app):
+    """Cria a engine de leitura com as views de união e a entrega ao ReadRouter (rotas @read_only/@archive_readable)."""
+    router = app.extensions.get('read_router')
+    if router is None or router.mode == 'replica':
+        return  # réplica em outro backend: ?arquivo=1 é ignorado
+    snapshot = router.mode == 'snapshot'
+    path = router.snapshot_path if snapshot else sqlite_path(app.config['SQLALCHEMY_DATABASE_URI'])
+    if not path:
+        return
+    options = {'poolclass': sa.pool.NullPool} if snapshot else {}
+    engine = sa.create_engine(f'sqlite:///file:{path}?mode=ro&uri=true', **options)
+
+    @sa.event.listens_for(engine, 'connect')
+    def _union_views(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in union_view_statements(engine.dialect):
+            cursor.execute(statement)
+        cursor.close()
+
+    router.archive_engine = engine
+
+class ArchiveService:
+
+    @staticmethod
+    def union(model, include_deleted=False):
+        """Entidade com as linhas quentes e arquivadas de `model` (UNION ALL), para consultas que precisam do histórico."""
+        table, archive = model.__table__, ARCHIVES[model]
+        archived = sa.select(*[archive.c[name] for name in _columns(model)]).where(tenant_filter(archive))
+        if not include_deleted:
+            archived = archived.where(archive.c.deleted_at.is_(None))
+        active = sa.select(*table.columns).where(tenant_filter(table))
+        union = sa.union_all(active, archived).subquery(f'{table.name}_all')
+        return sa.orm.aliased(model, union)
+
+    @staticmethod
+    def archived_ids(model, ids):
+        """Quais dos ids (de uma listagem com ?arquivo=1) vêm do arquivo."""
+        if not ids:
+            return set()
+        archive = ARCHIVES[model]
+        return set(db.session.scalars(
+            sa.select(archive.c.id).where(tenant_filter(archive), archive.c.id.in_(ids), archive.c.deleted_at.is_(None))
+        ).all())
+
+    # ARQUIVO DE ANOS FECHADOS
+    @staticmethod
+    def default_cutoff(today=None):
+        """Primeiro dia do ano mais antigo mantido na tabela quente (ARCHIVE_KEEP_YEARS anos fechados + o atual)."""
+        today = today or date.today()
+        return date(today.year - current_app.config.get('ARCHIVE_KEEP_YEARS', 1), 1, 1)
+
+    @staticmethod
+    def _eligible(cutoff):
+        """Condições (ensaios, lançamentos) do que vai para o arquivo com o corte `cutoff`, no estúdio atual."""
+        tenant_id = require_tenant_id()
+        sessions = sa.and_(Session.tenant_id == tenant_id, Session.kanban_status == ARCHIVE_STAGE,
+                           Session.session_date < cutoff)
+        linked_to_goal = sa.exists().where(GoalContribution.transaction_id == Transaction.id)
+        transactions = sa.and_(Transaction.tenant_id == tenant_id, sa.or_(
+            Transaction.session_id.in_(sa.select(Session.id).where(sessions)),
+            sa.and_(Transaction.session_id.is_(None), Transaction.transaction_date < cutoff,
+                    Transaction.status == 'efetivado', ~linked_to_goal),
+        ))
+        return sessions, transactions
+
+    @staticmethod
+    def pending(cutoff):
+        """Quantos ensaios e lançamentos o arquivamento com esse corte moveria."""
+        sessions, transactions = ArchiveService._eligible(cutoff)
+        return (db.session.scalar(sa.select(func.count(Session.id)).where(sessions)),
+                db.session.scalar(sa.select(func.count(Transaction.id)).where(transactions)))
+
+    @staticmethod
+    def archive_before(cutoff):
+        """
+        Move para o arquivo o que estiver fechado antes de `cutoff`. Lançamentos primeiro: a condição deles
+        depende dos ensaios ainda estarem na tabela quente. Retorna (ensaios, lançamentos) movidos.
+        """
+        now = datetime.utcnow()
+        sessions, transactions = ArchiveService._eligible(cutoff)
+        moved = {}
+        for model, condition in ((Transaction, transactions), (Session, sessions)):
+            table, archive = model.__table__, ARCHIVES[model]
+            db.session.execute(sa.insert(archive).from_select(
+                _columns(model) + ['archived_at'],
+                sa.select(*table.columns, sa.literal(now, sa.DateTime)).where(condition),
+            ))
+            moved[model] = db.session.execute(sa.delete(table).where(condition)).rowcount
+        if moved[Session] or moved[Transaction]:
+            mark_tables_changed(db.session, 'session', 'transaction', *ARCHIVE_TABLE_NAMES)
+        return moved[Session], moved[Transaction]
+
+    # LIXEIRA
+    @staticmethod
+    def _copy_to_trash(model, rows, now):
+        db.session.execute(sa.insert(ARCHIVES[model]), [
+            {**row, 'archived_at': now, 'deleted_at': now} for row in rows
+        ])
+        record_bulk(db.session, model, rows, 'delete')
+
+    @staticmethod
+    def trash_sessions(session_ids):
+        """Exclusão de ensaios (e seus lançamentos) pela lixeira. Retorna o número de ensaios excluídos."""
+        now = datetime.utcnow()
+        session_table, transaction_table = Session.__table__, Transaction.__table__
+        sessions = db.session.execute(
+            sa.select(session_table).where(tenant_filter(session_table), session_table.c.id.in_(session_ids))
+        ).mappings().all()
+        if not sessions:
+            return 0
+        ids = [row['id'] for row in sessions]
+        transactions = db.session.execute(
+            sa.select(transaction_table).where(tenant_filter(transaction_table), transaction_table.c.session_id.in_(ids))
+        ).mappings().all()
+        ArchiveService._copy_to_trash(Session, sessions, now)
+        if transactions:
+            ArchiveService._copy_to_trash(Transaction, transactions, now)
+        mark_tables_changed(db.session, *ARCHIVE_TABLE_NAMES)
+        # Remoção das tabelas quentes já corrige o índice de saldo e avisa o canal de alterações
+        return SessionBulkService.delete(ids)
+
+    @staticmethod
+    def trash_transaction(transaction):
+        """Exclusão de um lançamento pela lixeira (a remoção passa pelo ORM: saldo, eventos e auditoria)."""
+        now = datetime.utcnow()
+        row = {column.name: getattr(transaction, column.key) for column in sa.inspect(Transaction).columns}
+        db.session.execute(sa.insert(TransactionArchive), [{**row, 'archived_at': now, 'deleted_at': now}])
+        db.session.delete(transaction)
+        mark_tables_changed(db.session, TransactionArchive.name)
+
+    @staticmethod
+    def trash():
+        """Itens da lixeira: ensaios excluídos (com o nº de lançamentos) e lançamentos excluídos avulsos."""
+        sessions, transactions = SessionArchive, TransactionArchive
+        deleted_sessions = sa.select(sessions.c.id).where(tenant_filter(sessions), sessions.c.deleted_at.isnot(None))
+        transaction_count = (
+            sa.select(func.count(transactions.c.id))
+            .where(transactions.c.session_id == sessions.c.id, transactions.c.deleted_at.isnot(None))
+            .scalar_subquery()
+        )
+        session_rows = db.session.execute(
+            sa.select(sessions, Client.name.label('client_name'), SessionType.name.label('session_type_name'),
+                      transaction_count.label('transaction_count'))
+            .outerjoin(Client, Client.id == sessions.c.client_id)
+            .outerjoin(SessionType, SessionType.id == sessions.c.session_type_id)
+            .where(tenant_filter(sessions), sessions.c.deleted_at.isnot(None))
+            .order_by(sessions.c.deleted_at.desc(), sessions.c.id.desc())
+            .limit(TRASH_LIMIT)
+        ).all()
+        transaction_rows = db.session.execute(
+            sa.select(transactions)
+            .where(tenant_filter(transactions), transactions.c.deleted_at.isnot(None),
+                   sa.or_(transactions.c.session_id.is_(None), transactions.c.session_id.not_in(deleted_sessions)))
+            .order_by(transactions.c.deleted_at.desc(), transactions.c.id.desc())
+            .limit(TRASH_LIMIT)
+        ).all()
+        return session_rows, transaction_rows
+
+    @staticmethod
+    def _restore_rows(model, rows):
+        """Reinsere pelo ORM (com os ids originais): saldo, eventos e auditoria tratam como criação."""
+        columns = sa.inspect(model).columns
+        objects = [model(**{column.key: row[column.name] for column in columns}) for row in rows]
+        db.session.add_all(objects)
+        archive = ARCHIVES[model]
+        db.session.execute(sa.delete(archive).where(tenant_filter(archive), archive.c.id.in_([row['id'] for row in rows])))
+        return objects
+
+    @staticmethod
+    def restore_session(session_id):
+        """Devolve um ensaio da lixeira, com os lançamentos excluídos junto. Retorna o ensaio."""
+        sessions, transactions = SessionArchive, TransactionArchive
+        row = db.session.execute(
+            sa.select(sessions).where(tenant_filter(sessions), sessions.c.id == session_id, sessions.c.deleted_at.isnot(None))
+        ).mappings().first()
+        if row is None:
+            raise ArchiveError('Ensaio não encontrado na lixeira.')
+        if db.session.get(Client, row['client_id']) is None or db.session.get(SessionType, row['session_type_id']) is None:
+            raise ArchiveError('O cliente ou o tipo deste ensaio não existe mais.')
+        linked = db.session.execute(
+            sa.select(transactions).where(tenant_filter(transactions), transactions.c.session_id == session_id,
+                                          transactions.c.deleted_at.isnot(None))
+        ).mappings().all()
+        session, = ArchiveService._restore_rows(Session, [row])
+        # A restauração conta como alteração do ensaio (o INSERT também gera o evento session.created do Kanban)
+        session.updated_at = datetime.utcnow()
+        if linked:
+            db.session.flush()  # o ensaio antes dos lançamentos que apontam para ele
+            ArchiveService._restore_rows(Transaction, linked)
+        mark_tables_changed(db.session, *ARCHIVE_TABLE_NAMES)
+        return session
+
+    @staticmethod
+    def restore_transaction(transaction_id):
+        """Devolve um lançamento avulso da lixeira. Retorna o lançamento."""
+        transactions = TransactionArchive
+        row = db.session.execute(
+            sa.select(transactions).where(tenant_filter(transactions), transactions.c.id == transaction_id,
+                                          transactions.c.deleted_at.isnot(None))
+        ).mappings().first()
+        if row is None:
+            raise ArchiveError('Lançamento não encontrado na lixeira.')
+        if row['session_id'] is not None and db.session.get(Session, row['session_id']) is None:
+            raise ArchiveError('O ensaio deste lançamento foi excluído: restaure o ensaio.')
+        transaction, = ArchiveService._restore_rows(Transaction, [row])
+        mark_tables_changed(db.session, TransactionArchive.name)
+        return transaction
+
+    @staticmethod
+    def purge(days=None):
+        """Apaga de vez os itens da lixeira excluídos há mais de `days` dias (padrão ARCHIVE_TRASH_DAYS; 0 = todos)."""
+        if days is None:
+            days = current_app.config.get('ARCHIVE_TRASH_DAYS', 30)
+        limit = datetime.utcnow() - timedelta(days=days)
+        removed = {}
+        for model, archive in ARCHIVES.items():
+            removed[model] = db.session.execute(
+                sa.delete(archive).where(tenant_filter(archive), archive.c.deleted_at.isnot(None), archive.c.deleted_at <= limit)
+            ).rowcount
+        if any(removed.values()):
+            mark_tables_changed(db.session, *ARCHIVE_TABLE_NAMES)
+        return removed[Session], removed[Transaction]
+
+    @staticmethod
+    def stats():
+        """Linhas ativas, arquivadas e na lixeira por tabela."""
+        result = {}
+        for model, archive in ARCHIVES.items():
+            archived, trashed = db.session.execute(sa.select(
+                func.count(archive.c.id).filter(archive.c.deleted_at.is_(None)),
+                func.count(archive.c.id).filter(archive.c.deleted_at.isnot(None)),
+            ).where(tenant_filter(archive))).one()
+            active = db.session.scalar(sa.select(func.count(model.id)))
+            result[model.__table__.name] = (active, archived, trashed)
+        return result
+
+# CLI: flask archive run|purge|stats
+@click.group('archive')
+def archive_command():
+    """Arquivo de anos fechados e lixeira de ensaios e lançamentos."""
+
+@archive_command.command('run')
+@click.option('--before', 'cutoff', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Data de corte (padrão: 1º de janeiro, mantendo ARCHIVE_KEEP_YEARS anos fechados).')
+@click.option('--dry-run', is_flag=True, help='Só conta o que seria movido.')
+@tenant_option
+@with_appcontext
+def archive_run_command(cutoff, dry_run, tenant_key):
+    """Move ensaios arquivados e lançamentos anteriores ao corte para as tabelas de arquivo."""
+    cutoff = cutoff.date() if cutoff else ArchiveService.default_cutoff()
+    for tenant_id in for_each_tenant(tenant_key):
+        if dry_run:
+            sessions, transactions = ArchiveService.pending(cutoff)
+            click.echo(f'Estúdio #{tenant_id}, antes de {cutoff:%d/%m/%Y}: '
+                       f'{sessions} ensaio(s) e {transactions} lançamento(s) seriam arquivados.')
+            continue
+        sessions, transactions = ArchiveService.archive_before(cutoff)
+        db.session.commit()
+        click.echo(f'Estúdio #{tenant_id}, antes de {cutoff:%d/%m/%Y}: '
+                   f'{sessions} ensaio(s) e {transactions} lançamento(s) arquivados.')
+
+@archive_command.command('purge')
+@click.option('--days', type=int, default=None, help='Idade mínima na lixeira (padrão: ARCHIVE_TRASH_DAYS; 0 = tudo).')
+@tenant_option
+@with_appcontext
+def archive_purge_command(days, tenant_key):
+    """Apaga de vez os itens antigos da lixeira."""
+    for tenant_id in for_each_tenant(tenant_key):
+        sessions, transactions = ArchiveService.purge(days)
+        db.session.commit()
+        click.echo(f'Estúdio #{tenant_id}: {sessions} ensaio(s) e {transactions} lançamento(s) apagados da lixeira.')
+
+@archive_command.command('stats')
+@tenant_option
+@with_appcontext
+def archive_stats_command(tenant_key):
+    """Linhas ativas, arquivadas e na lixeira."""
+    for tenant_id in for_each_tenant(tenant_key):
+        for table, (active, archived, trashed) in ArchiveService.stats().items():
+            click.echo(f'Estúdio #{tenant_id}, {table}: {active} ativos, {archived} arquivados, {trashed} na lixeira')
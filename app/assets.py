@@ -0,0 +1,179 @@
+# app/assets.py
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # Brotli é opcional: sem ele, só gzip
+    brotli = None
+
+# Tipos que valem a pena comprimir (imagens/fontes já são comprimidas)
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'application/javascript', 'text/javascript',
+    'application/json', 'image/svg+xml', 'application/xml',
+}
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+FAR_FUTURE = 31536000 # 1 ano
+
+def init_app(app):
+    """Compressão das respostas, arquivos estáticos versionados/pré-comprimidos e o comando de build."""
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.before_request(_serve_precompressed)
+    app.after_request(_cache_static)
+    if app.config.get('COMPRESS_ENABLED'):
+        app.after_request(_compress_response)
+    app.cli.add_command(assets_build_command)
+
+# COMPRESSÃO DINÂMICA
+def _accepted_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.get('COMPRESS_BROTLI_QUALITY', 5))
+    return gzip.compress(data, compresslevel=config.get('COMPRESS_LEVEL', 6), mtime=0)
+
+def _compress_response(response):
+    """
+    Comprime (brotli ou gzip) respostas de texto acima de COMPRESS_MIN_SIZE.
+    Ignora streams (SSE), arquivos enviados diretamente e respostas já codificadas.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+
+    response.set_data(compress(data, encoding, current_app.config))
+    response.headers['Content-Encoding'] = encoding
+    # A representação comprimida não é idêntica byte a byte: a ETag passa a ser fraca
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# ARQUIVOS ESTÁTICOS VERSIONADOS
+_manifest_cache = {}
+
+def load_manifest():
+    """Mapa 'css/custom.css' -> 'dist/css/custom.<hash>.css' gerado por `flask assets-build`."""
+    path = os.path.join(current_app.static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _manifest_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding='utf-8') as handle:
+            cached = (mtime, json.load(handle))
+        _manifest_cache[path] = cached
+    return cached[1]
+
+def asset_url(filename):
+    """
+    URL de um arquivo estático: a versão com hash no nome (cache de 1 ano) quando o build existe;
+    caso contrário, o arquivo original com ?v=<mtime> para invalidar o cache do navegador.
+    """
+    hashed = load_manifest().get(filename)
+    if hashed:
+        return url_for('static', filename=hashed)
+    try:
+        version = int(os.path.getmtime(os.path.join(current_app.static_folder, filename)))
+    except OSError:
+        version = None
+    return url_for('static', filename=filename, v=version)
+
+def _is_fingerprinted(filename):
+    return filename.startswith(f'{DIST_DIR}/') and not filename.endswith(MANIFEST_NAME)
+
+def _serve_precompressed():
+    """Para arquivos do build, entrega direto a variante .br/.gz gerada pelo assets-build."""
+    if request.endpoint != 'static':
+        return None
+    filename = (request.view_args or {}).get('filename', '')
+    if not _is_fingerprinted(filename):
+        return None
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return None
+    suffix = '.br' if encoding == 'br' else '.gz'
+    if not os.path.isfile(os.path.join(current_app.static_folder, filename + suffix)):
+        return None
+
+    response = send_from_directory(current_app.static_folder, filename + suffix, max_age=FAR_FUTURE)
+    response.headers['Content-Encoding'] = encoding
+    response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    return response
+
+def _cache_static(response):
+    if request.endpoint == 'static':
+        response.vary.add('Accept-Encoding')
+        if _is_fingerprinted((request.view_args or {}).get('filename', '')) and response.status_code == 200:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = FAR_FUTURE
+            response.cache_control.immutable = True
+    return response
+
+# BUILD
+def build_assets(static_folder):
+    """
+    Copia os arquivos estáticos para dist/ com o hash do conteúdo no nome, gera as variantes .gz/.br dos
+    arquivos de texto e grava o manifest.json. Retorna o manifest.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+    manifest = {}
+    for directory, subdirs, files in os.walk(static_folder):
+        subdirs[:] = sorted(name for name in subdirs if os.path.join(directory, name) != dist)
+        for name in sorted(files):
+            source = os.path.join(directory, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as handle:
+                data = handle.read()
+            stem, extension = os.path.splitext(logical)
+            hashed = f'{DIST_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:10]}{extension}'
+            target = os.path.join(static_folder, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as handle:
+                handle.write(data)
+            if extension in COMPRESSIBLE_EXTENSIONS:
+                with open(target + '.gz', 'wb') as handle:
+                    handle.write(gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    with open(target + '.br', 'wb') as handle:
+                        handle.write(brotli.compress(data, quality=11))
+            manifest[logical] = hashed
+    with open(os.path.join(dist, MANIFEST_NAME), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    return manifest
+
+@click.command('assets-build')
+@with_appcontext
+def assets_build_command():
+    """Gera os arquivos estáticos versionados e pré-comprimidos (app/static/dist)."""
+    manifest = build_assets(current_app.static_folder)
+    for logical, hashed in manifest.items():
+        click.echo(f'{logical} -> {hashed}')
+    click.echo(f'{len(manifest)} arquivos processados{"" if brotli else " (brotli indisponível: apenas .gz)"}.')
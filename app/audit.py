@@ -0,0 +1,209 @@
+# app/audit.py
+"""
+Trilha de auditoria de ensaios, lançamentos e metas (AuditLog, somente inserção).
+
+- Captura: os eventos after_insert/after_update/after_delete do mapper guardam em session.info o diff de cada
+  linha (só as colunas alteradas, com valor anterior e novo). Nenhum SQL extra durante o flush.
+- Gravação: no before_commit, todas as linhas da transação vão num único INSERT em lote, na mesma transação
+  dos dados: o commit leva a alteração e a sua auditoria juntas, ou nenhuma das duas.
+- `changes` em JSON compacto, valores como texto:
+  create {"coluna": valor} (não nulos) / update {"coluna": [antes, depois]} / delete {"coluna": valor} (retrato).
+
+Custo medido com `python -m benchmarks.session_save --compare-audit` (AUDIT_ENABLED liga/desliga a captura).
+"""
+import json
+from datetime import datetime, time, timedelta
+from uuid import uuid4
+from flask import current_app, has_app_context, has_request_context, request, session as http_session
+import sqlalchemy as sa
+from app import db
+from app.models import AuditLog, Goal, Session, Transaction, User
+
+# Entidades auditadas -> colunas ignoradas (marcas técnicas e totais derivados de outras tabelas)
+AUDITED = {
+    Session: {'updated_at'},
+    Transaction: set(),
+    Goal: {'saved_total'},
+}
+ENTITY_LABELS = {'session': 'Ensaio', 'transaction': 'Lançamento', 'goal': 'Meta'}
+ACTION_LABELS = {'create': 'Criação', 'update': 'Alteração', 'delete': 'Exclusão'}
+FIELD_LABELS = {
+    'session_code': 'Código', 'session_date': 'Data do ensaio', 'selection_completed_date': 'Seleção concluída',
+    'total_value': 'Valor total', 'down_payment': 'Entrada', 'session_cost': 'Custo',
+    'extra_photos_qty': 'Fotos extras', 'extra_photo_unit_price': 'Preço da foto extra',
+    'printing_qty': 'Impressões', 'printing_unit_price': 'Preço da impressão', 'notes': 'Observações',
+    'kanban_status': 'Etapa', 'client_id': 'Cliente', 'session_type_id': 'Tipo de ensaio',
+    'description': 'Descrição', 'transaction_type': 'Tipo', 'value': 'Valor', 'transaction_date': 'Data',
+    'tags': 'Tags', 'session_id': 'Ensaio', 'recurrence_id': 'Recorrência', 'recurrence_installment': 'Parcela',
+    'status': 'Status', 'category': 'Categoria', 'name': 'Nome', 'target_value': 'Valor alvo', 'target_date': 'Data alvo',
+}
+HISTORY_LIMIT = 200
+
+# mapper -> colunas auditadas, na ordem do modelo (calculado na primeira escrita de cada entidade)
+_columns = {}
+
+def _audited_columns(mapper):
+    columns = _columns.get(mapper)
+    if columns is None:
+        ignored = AUDITED[mapper.class_] | {mapper.primary_key[0].key}
+        columns = _columns[mapper] = tuple(attr.key for attr in mapper.column_attrs if attr.key not in ignored)
+    return columns
+
+def _enabled():
+    return not has_app_context() or current_app.config.get('AUDIT_ENABLED', True)
+
+def _plain(value):
+    """Valor serializável em JSON: Decimal e datas viram texto (str(Decimal) preserva as casas)."""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+def _queue(target, action, changes):
+    session = sa.orm.object_session(target)
+    if session is not None and changes:
+        session.info.setdefault('audit_entries', []).append((target.__tablename__, target.id, action, changes))
+
+def _snapshot(mapper, target):
+    values = sa.inspect(target).dict
+    return {key: _plain(values[key]) for key in _audited_columns(mapper) if values.get(key) is not None}
+
+def record_bulk(session, model, rows, action):
+    """Audita linhas alteradas via Core (sem eventos do ORM): `rows` são mapeamentos coluna -> valor."""
+    if not _enabled():
+        return
+    mapper = sa.inspect(model)
+    names = {attr.key: attr.columns[0].name for attr in mapper.column_attrs}
+    entries = session.info.setdefault('audit_entries', [])
+    for row in rows:
+        changes = {key: _plain(row[names[key]]) for key in _audited_columns(mapper) if row[names[key]] is not None}
+        entries.append((model.__tablename__, row['id'], action, changes))
+
+def record_bulk_update(session, model, before, after):
+    """
+    Audita um UPDATE via Core: `before` e `after` são as linhas (mapeamentos coluna -> valor, com o id)
+    antes e depois da instrução; só as colunas com valor diferente entram no diff.
+    """
+    if not _enabled():
+        return
+    previous = {row['id']: row for row in before}
+    entries = session.info.setdefault('audit_entries', [])
+    for row in after:
+        old = previous.get(row['id'], {})
+        changes = {key: [_plain(old.get(key)), _plain(value)]
+                   for key, value in row.items() if key != 'id' and old.get(key) != value}
+        if changes:
+            entries.append((model.__tablename__, row['id'], 'update', changes))
+
+# CAPTURA VIA EVENTOS DO ORM
+def _created(mapper, connection, target):
+    if _enabled():
+        _queue(target, 'create', _snapshot(mapper, target))
+
+def _updated(mapper, connection, target):
+    if not _enabled():
+        return
+    state = sa.inspect(target)
+    columns = _audited_columns(mapper)
+    changes = {}
+    # committed_state guarda só os atributos modificados: não percorre as colunas intactas
+    for key in state.committed_state:
+        if key not in columns:
+            continue
+        history = state.attrs[key].history
+        if not history.added:
+            continue
+        before = history.deleted[0] if history.deleted else None
+        after = history.added[0]
+        if before != after:  # Decimal('10') == Decimal('10.00'): formulário regravando o mesmo valor
+            changes[key] = [_plain(before), _plain(after)]
+    _queue(target, 'update', changes)
+
+def _deleted(mapper, connection, target):
+    if _enabled():
+        _queue(target, 'delete', _snapshot(mapper, target))
+
+for _model in AUDITED:
+    sa.event.listen(_model, 'after_insert', _created)
+    sa.event.listen(_model, 'after_update', _updated)
+    sa.event.listen(_model, 'after_delete', _deleted)
+
+# GRAVAÇÃO EM LOTE NO COMMIT
+def _request_context():
+    """Usuário (id guardado pelo Flask-Login no cookie de sessão, sem consulta) e rota da alteração."""
+    if not has_request_context():
+        return None, None
+    user_id = http_session.get('_user_id')
+    return (int(user_id) if user_id else None), request.endpoint
+
+@sa.event.listens_for(sa.orm.Session, 'before_commit')
+def _audit_before_commit(session):
+    # As mudanças ainda pendentes só geram seus diffs no flush: adianta o flush do commit (sem pendências, é no-op)
+    session.flush()
+    entries = session.info.pop('audit_entries', None)
+    if not entries:
+        return
+    user_id, origin = _request_context()
+    now = datetime.utcnow()
+    changeset = uuid4().hex
+    session.connection().execute(AuditLog.__table__.insert(), [
+        {'changed_at': now, 'changeset': changeset, 'entity_type': entity_type, 'entity_id': entity_id,
+         'action': action, 'user_id': user_id, 'origin': origin,
+         'changes': json.dumps(changes, separators=(',', ':'), ensure_ascii=False)}
+        for entity_type, entity_id, action, changes in entries
+    ])
+
+@sa.event.listens_for(sa.orm.Session, 'after_rollback')
+def _audit_discard_pending(session):
+    session.info.pop('audit_entries', None)
+
+# CONSULTA
+class AuditService:
+
+    @staticmethod
+    def history(entity_type, entity_id, limit=HISTORY_LIMIT):
+        """Alterações de uma entidade, da mais recente à mais antiga (índice ix_audit_log_entity)."""
+        return db.session.scalars(
+            sa.select(AuditLog)
+            .where(AuditLog.entity_type == entity_type, AuditLog.entity_id == entity_id)
+            .order_by(AuditLog.id.desc())
+            .limit(limit)
+        ).all()
+
+    @staticmethod
+    def entries(start_date, end_date, entity_type=None, limit=HISTORY_LIMIT):
+        """Alterações de um intervalo de datas (índice em changed_at), das mais recentes às mais antigas."""
+        query = (
+            sa.select(AuditLog)
+            .where(AuditLog.changed_at >= datetime.combine(start_date, time.min),
+                   AuditLog.changed_at < datetime.combine(end_date + timedelta(days=1), time.min))
+            .order_by(AuditLog.changed_at.desc(), AuditLog.id.desc())
+            .limit(limit)
+        )
+        if entity_type:
+            query = query.where(AuditLog.entity_type == entity_type)
+        return db.session.scalars(query).all()
+
+    @staticmethod
+    def usernames(entries):
+        ids = {entry.user_id for entry in entries if entry.user_id is not None}
+        if not ids:
+            return {}
+        return dict(db.session.execute(sa.select(User.id, User.username).where(User.id.in_(ids))).all())
+
+    @staticmethod
+    def changes(entry):
+        """Lista (rótulo, antes, depois) de uma linha da auditoria, na ordem das colunas gravadas."""
+        try:
+            values = json.loads(entry.changes)
+        except ValueError:
+            return []
+        result = []
+        for key, value in values.items():
+            label = FIELD_LABELS.get(key, key)
+            if entry.action == 'update':
+                result.append((label, value[0], value[1]))
+            elif entry.action == 'delete':
+                result.append((label, value, None))
+            else:
+                result.append((label, None, value))
+        return result
@@ -0,0 +1,488 @@
+# app/backup.py
+"""
+Backups online do banco SQLite, sem janela de manutenção.
+
+- Cópia: API de backup do SQLite em passos de BACKUP_PAGES_PER_STEP páginas. Entre os passos o lock de leitura
+  é liberado e os escritores seguem; se algum deles gravar no meio, a cópia recomeça do início. O resultado é
+  um retrato consistente do banco no fim da cópia.
+- Verificação: `PRAGMA integrity_check` na cópia antes de comprimir; o SHA-256 do arquivo final vai num
+  arquivo lateral (<backup>.json) junto com tamanho, páginas e revisão do Alembic.
+- Compressão: gzip (BACKUP_COMPRESS_LEVEL).
+- Retenção: o mais recente de cada hora das últimas BACKUP_KEEP_HOURLY horas, de cada dia dos últimos
+  BACKUP_KEEP_DAILY dias e de cada mês dos últimos BACKUP_KEEP_MONTHLY meses; os demais são apagados.
+- Agendamento: `flask backup schedule` num processo próprio (serviço supervisionado ou contêiner auxiliar com o
+  mesmo volume do banco) cria um backup a cada BACKUP_INTERVAL_MINUTES; `flask backup create` num cron faz o mesmo.
+  Nada roda dentro do gunicorn: uma thread no mestre herdaria locks ao fazer fork dos workers.
+- Restauração: `flask backup restore <arquivo>` verifica o backup, guarda um backup "pre-restore" do estado
+  atual e copia o conteúdo para o banco em uso (também pela API de backup, sem trocar o arquivo).
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = 'phatos'
+TIMESTAMP_FORMAT = '%Y%m%dT%H%M%SZ'
+# phatos-20260119T140000Z.db.gz / phatos-20260119T140000Z-pre-restore.db.gz
+BACKUP_PATTERN = re.compile(rf'^{BACKUP_PREFIX}-(\d{{8}}T\d{{6}}Z)(?:-([a-z0-9-]+))?\.db(\.gz)?$')
+CHUNK_SIZE = 1024 * 1024
+
+BackupInfo = namedtuple('BackupInfo', 'path created_at label size sha256 verified')
+
+class BackupError(Exception):
+    pass
+
+def sqlite_path(url):
+    """Caminho do arquivo de um URI SQLite (None para outros backends ou banco em memória)."""
+    url = sa.engine.make_url(url)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return url.database
+
+def copy_database(source_path, target_path, pages=256, sleep=0.005):
+    """
+    Cópia consistente de um banco SQLite em uso pela API de backup, `pages` páginas por passo.
+    Entre os passos o lock é liberado e escritores seguem, mas uma escrita de outra conexão no meio da cópia
+    faz o SQLite recomeçá-la do início (não só as páginas alteradas): com escritas mais frequentes que a
+    duração da cópia, passos maiores (`pages`, -1 = tudo de uma vez) são o que garante que ela termine.
+    A cópia é feita em arquivo temporário e renomeada ao final: leitores nunca veem um arquivo pela metade.
+    """
+    temporary = f'{target_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    source = sqlite3.connect(source_path)
+    try:
+        target = sqlite3.connect(temporary)
+        try:
+            source.backup(target, pages=pages, sleep=sleep)
+            # A cópia herda o modo WAL da origem; como arquivo avulso (aberto só para leitura) fica em DELETE
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+        os.replace(temporary, target_path)
+    finally:
+        source.close()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+def check_integrity(path):
+    """Resultado do PRAGMA integrity_check ('ok' ou a primeira mensagem de erro) e o número de páginas."""
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = connection.execute('PRAGMA integrity_check(1)').fetchone()[0]
+        page_count = connection.execute('PRAGMA page_count').fetchone()[0]
+        try:
+            revision = connection.execute('SELECT version_num FROM alembic_version').fetchone()
+        except sqlite3.DatabaseError:
+            revision = None
+        return result, page_count, revision[0] if revision else None
+    except sqlite3.DatabaseError as e:
+        return str(e), 0, None
+    finally:
+        connection.close()
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _setting(config, name, default):
+    """Lê uma opção de app.config (dicionário) ou da classe Config (atributo)."""
+    if isinstance(config, dict):
+        return config.get(name, default)
+    return getattr(config, name, default)
+
+class BackupManager:
+
+    def __init__(self, database_path, directory, pages_per_step=256, compress_level=6,
+                 keep_hourly=48, keep_daily=30, keep_monthly=12):
+        self.database_path = database_path
+        self.directory = directory
+        self.pages_per_step = pages_per_step
+        self.compress_level = compress_level
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+        self.keep_monthly = keep_monthly
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        path = sqlite_path(_setting(config, 'SQLALCHEMY_DATABASE_URI', ''))
+        if not path:
+            raise BackupError('Backups online exigem SQLALCHEMY_DATABASE_URI apontando para um arquivo SQLite.')
+        return cls(
+            path,
+            _setting(config, 'BACKUP_DIR', None) or os.path.join(os.path.dirname(os.path.abspath(path)), 'backups'),
+            pages_per_step=int(_setting(config, 'BACKUP_PAGES_PER_STEP', 256)),
+            compress_level=int(_setting(config, 'BACKUP_COMPRESS_LEVEL', 6)),
+            keep_hourly=int(_setting(config, 'BACKUP_KEEP_HOURLY', 48)),
+            keep_daily=int(_setting(config, 'BACKUP_KEEP_DAILY', 30)),
+            keep_monthly=int(_setting(config, 'BACKUP_KEEP_MONTHLY', 12)),
+        )
+
+    # CRIAÇÃO
+    def create(self, label=None, prune=True):
+        """Backup online comprimido e verificado. Retorna o BackupInfo do arquivo criado."""
+        if label is not None and not re.fullmatch(r'[a-z0-9-]+', label):
+            raise BackupError(f'Rótulo inválido: {label!r} (use letras minúsculas, números e hífen).')
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            created_at = datetime.now(timezone.utc).replace(microsecond=0)
+            name = f'{BACKUP_PREFIX}-{created_at.strftime(TIMESTAMP_FORMAT)}{"-" + label if label else ""}.db'
+            if self.compress_level:
+                name += '.gz'
+            path = os.path.join(self.directory, name)
+            started = time.perf_counter()
+            with tempfile.TemporaryDirectory(dir=self.directory, prefix='.backup-') as workdir:
+                snapshot = os.path.join(workdir, 'snapshot.db')
+                copy_database(self.database_path, snapshot, pages=self.pages_per_step)
+                integrity, page_count, revision = check_integrity(snapshot)
+                if integrity != 'ok':
+                    raise BackupError(f'Cópia do banco falhou na verificação de integridade: {integrity}')
+                partial = os.path.join(workdir, name)
+                if self.compress_level:
+                    with open(snapshot, 'rb') as source, gzip.open(partial, 'wb', compresslevel=self.compress_level) as target:
+                        shutil.copyfileobj(source, target, CHUNK_SIZE)
+                else:
+                    os.replace(snapshot, partial)
+                sha256 = file_sha256(partial)
+                size = os.path.getsize(partial)
+                os.replace(partial, path)
+            self._write_metadata(path, {
+                'created_at': created_at.isoformat(),
+                'label': label,
+                'sha256': sha256,
+                'size': size,
+                'page_count': page_count,
+                'alembic_revision': revision,
+                'integrity': integrity,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            })
+            logger.info('Backup %s criado (%d bytes, %d páginas)', name, size, page_count)
+        if prune:
+            self.prune()
+        return BackupInfo(path, created_at, label, size, sha256, True)
+
+    @staticmethod
+    def _metadata_path(path):
+        return f'{path}.json'
+
+    def _write_metadata(self, path, metadata):
+        temporary = f'{self._metadata_path(path)}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            json.dump(metadata, handle, indent=2)
+        os.replace(temporary, self._metadata_path(path))
+
+    def _read_metadata(self, path):
+        try:
+            with open(self._metadata_path(path), encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    # CONSULTA
+    def list(self):
+        """Backups do diretório, do mais recente ao mais antigo."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        backups = []
+        for name in names:
+            match = BACKUP_PATTERN.match(name)
+            if not match:
+                continue
+            path = os.path.join(self.directory, name)
+            metadata = self._read_metadata(path)
+            created_at = datetime.strptime(match.group(1), TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+            backups.append(BackupInfo(path, created_at, match.group(2), os.path.getsize(path),
+                                      metadata.get('sha256'), metadata.get('integrity') == 'ok'))
+        backups.sort(key=lambda item: item.created_at, reverse=True)
+        return backups
+
+    def latest(self):
+        backups = self.list()
+        return backups[0] if backups else None
+
+    def resolve(self, name):
+        """Aceita o caminho completo ou só o nome do arquivo dentro de BACKUP_DIR."""
+        if os.path.exists(name):
+            return name
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            return path
+        raise BackupError(f'Backup não encontrado: {name}')
+
+    # VERIFICAÇÃO
+    def _extract(self, path, target):
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rb') as source, open(target, 'wb') as handle:
+                shutil.copyfileobj(source, handle, CHUNK_SIZE)
+        else:
+            shutil.copyfile(path, target)
+
+    def verify(self, path):
+        """
+        Confere o SHA-256 registrado, a descompressão e o PRAGMA integrity_check do banco contido.
+        Retorna uma lista de problemas (vazia = backup íntegro).
+        """
+        problems = []
+        expected = self._read_metadata(path).get('sha256')
+        if expected is None:
+            problems.append('sem arquivo de metadados (.json): checksum não conferido')
+        elif file_sha256(path) != expected:
+            return ['checksum SHA-256 não confere com o registrado']
+        with tempfile.TemporaryDirectory(dir=self.directory, prefix='.verify-') as workdir:
+            database = os.path.join(workdir, 'verify.db')
+            try:
+                self._extract(path, database)
+            except (OSError, EOFError, gzip.BadGzipFile) as e:
+                return problems + [f'falha ao descomprimir: {e}']
+            integrity, _, _ = check_integrity(database)
+            if integrity != 'ok':
+                problems.append(f'integrity_check: {integrity}')
+        return problems
+
+    # RETENÇÃO
+    def retained(self, backups, now=None):
+        """Caminhos mantidos pela política de retenção (o mais recente de cada hora/dia/mês das janelas, e os com rótulo)."""
+        now = now or datetime.now(timezone.utc)
+        keep = set()
+        if backups:
+            keep.add(backups[0].path)  # o último nunca sai
+        windows = (
+            (self.keep_hourly, 3600, lambda moment: moment.strftime('%Y%m%d%H')),
+            (self.keep_daily, 86400, lambda moment: moment.strftime('%Y%m%d')),
+            (self.keep_monthly, 31 * 86400, lambda moment: moment.strftime('%Y%m')),
+        )
+        for backup in backups:
+            # Backups com rótulo (manuais, "pre-restore") não disputam o balde da hora: ficam a janela diária inteira
+            if backup.label and (now - backup.created_at).total_seconds() < self.keep_daily * 86400:
+                keep.add(backup.path)
+        for count, seconds, bucket in windows:
+            seen = set()
+            for backup in backups:  # do mais recente ao mais antigo: o primeiro de cada balde fica
+                key = bucket(backup.created_at)
+                if key in seen or (now - backup.created_at).total_seconds() >= count * seconds:
+                    continue
+                seen.add(key)
+                keep.add(backup.path)
+        return keep
+
+    def prune(self, now=None, dry_run=False):
+        """Apaga os backups fora da retenção. Retorna os caminhos removidos (ou que seriam, com dry_run)."""
+        backups = self.list()
+        keep = self.retained(backups, now)
+        removed = [backup.path for backup in backups if backup.path not in keep]
+        if not dry_run:
+            for path in removed:
+                for target in (path, self._metadata_path(path)):
+                    try:
+                        os.remove(target)
+                    except FileNotFoundError:
+                        pass
+            if removed:
+                logger.info('%d backup(s) antigos removidos', len(removed))
+        return removed
+
+    # RESTAURAÇÃO
+    def restore(self, path, target_path=None):
+        """
+        Restaura `path` sobre `target_path` (padrão: o banco em uso). Antes, verifica o backup e, se o destino
+        for o banco em uso, guarda um backup "pre-restore". A escrita usa a API de backup: as conexões abertas
+        passam a ver o conteúdo restaurado, sem trocar o arquivo por baixo delas.
+        Retorna o BackupInfo do backup de segurança (ou None).
+        """
+        problems = self.verify(path)
+        if any(not problem.startswith('sem arquivo de metadados') for problem in problems):
+            raise BackupError(f'Backup inválido: {"; ".join(problems)}')
+        target_path = target_path or self.database_path
+        safety = None
+        if os.path.abspath(target_path) == os.path.abspath(self.database_path) and os.path.exists(target_path):
+            safety = self.create(label='pre-restore', prune=False)
+        with tempfile.TemporaryDirectory(dir=self.directory, prefix='.restore-') as workdir:
+            database = os.path.join(workdir, 'restore.db')
+            self._extract(path, database)
+            source = sqlite3.connect(database)
+            try:
+                target = sqlite3.connect(target_path, timeout=30)
+                try:
+                    highest = self._highest_data_version(target)
+                    source.backup(target, pages=self.pages_per_step, sleep=0.005)
+                    # As versões do cache HTTP (data_version) não podem voltar atrás: ETags antigas passariam a
+                    # coincidir com conteúdo restaurado diferente. Ficam todas acima de qualquer valor anterior.
+                    if highest is not None and self._highest_data_version(target) is not None:
+                        with target:
+                            target.execute('UPDATE data_version SET version = version + ?', (highest + 1,))
+                finally:
+                    target.close()
+            finally:
+                source.close()
+        logger.warning('Banco %s restaurado a partir de %s', target_path, os.path.basename(path))
+        return safety
+
+    @staticmethod
+    def _highest_data_version(connection):
+        try:
+            return connection.execute('SELECT COALESCE(MAX(version), 0) FROM data_version').fetchone()[0]
+        except sqlite3.DatabaseError:
+            return None  # banco vazio ou de revisão sem a tabela
+
+    # AGENDAMENTO
+    def seconds_until_due(self, interval_seconds, now=None):
+        """Segundos até o próximo backup agendado, contando a partir do mais recente já existente."""
+        latest = self.latest()
+        if latest is None:
+            return 0
+        now = now or datetime.now(timezone.utc)
+        return max(0.0, interval_seconds - (now - latest.created_at).total_seconds())
+
+    def run_scheduler(self, interval_minutes, stop=None):
+        """
+        Cria um backup a cada `interval_minutes` até `stop` (threading.Event) ser acionado; bloqueia o chamador.
+        O primeiro sai logo se o último backup já estiver vencido (p.ex. após um restart). Erros são registrados
+        e o laço segue para o próximo ciclo. Roda no processo próprio do `flask backup schedule`.
+        """
+        interval = interval_minutes * 60
+        stop = stop or threading.Event()
+        while not stop.wait(self.seconds_until_due(interval)):
+            try:
+                self.create()
+            except Exception:
+                logger.exception('Falha no backup agendado')
+                stop.wait(min(interval, 300))
+
+# CLI: flask backup create|list|verify|prune|restore
+def _manager():
+    try:
+        return BackupManager.from_config(current_app.config)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+
+def _human_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+
+@click.group('backup')
+def backup_command():
+    """Backups online do banco SQLite (criação, retenção, verificação e restauração)."""
+
+@backup_command.command('create')
+@click.option('--label', default=None, help='Rótulo opcional no nome do arquivo (ex.: antes-da-migracao).')
+@click.option('--no-prune', is_flag=True, help='Não aplica a política de retenção depois do backup.')
+@with_appcontext
+def backup_create_command(label, no_prune):
+    """Cria um backup comprimido e verificado sem parar a aplicação."""
+    try:
+        info = _manager().create(label=label, prune=not no_prune)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{info.path} ({_human_size(info.size)}, sha256 {info.sha256[:12]}…)')
+
+@backup_command.command('schedule')
+@click.option('--interval', type=int, default=None, help='Minutos entre backups (padrão: BACKUP_INTERVAL_MINUTES).')
+@with_appcontext
+def backup_schedule_command(interval):
+    """Cria backups periódicos em primeiro plano (processo próprio, fora do gunicorn) até ser interrompido."""
+    interval = interval if interval is not None else current_app.config.get('BACKUP_INTERVAL_MINUTES', 60)
+    if interval <= 0:
+        raise click.ClickException('Backups agendados desligados (BACKUP_INTERVAL_MINUTES <= 0).')
+    manager = _manager()
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    click.echo(f'Backups a cada {interval} min em {manager.directory}')
+    try:
+        manager.run_scheduler(interval)
+    except KeyboardInterrupt:
+        click.echo('Agendamento encerrado.')
+
+@backup_command.command('list')
+@with_appcontext
+def backup_list_command():
+    """Lista os backups do mais recente ao mais antigo."""
+    backups = _manager().list()
+    for backup in backups:
+        status = 'ok' if backup.verified else '??'
+        click.echo(f'{status}  {backup.created_at:%Y-%m-%d %H:%M:%S}  {_human_size(backup.size):>9}  {os.path.basename(backup.path)}')
+    if not backups:
+        click.echo('Nenhum backup encontrado.')
+
+@backup_command.command('verify')
+@click.argument('names', nargs=-1)
+@click.option('--all', 'verify_all', is_flag=True, help='Verifica todos os backups do diretório.')
+@with_appcontext
+def backup_verify_command(names, verify_all):
+    """Confere checksum, descompressão e integridade (padrão: o backup mais recente)."""
+    manager = _manager()
+    try:
+        if verify_all:
+            paths = [backup.path for backup in manager.list()]
+        elif names:
+            paths = [manager.resolve(name) for name in names]
+        else:
+            latest = manager.latest()
+            paths = [latest.path] if latest else []
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    failures = 0
+    for path in paths:
+        problems = manager.verify(path)
+        failures += bool(problems)
+        click.echo(f'{os.path.basename(path)}: {"; ".join(problems) if problems else "ok"}')
+    if not paths:
+        click.echo('Nenhum backup encontrado.')
+    if failures:
+        raise click.ClickException(f'{failures} backup(s) com problema.')
+
+@backup_command.command('prune')
+@click.option('--dry-run', is_flag=True, help='Só mostra o que seria apagado.')
+@with_appcontext
+def backup_prune_command(dry_run):
+    """Aplica a política de retenção (BACKUP_KEEP_HOURLY/DAILY/MONTHLY)."""
+    removed = _manager().prune(dry_run=dry_run)
+    for path in removed:
+        click.echo(f'{"apagaria" if dry_run else "apagado"}: {os.path.basename(path)}')
+    click.echo(f'{len(removed)} backup(s) {"fora da retenção" if dry_run else "removido(s)"}.')
+
+@backup_command.command('restore')
+@click.argument('name')
+@click.option('--target', default=None, help='Restaura em outro arquivo em vez do banco em uso.')
+@click.option('--yes', is_flag=True, help='Não pede confirmação.')
+@with_appcontext
+def backup_restore_command(name, target, yes):
+    """Restaura um backup (um backup "pre-restore" do estado atual é criado antes)."""
+    manager = _manager()
+    try:
+        path = manager.resolve(name)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    destination = target or manager.database_path
+    if not yes:
+        click.confirm(f'Substituir o conteúdo de {destination} por {os.path.basename(path)}?', abort=True)
+    try:
+        safety = manager.restore(path, target_path=target)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    if safety is not None:
+        click.echo(f'Estado anterior guardado em {safety.path}')
+    click.echo(f'{destination} restaurado a partir de {os.path.basename(path)}.')
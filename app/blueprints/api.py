@@ -0,0 +1,504 @@
+# app/blueprints/api.py
+"""
+API JSON versionada (/api/v1) para ensaios, lançamentos, clientes, tipos de ensaio e metas.
+
+Leitura: a consulta projeta só as colunas pedidas e as linhas vão direto para o JSON (sem montar objetos do ORM).
+    GET  /api/v1/<recurso>?fields=id,session_date&limit=100&after=<cursor>&<filtros>
+    GET  /api/v1/<recurso>/<id>?fields=...
+- fields: campos esparsos (padrão: todos);
+- paginação por chave (keyset): `next` da resposta vai em ?after= da próxima página; o custo não cresce com a página;
+- filtros equivalentes aos formulários das telas (SessionFilterForm, TransactionFilterForm) e ordenação em ?sort_by=.
+
+Escrita em lote, em uma única transação (tudo ou nada), passando pelo ORM para que livro-caixa,
+canal de alterações e versões do cache HTTP continuem consistentes:
+    POST  /api/v1/<recurso>  {"items": [{...}, ...]}            cria
+    PATCH /api/v1/<recurso>  {"items": [{"id": 1, ...}, ...]}   altera só os campos enviados
+
+Autenticação: sessão logada ou "Authorization: Bearer <API_TOKEN>" (o token acessa o estúdio API_TENANT).
+"""
+import base64
+import contextlib
+import hmac
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from flask import Blueprint, Response, current_app, g, request
+from flask_login import current_user
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import Session, Transaction, Client, SessionType, Goal, KANBAN_STAGES
+from app.finance_service import SessionFinanceService, SESSION_CATEGORIES, filter_transactions
+from app.session_service import filter_sessions, session_code_for
+from app.query_budget import query_budget
+from app.tenancy import TenantService
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, json da biblioteca padrão
+    orjson = None
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+MAX_BATCH = 500
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.message, self.status, self.errors = message, status, errors
+
+# CODIFICAÇÃO
+def _default(value):
+    # Decimal vira string para não perder precisão (valores monetários)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'Tipo não serializável: {type(value).__name__}')
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+# RECURSOS
+class ApiResource:
+    """
+    Descrição de um recurso: campos projetáveis (nome -> expressão SQL), campos graváveis,
+    valores permitidos, ordenações (nome -> coluna, decrescente?) e filtros da listagem.
+    """
+
+    def __init__(self, model, fields, writable, sorts, default_sort, filters=None, choices=None, extra_input=None):
+        self.model = model
+        self.fields = fields
+        self.writable = writable
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.filters = filters
+        self.choices = choices or {}
+        # Campos só de entrada (não são colunas), ex.: marcações de pagamento do ensaio
+        self.extra_input = extra_input or {}
+
+    def columns(self, names):
+        return [self.fields[name].label(name) for name in names]
+
+    def required(self):
+        """Colunas graváveis obrigatórias na criação (NOT NULL e sem valor padrão)."""
+        table = self.model.__table__
+        return [name for name in self.writable
+                if not table.c[name].nullable and table.c[name].default is None and table.c[name].server_default is None]
+
+def _model_fields(model, *extra):
+    # Atributos do ORM (não as colunas da tabela): a projeção passa pelo filtro de estúdio (app/tenancy.py)
+    fields = {attr.columns[0].name: attr.class_attribute for attr in sa.inspect(model).column_attrs
+              if attr.key != 'tenant_id'}
+    for name, expression in extra:
+        fields[name] = expression
+    return fields
+
+def _date_arg(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f'Parâmetro "{name}" deve ser uma data AAAA-MM-DD.')
+
+def _int_arg(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f'Parâmetro "{name}" deve ser um número inteiro.')
+
+def _session_filters(query, args):
+    return filter_sessions(
+        query, status=args.get('status', 'ativos'), search=args.get('search'),
+        client_id=_int_arg(args, 'client'), session_type_id=_int_arg(args, 'session_type'),
+        start_date=_date_arg(args, 'start_date'), end_date=_date_arg(args, 'end_date'))
+
+def _transaction_filters(query, args):
+    query = filter_transactions(
+        query, search=args.get('search'), trans_type=args.get('trans_type'), client_id=_int_arg(args, 'client'),
+        start_date=_date_arg(args, 'start_date'), end_date=_date_arg(args, 'end_date'))
+    if args.get('status'):
+        query = query.filter(Transaction.status == args['status'])
+    if session_id := _int_arg(args, 'session'):
+        query = query.filter(Transaction.session_id == session_id)
+    return query
+
+def _client_filters(query, args):
+    if args.get('search'):
+        query = query.filter(Client.name.ilike(f"%{args['search']}%"))
+    if args.get('lead_source'):
+        query = query.filter(Client.lead_source == args['lead_source'])
+    return query
+
+def _goal_filters(query, args):
+    if args.get('status'):
+        query = query.filter(Goal.status == args['status'])
+    return query
+
+SESSION_PAID_FLAGS = ('down_payment_paid', 'total_value_paid', 'extra_photos_paid', 'printing_paid')
+# Alterar qualquer um destes campos recalcula os lançamentos gerenciados pelo ensaio
+SESSION_LEDGER_FIELDS = {'session_date', 'total_value', 'down_payment', 'session_cost', 'extra_photos_qty',
+                         'extra_photo_unit_price', 'printing_qty', 'printing_unit_price', *SESSION_PAID_FLAGS}
+
+RESOURCES = {
+    'sessions': ApiResource(
+        Session,
+        _model_fields(
+            Session,
+            ('client_name', sa.select(Client.name).where(Client.id == Session.client_id).scalar_subquery()),
+            ('session_type_name', sa.select(SessionType.name).where(SessionType.id == Session.session_type_id).scalar_subquery()),
+        ),
+        writable=['session_date', 'selection_completed_date', 'total_value', 'down_payment', 'session_cost',
+                  'extra_photos_qty', 'extra_photo_unit_price', 'printing_qty', 'printing_unit_price', 'notes',
+                  'kanban_status', 'client_id', 'session_type_id'],
+        sorts={'date_desc': (Session.session_date, True), 'date_asc': (Session.session_date, False),
+               'value_desc': (Session.total_value, True), 'value_asc': (Session.total_value, False)},
+        default_sort='date_desc',
+        filters=_session_filters,
+        choices={'kanban_status': KANBAN_STAGES},
+        extra_input={flag: bool for flag in SESSION_PAID_FLAGS},
+    ),
+    'transactions': ApiResource(
+        Transaction, _model_fields(Transaction),
+        writable=['description', 'transaction_type', 'value', 'transaction_date', 'tags', 'session_id', 'status'],
+        sorts={'date_desc': (Transaction.transaction_date, True), 'date_asc': (Transaction.transaction_date, False),
+               'value_desc': (Transaction.value, True), 'value_asc': (Transaction.value, False)},
+        default_sort='date_desc',
+        filters=_transaction_filters,
+        choices={'transaction_type': ['entry', 'exit'], 'status': ['efetivado', 'previsto']},
+    ),
+    'clients': ApiResource(
+        Client, _model_fields(Client),
+        writable=['name', 'email', 'whatsapp', 'lead_source', 'tags', 'address_street', 'address_city',
+                  'address_state', 'address_zip_code', 'main_contact_birthday', 'notes'],
+        sorts={'name_asc': (Client.name, False), 'name_desc': (Client.name, True)},
+        default_sort='name_asc',
+        filters=_client_filters,
+    ),
+    'session_types': ApiResource(
+        SessionType, _model_fields(SessionType),
+        writable=['name', 'abbreviation', 'selection_deadline_days', 'editing_deadline_days', 'duration_hours'],
+        sorts={'name_asc': (SessionType.name, False)},
+        default_sort='name_asc',
+    ),
+    'goals': ApiResource(
+        Goal, _model_fields(Goal),
+        writable=['name', 'target_value', 'target_date', 'status', 'notes'],
+        sorts={'id_asc': (Goal.id, False), 'name_asc': (Goal.name, False)},
+        default_sort='id_asc',
+        filters=_goal_filters,
+        choices={'status': ['Ativa', 'Concluída', 'Cancelada']},
+    ),
+}
+
+def _resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError(f'Recurso "{name}" não existe.', 404)
+    return resource
+
+def _requested_fields(resource):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(resource.fields)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        raise ApiError(f'Campos inexistentes: {", ".join(unknown)}.')
+    return names
+
+# CURSOR (paginação por chave): último valor da ordenação + id
+def _encode_cursor(sort_value, row_id):
+    raw = dumps([sort_value, row_id])
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor, column):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        python_type = column.type.python_type
+        if python_type is date:
+            sort_value = date.fromisoformat(sort_value)
+        elif sort_value is not None:
+            sort_value = python_type(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, InvalidOperation):
+        raise ApiError('Cursor inválido.')
+
+def _project(names, query):
+    """Linhas projetadas -> dicionários (colunas além de `names`, no fim da projeção, são descartadas)."""
+    count = len(names)
+    return [dict(zip(names, row[:count])) for row in db.session.execute(query)]
+
+# AUTENTICAÇÃO E ERROS
+@bp.before_request
+def authenticate():
+    if current_user.is_authenticated:
+        return None
+    token = current_app.config.get('API_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        g.tenant_id = TenantService.resolve(current_app.config.get('API_TENANT', 1)).id
+        return None
+    return json_response({'error': 'Autenticação necessária.'}, 401)
+
+@bp.errorhandler(ApiError)
+def api_error(error):
+    payload = {'error': error.message}
+    if error.errors:
+        payload['errors'] = error.errors
+    return json_response(payload, error.status)
+
+# LEITURA
+@bp.route('/<resource_name>', methods=['GET'])
+@query_budget(2, resource_name='sessions')
+def list_items(resource_name):
+    resource = _resource(resource_name)
+    names = _requested_fields(resource)
+    sort_name = request.args.get('sort_by', resource.default_sort)
+    if sort_name not in resource.sorts:
+        raise ApiError(f'Ordenação inválida. Opções: {", ".join(resource.sorts)}.')
+    sort_column, descending = resource.sorts[sort_name]
+    pk = resource.model.id
+    limit = _int_arg(request.args, 'limit') or DEFAULT_LIMIT
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    # A chave da ordenação e o id vão no fim da projeção (para montar o cursor), fora do JSON
+    query = sa.select(*resource.columns(names), sort_column, pk)
+    if resource.filters is not None:
+        query = resource.filters(query, request.args)
+    if request.args.get('after'):
+        sort_value, row_id = _decode_cursor(request.args['after'], sort_column)
+        key, bound = sa.tuple_(sort_column, pk), sa.tuple_(sa.literal(sort_value, sort_column.type), sa.literal(row_id))
+        query = query.filter(key < bound if descending else key > bound)
+    order = (sort_column.desc(), pk.desc()) if descending else (sort_column.asc(), pk.asc())
+    rows = db.session.execute(query.order_by(*order).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][-2], rows[-1][-1])
+    count = len(names)
+    return json_response({'data': [dict(zip(names, row[:count])) for row in rows], 'next': next_cursor})
+
+@bp.route('/<resource_name>/<int:item_id>', methods=['GET'])
+def get_item(resource_name, item_id):
+    resource = _resource(resource_name)
+    names = _requested_fields(resource)
+    rows = _project(names, sa.select(*resource.columns(names)).where(resource.model.id == item_id))
+    if not rows:
+        raise ApiError('Registro não encontrado.', 404)
+    return json_response({'data': rows[0]})
+
+# ESCRITA EM LOTE
+def _coerce(column, value):
+    """Converte um valor JSON para o tipo da coluna; ValueError com a mensagem do problema."""
+    if value is None:
+        if not column.nullable:
+            raise ValueError('obrigatório')
+        return None
+    if isinstance(value, bool):
+        raise ValueError('tipo inválido')
+    python_type = column.type.python_type
+    if python_type is Decimal:
+        if not isinstance(value, (int, float, str)):
+            raise ValueError('deve ser numérico')
+        try:
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError('deve ser numérico')
+        if not number.is_finite():
+            raise ValueError('deve ser numérico')
+        return number
+    if python_type is int:
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+            return int(value)
+        raise ValueError('deve ser inteiro')
+    if python_type is date:
+        if not isinstance(value, str):
+            raise ValueError('deve ser uma data AAAA-MM-DD')
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValueError('deve ser uma data AAAA-MM-DD')
+    if not isinstance(value, str):
+        raise ValueError('deve ser texto')
+    length = getattr(column.type, 'length', None)
+    if length and len(value) > length:
+        raise ValueError(f'máximo de {length} caracteres')
+    return value
+
+def _batch_items():
+    payload = request.get_json(silent=True)
+    items = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        raise ApiError('Envie {"items": [...]} com ao menos um registro.')
+    if len(items) > MAX_BATCH:
+        raise ApiError(f'Máximo de {MAX_BATCH} registros por lote.', 413)
+    return items
+
+def _validate(resource, items, creating):
+    """
+    Valida e converte todos os itens antes de escrever. Retorna [(valores, entradas_extras)];
+    se houver qualquer erro, nada é gravado (ApiError com a lista de erros por índice e campo).
+    """
+    table = resource.model.__table__
+    required = resource.required() if creating else []
+    parsed, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'field': None, 'message': 'registro deve ser um objeto'})
+            continue
+        values, extra = {}, {}
+        for field, value in item.items():
+            if field == 'id' and not creating:
+                continue
+            if field in resource.extra_input:
+                if not isinstance(value, resource.extra_input[field]):
+                    errors.append({'index': index, 'field': field, 'message': 'tipo inválido'})
+                else:
+                    extra[field] = value
+                continue
+            if field not in resource.writable:
+                errors.append({'index': index, 'field': field, 'message': 'campo não gravável'})
+                continue
+            try:
+                values[field] = _coerce(table.c[field], value)
+            except ValueError as error:
+                errors.append({'index': index, 'field': field, 'message': str(error)})
+                continue
+            allowed = resource.choices.get(field)
+            if allowed and values[field] not in allowed:
+                errors.append({'index': index, 'field': field, 'message': f'valores permitidos: {", ".join(allowed)}'})
+        if not creating and not isinstance(item.get('id'), int):
+            errors.append({'index': index, 'field': 'id', 'message': 'obrigatório na alteração'})
+        for field in required:
+            if field not in item:
+                errors.append({'index': index, 'field': field, 'message': 'obrigatório'})
+        parsed.append((values, extra))
+    if errors:
+        raise ApiError('Dados inválidos.', 400, errors)
+    return parsed
+
+def _load_references(resource, parsed):
+    """
+    Confere as chaves estrangeiras do lote com uma consulta por tabela referenciada. Os objetos
+    carregados ficam no identity map (enquanto a lista devolvida for mantida), então client/type dos
+    ensaios criados não geram novas consultas.
+    """
+    errors, loaded = [], []
+    for column in resource.model.__table__.columns:
+        for foreign_key in column.foreign_keys:
+            ids = {values[column.name] for values, _ in parsed if values.get(column.name) is not None}
+            if not ids:
+                continue
+            target = next(mapper.class_ for mapper in db.Model.registry.mappers
+                          if mapper.local_table is foreign_key.column.table)
+            found = db.session.scalars(sa.select(target).where(target.id.in_(ids))).all()
+            loaded.extend(found)
+            missing = ids - {obj.id for obj in found}
+            for index, (values, _) in enumerate(parsed):
+                if values.get(column.name) in missing:
+                    errors.append({'index': index, 'field': column.name, 'message': 'registro referenciado não existe'})
+    if errors:
+        raise ApiError('Dados inválidos.', 400, errors)
+    return loaded
+
+def _sync_session_ledger(session, extra, creating):
+    """Recalcula os lançamentos gerenciados pelo ensaio (como nas telas de cadastro/edição)."""
+    if creating:
+        flags = {flag: extra.get(flag, False) for flag in SESSION_PAID_FLAGS}
+    else:
+        flags = {
+            'down_payment_paid': extra.get('down_payment_paid', session.has_down_payment_transaction),
+            'total_value_paid': extra.get('total_value_paid', session.has_final_payment_transaction),
+            'extra_photos_paid': extra.get('extra_photos_paid', session.has_extra_photos_transaction),
+            'printing_paid': extra.get('printing_paid', session.has_printing_transaction),
+        }
+    SessionFinanceService.update_session_financials(session, SessionFinanceService.ledger_form(session, **flags))
+
+@contextlib.contextmanager
+def _batch_transaction():
+    """Flushes e commit do lote: violações de integridade (ex.: nome repetido) desfazem tudo e viram 409."""
+    try:
+        yield
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        raise ApiError('Conflito de integridade (valor único já existente?).', 409, [{'message': str(error.orig)}])
+
+def _written(resource, ids, status):
+    names = _requested_fields(resource)
+    pk = resource.model.id
+    count = len(names)
+    # O id vai no fim da projeção para devolver os registros na ordem em que foram enviados
+    by_id = {row[-1]: dict(zip(names, row[:count]))
+             for row in db.session.execute(sa.select(*resource.columns(names), pk).where(pk.in_(ids)))}
+    return json_response({'data': [by_id[item_id] for item_id in ids if item_id in by_id]}, status)
+
+@bp.route('/<resource_name>', methods=['POST'])
+def create_items(resource_name):
+    resource = _resource(resource_name)
+    parsed = _validate(resource, _batch_items(), creating=True)
+    references = _load_references(resource, parsed)  # mantém client/type no identity map até o commit
+
+    objects = [resource.model(**values) for values, _ in parsed]
+    if resource.model is Session:
+        # Código provisório único (a coluna é UNIQUE); o definitivo depende do id gerado no flush
+        for session in objects:
+            session.session_code = f'TEMP_{uuid.uuid4().hex}'
+    with _batch_transaction():
+        db.session.add_all(objects)
+        # Um único flush gera os ids de todo o lote (inserts agrupados pelo unit of work)
+        db.session.flush()
+        if resource.model is Session:
+            for session, (_, extra) in zip(objects, parsed):
+                session.session_code = session_code_for(session, session.client)
+                _sync_session_ledger(session, extra, creating=True)
+    return _written(resource, [obj.id for obj in objects], 201)
+
+@bp.route('/<resource_name>', methods=['PATCH'])
+def update_items(resource_name):
+    resource = _resource(resource_name)
+    items = _batch_items()
+    parsed = _validate(resource, items, creating=False)
+    _load_references(resource, parsed)
+
+    ids = [item['id'] for item in items]
+    query = sa.select(resource.model).where(resource.model.id.in_(ids))
+    if resource.model is Session:
+        query = query.options(selectinload(Session.transactions))
+    targets = {obj.id: obj for obj in db.session.scalars(query).all()}
+
+    errors = []
+    for index, item_id in enumerate(ids):
+        target = targets.get(item_id)
+        if target is None:
+            errors.append({'index': index, 'field': 'id', 'message': 'registro não encontrado'})
+        elif resource.model is Transaction and target.category in SESSION_CATEGORIES:
+            errors.append({'index': index, 'field': 'id', 'message': 'lançamento gerenciado pelo ensaio; altere o ensaio'})
+    if errors:
+        raise ApiError('Dados inválidos.', 400, errors)
+
+    with _batch_transaction(), db.session.no_autoflush:
+        for item_id, (values, extra) in zip(ids, parsed):
+            target = targets[item_id]
+            for field, value in values.items():
+                setattr(target, field, value)
+            if resource.model is Session and SESSION_LEDGER_FIELDS.intersection(values.keys() | extra.keys()):
+                _sync_session_ledger(target, extra, creating=False)
+    return _written(resource, list(dict.fromkeys(ids)), 200)
@@ -0,0 +1,44 @@
+# app/blueprints/audit.py
+from datetime import date, datetime, timedelta
+from flask import render_template, Blueprint, request, abort
+from flask_login import login_required
+from app.audit import AuditService, ACTION_LABELS, ENTITY_LABELS
+from app.query_budget import query_budget
+
+bp = Blueprint('audit', __name__, url_prefix='/auditoria')
+
+# Período padrão da listagem geral
+DEFAULT_DAYS = 7
+
+def _date_arg(name, default):
+    try:
+        return datetime.strptime(request.args[name], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return default
+
+@bp.route('/')
+@login_required
+@query_budget(3)
+def index():
+    """Alterações de um período, de todas as entidades auditadas (ou de um tipo)."""
+    end_date = _date_arg('end_date', date.today())
+    start_date = _date_arg('start_date', end_date - timedelta(days=DEFAULT_DAYS - 1))
+    entity_type = request.args.get('entity_type')
+    if entity_type not in ENTITY_LABELS:
+        entity_type = None
+    entries = AuditService.entries(start_date, end_date, entity_type)
+    return render_template('audit_history.html', entries=entries, usernames=AuditService.usernames(entries),
+                           changes=AuditService.changes, entity_labels=ENTITY_LABELS, action_labels=ACTION_LABELS,
+                           start_date=start_date, end_date=end_date, entity_type=entity_type, entity_id=None)
+
+@bp.route('/<entity_type>/<int:entity_id>')
+@login_required
+@query_budget(3, entity_type='session', entity_id='{session_id}')
+def history(entity_type, entity_id):
+    """Histórico completo de um ensaio, lançamento ou meta (inclusive já excluídos)."""
+    if entity_type not in ENTITY_LABELS:
+        abort(404)
+    entries = AuditService.history(entity_type, entity_id)
+    return render_template('audit_history.html', entries=entries, usernames=AuditService.usernames(entries),
+                           changes=AuditService.changes, entity_labels=ENTITY_LABELS, action_labels=ACTION_LABELS,
+                           entity_type=entity_type, entity_id=entity_id)
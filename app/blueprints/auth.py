@@ -4,6 +4,7 @@ from flask_login import login_user, logout_user, current_user
 from app import db, limiter
 from app.forms import LoginForm, RegistrationForm
 from app.models import User
+from app.tenancy import TenantError, TenantService
 import sqlalchemy as sa
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -43,7 +44,15 @@ def register():
         return redirect(url_for('sessions.index'))
     form = RegistrationForm()
     if form.validate_on_submit():
-        user = User(username=form.username.data)
+        # Cada registro abre um estúdio novo; o slug leva o usuário e, se ainda assim colidir, um sufixo numérico
+        try:
+            tenant = TenantService.create(form.studio_name.data,
+                                          TenantService.available_slug(f'{form.studio_name.data} {form.username.data}'))
+        except TenantError as e:
+            db.session.rollback()
+            form.studio_name.errors.append(str(e))
+            return render_template('register.html', form=form)
+        user = User(username=form.username.data, tenant_id=tenant.id)
         user.set_password(form.password.data)
         db.session.add(user)
         db.session.commit()
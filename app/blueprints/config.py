@@ -4,7 +4,7 @@ from flask_login import login_required
 import sqlalchemy as sa
 from app import db
 from app.forms import PricingForm, SessionTypeForm
-from app.models import Configuration, SessionType, Session
+from app.models import Configuration, SessionType, Session, SessionArchive
 from decimal import Decimal
 
 bp = Blueprint('config', __name__, url_prefix='/config')
@@ -51,7 +51,8 @@ def add_session_type():
             name=form.name.data, 
             abbreviation=form.abbreviation.data.upper(),
             selection_deadline_days=form.selection_deadline_days.data,
-            editing_deadline_days=form.editing_deadline_days.data
+            editing_deadline_days=form.editing_deadline_days.data,
+            duration_hours=form.duration_hours.data
         )
         db.session.add(new_type)
         db.session.commit()
@@ -69,6 +70,7 @@ def edit_session_type(id):
         stype.abbreviation=form.abbreviation.data.upper()
         stype.selection_deadline_days=form.selection_deadline_days.data
         stype.editing_deadline_days=form.editing_deadline_days.data
+        stype.duration_hours=form.duration_hours.data
         db.session.commit()
         flash('Tipo de ensaio atualizado!', 'success')
         return redirect(url_for('config.session_types'))
@@ -78,7 +80,10 @@ def edit_session_type(id):
 @login_required
 def delete_session_type(id):
     stype=db.get_or_404(SessionType,id)
-    if db.session.scalar(sa.select(Session).where(Session.session_type_id==stype.id)): 
+    # Ensaios arquivados (fora da lixeira) também contam: continuam visíveis com ?arquivo=1
+    in_archive = sa.select(SessionArchive.c.id).where(SessionArchive.c.session_type_id == stype.id,
+                                                      SessionArchive.c.deleted_at.is_(None))
+    if db.session.scalar(sa.select(Session).where(Session.session_type_id==stype.id)) or db.session.scalar(in_archive.limit(1)): 
         flash('Erro: Este tipo de ensaio está em uso.', 'danger')
         return redirect(url_for('config.session_types'))
     
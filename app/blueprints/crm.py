@@ -3,27 +3,50 @@ from flask import render_template, Blueprint, flash, redirect, url_for, request
 from flask_login import login_required
 import sqlalchemy as sa
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Client, InteractionLog, Session, Transaction
+from app.models import Client, ClientMetrics, InteractionLog, Session, Transaction
+from app.client_analytics import ClientAnalyticsService, SEGMENTS
 from app.forms import ClientFilterForm, ClientForm, InteractionLogForm
+from app.query_budget import query_budget
 from datetime import date
 from decimal import Decimal
 
 bp = Blueprint('crm', __name__, url_prefix='/clientes')
 
+CLIENT_SORTS = {
+    'name': (Client.name.asc(),),
+    'ltv_desc': (ClientMetrics.lifetime_value.desc(), Client.name.asc()),
+    'recency': (ClientMetrics.last_session_date.desc().nulls_last(), Client.name.asc()),
+    'frequency_desc': (ClientMetrics.frequency.desc(), Client.name.asc()),
+}
+
 @bp.route('/')
 @login_required
+@query_budget(4)
 def index():
     filter_form = ClientFilterForm(request.args, meta={'csrf': False})
-    query = sa.select(Client)
+    # Métricas RFM/LTV lidas do retrato (reconstruído em uma instrução só quando os dados mudam)
+    refreshed_at = ClientAnalyticsService.ensure_fresh()
+    query = sa.select(Client, ClientMetrics).outerjoin(ClientMetrics, ClientMetrics.client_id == Client.id)
+    if filter_form.segment.data:
+        query = query.filter(ClientMetrics.segment == filter_form.segment.data)
     if filter_form.search.data:
         query = query.filter(Client.name.ilike(f'%{filter_form.search.data}%'))
     if filter_form.lead_source.data:
         query = query.filter(Client.lead_source == filter_form.lead_source.data)
     if filter_form.tags.data:
         query = query.filter(Client.tags.ilike(f'%{filter_form.tags.data}%'))
-    clients = db.session.scalars(query.order_by(Client.name)).all()
-    return render_template('clients.html', clients=clients, filter_form=filter_form)
+    rows = db.session.execute(query.order_by(*CLIENT_SORTS.get(filter_form.sort_by.data, CLIENT_SORTS['name']))).all()
+    return render_template('clients.html', rows=rows, filter_form=filter_form, segments=SEGMENTS,
+                           refreshed_at=refreshed_at, today=date.today())
+
+@bp.route('/metricas/atualizar', methods=['POST'])
+@login_required
+def refresh_metrics():
+    count = ClientAnalyticsService.refresh()
+    flash(f'Métricas recalculadas para {count} cliente(s).', 'success')
+    return redirect(url_for('crm.index', **request.args))
 
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -53,6 +76,7 @@ def edit(client_id):
 
 @bp.route('/<client_name>')
 @login_required
+@query_budget(5, client_name='{busiest_client}')
 def client_details(client_name):
     client = db.session.scalar(sa.select(Client).where(Client.name == client_name))
     if not client:
@@ -64,13 +88,18 @@ def client_details(client_name):
     
     interactions = client.interactions.order_by(InteractionLog.interaction_date.desc()).all()
     
-    sessions = db.session.scalars(sa.select(Session).where(Session.client_id == client.id).order_by(Session.session_date.desc())).all()
-    
-    # Correção: Total pago em Decimal
-    total_paid = db.session.scalar(sa.select(func.sum(Transaction.value)).join(Session).where(Session.client_id == client.id, Transaction.transaction_type == 'entry')) or Decimal('0.00')
+    sessions = db.session.scalars(
+        sa.select(Session).where(Session.client_id == client.id)
+        .options(joinedload(Session.type)).order_by(Session.session_date.desc())
+    ).all()
     
-    # Mapa de pagamentos por sessão
-    paid_amounts = {s.id: (db.session.scalar(sa.select(func.sum(Transaction.value)).where(Transaction.session_id == s.id, Transaction.transaction_type == 'entry')) or Decimal('0.00')) for s in sessions}
+    # Mapa de pagamentos por sessão em uma única consulta agrupada (total pago = soma do mapa, em Decimal)
+    paid_amounts = dict(db.session.execute(
+        sa.select(Transaction.session_id, func.sum(Transaction.value))
+        .join(Session).where(Session.client_id == client.id, Transaction.transaction_type == 'entry')
+        .group_by(Transaction.session_id)
+    ).all())
+    total_paid = sum(paid_amounts.values(), Decimal('0.00'))
     
     return render_template('client_details.html', 
                            client=client,
@@ -0,0 +1,83 @@
+# app/blueprints/events.py
+from flask import Blueprint, Response, request, stream_with_context, current_app
+from flask_login import login_required
+import threading
+import time
+from app import db
+from app.change_events import broker, fetch_events, last_event_id
+
+bp = Blueprint('events', __name__, url_prefix='/eventos')
+
+# Streams abertos neste processo (um por thread do worker gthread)
+_open_streams = 0
+_streams_lock = threading.Lock()
+
+
+def _acquire_stream(limit):
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= limit:
+            return False
+        _open_streams += 1
+        return True
+
+
+def _release_stream():
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+
+
+@bp.route('/stream')
+@login_required
+def stream():
+    """
+    Canal SSE com os eventos de alteração (etapa do Kanban, lançamentos, totais).
+    - Commits deste worker acordam o stream na hora (ChangeBroker).
+    - Commits de outros workers são lidos da tabela ChangeEvent a cada SSE_POLL_INTERVAL.
+    A conexão fica aberta por até SSE_MAX_DURATION segundos e depois é encerrada; o EventSource
+    reconecta sozinho enviando Last-Event-ID, então nenhum evento se perde.
+    Requer workers com threads (gthread, ver gunicorn.conf.py): cada stream ocupa uma thread do
+    worker enquanto estiver aberto. Acima de SSE_MAX_STREAMS por processo a resposta é 503 e a
+    página segue só com a atualização periódica, sem tomar as threads das demais requisições.
+    """
+    poll_interval = current_app.config.get('SSE_POLL_INTERVAL', 2)
+    heartbeat_interval = current_app.config.get('SSE_HEARTBEAT_INTERVAL', 15)
+    max_duration = current_app.config.get('SSE_MAX_DURATION', 300)
+    if not _acquire_stream(current_app.config.get('SSE_MAX_STREAMS', 8)):
+        return Response('Canal de eventos lotado', status=503, headers={'Retry-After': str(max_duration)})
+
+    try:
+        cursor = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        cursor = 0
+    if not cursor:
+        cursor = last_event_id()
+    # Não segura uma transação de leitura aberta entre as consultas
+    db.session.rollback()
+
+    def generate():
+        nonlocal cursor
+        started = last_write = time.monotonic()
+        generation = broker.generation
+        yield f"retry: {int(poll_interval * 1000)}\n\n"
+
+        while time.monotonic() - started < max_duration:
+            events = fetch_events(cursor)
+            db.session.rollback()
+            for event in events:
+                cursor = event.id
+                yield f"id: {event.id}\nevent: {event.event_type}\ndata: {event.payload}\n\n"
+                last_write = time.monotonic()
+
+            if time.monotonic() - last_write >= heartbeat_interval:
+                yield ": keep-alive\n\n"
+                last_write = time.monotonic()
+
+            generation = broker.wait(generation, poll_interval)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.call_on_close(_release_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
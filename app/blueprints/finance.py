@@ -5,9 +5,13 @@ import sqlalchemy as sa
 from sqlalchemy import func
 from app import db, get_month_name_pt_br
 from app.forms import TransactionForm, TransactionFilterForm
-from app.models import Transaction, Session, Client
+from app.models import Transaction, Client
+from app.ledger_service import LedgerBalanceService
+from app.finance_service import filter_transactions
+from app.http_cache import cached_page
+from app.read_routing import archive_readable, archive_requested
+from app.archive import ArchiveService
 from datetime import datetime, date
-from dateutil.relativedelta import relativedelta
 from decimal import Decimal
 import time
 
@@ -15,6 +19,8 @@ bp = Blueprint('finance', __name__, url_prefix='/financeiro')
 
 @bp.route('/')
 @login_required
+@archive_readable
+@cached_page('transaction', 'session', 'client', fragment=True)
 def index():
     filter_form = TransactionFilterForm(request.args, meta={'csrf': False})
     
@@ -38,16 +44,10 @@ def index():
             sa.extract('year', Transaction.transaction_date) == current_date.year
         )
 
-    if filter_form.search.data:
-        query = query.filter(Transaction.description.ilike(f'%{filter_form.search.data}%'))
-    if filter_form.trans_type.data:
-        query = query.filter(Transaction.transaction_type == filter_form.trans_type.data)
-    if filter_form.start_date.data:
-        query = query.filter(Transaction.transaction_date >= filter_form.start_date.data)
-    if filter_form.end_date.data:
-        query = query.filter(Transaction.transaction_date <= filter_form.end_date.data)
-    if filter_form.client.data:
-        query = query.join(Transaction.session).filter(Session.client_id == filter_form.client.data.id)
+    query = filter_transactions(
+        query, search=filter_form.search.data, trans_type=filter_form.trans_type.data,
+        client_id=filter_form.client.data.id if filter_form.client.data else None,
+        start_date=filter_form.start_date.data, end_date=filter_form.end_date.data)
 
     summary_query = query.with_only_columns(func.sum(Transaction.value))
     
@@ -62,10 +62,23 @@ def index():
     
     balance = total_entries - total_exits
     
-    transactions = db.session.scalars(query.order_by(Transaction.transaction_date.desc())).all()
+    transactions = db.session.scalars(query.order_by(Transaction.transaction_date.desc(), Transaction.id.desc())).all()
+
+    # Saldo acumulado só faz sentido sobre o livro completo (sem filtros de descrição/tipo/cliente)
+    running_balances = None
+    if not (filter_form.search.data or filter_form.trans_type.data or filter_form.client.data):
+        opening_day = current_date if use_month_nav else filter_form.start_date.data
+        opening_balance = LedgerBalanceService.balance_before(opening_day)
+        running_balances = LedgerBalanceService.running_balances(transactions, opening_balance)
+
+    # Com ?arquivo=1 entram os lançamentos arquivados (somente leitura: sem ações nessas linhas)
+    include_archive = archive_requested()
+    archived = ArchiveService.archived_ids(Transaction, [trans.id for trans in transactions]) if include_archive else set()
 
     month_name, current_year, prev_month, next_month = (None, None, None, None)
     if current_date:
+        # Import tardio: dateutil só é carregado quando a rota precisa dele
+        from dateutil.relativedelta import relativedelta
         month_name = get_month_name_pt_br(current_date.month)
         current_year = current_date.year
         prev_month = current_date - relativedelta(months=1)
@@ -82,6 +95,10 @@ def index():
                            total_entries=total_entries,
                            total_exits=total_exits,
                            balance=balance,
+                           running_balances=running_balances,
+                           period_key=current_date.strftime('%Y-%m') if current_date else None,
+                           include_archive=include_archive,
+                           archived=archived,
                            query_params=query_params)
 
 @bp.route('/add', methods=['GET','POST'])
@@ -105,6 +122,7 @@ def add_transaction():
             db.session.add(new_trans)
             flash('Transação salva!', 'success')
         else:
+            from dateutil.relativedelta import relativedelta
             recurrence_id = f"rec-{int(time.time())}"
             base_description = form.description.data
             
@@ -224,7 +242,7 @@ def delete_transaction(transaction_id):
     # Se houver parâmetro query 'delete_series' (implementar botão no futuro), deletaria tudo
     # Por enquanto, deleção unitária padrão.
     
-    db.session.delete(trans)
+    ArchiveService.trash_transaction(trans)
     db.session.commit()
-    flash('Transação excluída.', 'info')
+    flash('Transação movida para a lixeira.', 'info')
     return redirect(url_for('finance.index', **request.args))
\ No newline at end of file
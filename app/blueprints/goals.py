@@ -2,18 +2,19 @@
 from flask import render_template, Blueprint, flash, redirect, url_for, request
 from flask_login import login_required
 import sqlalchemy as sa
-from sqlalchemy import func
 from app import db
 from app.models import Goal, GoalContribution
 from app.forms import GoalAddForm, GoalEditForm, GoalContributionForm
+from app.goal_service import GoalProgressService, GoalProjectionService, GOAL_ACTIVE, GOAL_DONE
+from app.query_budget import query_budget
 from datetime import date
 from markupsafe import Markup
-from decimal import Decimal
 
 bp = Blueprint('goals', __name__, url_prefix='/metas')
 
 @bp.route('/')
 @login_required
+@query_budget(2)
 def index():
     status_filter = request.args.get('status', 'Ativa')
 
@@ -22,77 +23,57 @@ def index():
         query = query.filter(Goal.status == status_filter)
 
     goals = db.session.scalars(query.order_by(Goal.target_date.asc())).all()
-    
-    sums_query = sa.select(
-        GoalContribution.goal_id, 
-        func.sum(GoalContribution.value)
-    ).group_by(GoalContribution.goal_id)
-    
-    sums_result = db.session.execute(sums_query).all()
-    balance_map = {goal_id: (total_saved or Decimal('0.00')) for goal_id, total_saved in sums_result}
-    
+
+    # O total salvo é mantido na própria meta (GoalProgressService): nenhuma soma de contribuições aqui.
+    # As previsões das metas ativas vêm do cache; as que faltam são calculadas juntas, em uma consulta.
+    projections = GoalProjectionService.projections([goal for goal in goals if goal.status == GOAL_ACTIVE])
     goals_data = []
     for goal in goals:
-        saved_value = balance_map.get(goal.id, Decimal('0.00'))
-        # Cálculo com Decimal: evitar divisão por zero
-        if goal.target_value > 0:
-            progress_percent = (saved_value / goal.target_value) * 100
-        else:
-            progress_percent = Decimal(0)
-            
+        saved_value, remaining_value, progress_percent = GoalProgressService.progress(goal)
         goals_data.append({
             'goal': goal,
             'saved_value': saved_value,
-            'remaining_value': goal.target_value - saved_value,
+            'remaining_value': remaining_value,
             'progress_percent': progress_percent,
+            'projection': projections.get(goal.id),
         })
         
     return render_template('metas.html', goals_data=goals_data, current_status=status_filter)
 
 @bp.route('/<int:goal_id>', methods=['GET', 'POST'])
 @login_required
+@query_budget(3, goal_id='{goal_id}')
 def details(goal_id):
     goal = db.get_or_404(Goal, goal_id)
     form = GoalContributionForm()
 
-    saved_value = db.session.scalar(
-        sa.select(func.sum(GoalContribution.value)).where(GoalContribution.goal_id == goal.id)
-    ) or Decimal('0.00')
-
     if form.validate_on_submit():
         if goal.status != 'Ativa':
             flash('Não é possível adicionar contribuições a metas concluídas ou canceladas.', 'warning')
             return redirect(url_for('goals.details', goal_id=goal.id))
         
-        if saved_value >= goal.target_value:
+        if goal.saved_total >= goal.target_value:
             flash('A meta já foi atingida. Não é possível adicionar mais contribuições.', 'warning')
             return redirect(url_for('goals.details', goal_id=goal.id))
 
-        new_contribution = GoalContribution(
-            value=form.value.data,
-            contribution_date=form.contribution_date.data,
-            goal_id=goal.id
-        )
-        db.session.add(new_contribution)
+        GoalProgressService.add_contribution(goal, form.value.data, form.contribution_date.data,
+                                             link_transaction=form.link_transaction.data)
         db.session.commit()
         flash('Contribuição adicionada!', 'success')
 
-        if (saved_value + new_contribution.value) >= goal.target_value:
+        # A conclusão ao atingir o alvo acontece no mesmo UPDATE que soma a contribuição
+        if goal.status == GOAL_DONE:
             edit_url = url_for('goals.edit_goal', goal_id=goal.id)
             message = Markup(
-                f'Parabéns! A meta "{goal.name}" foi atingida. '
-                f'<a href="{edit_url}" class="alert-link">Clique aqui para marcá-la como "Concluída".</a>'
+                f'Parabéns! A meta "{goal.name}" foi atingida e marcada como "Concluída". '
+                f'<a href="{edit_url}" class="alert-link">Editar a meta</a>'
             )
             flash(message, 'info')
 
         return redirect(url_for('goals.details', goal_id=goal.id))
 
-    if goal.target_value > 0:
-        progress_percent = (saved_value / goal.target_value) * 100
-    else:
-        progress_percent = Decimal(0)
-        
-    remaining_value = goal.target_value - saved_value
+    saved_value, remaining_value, progress_percent = GoalProgressService.progress(goal)
+    projection = GoalProjectionService.projections([goal]).get(goal.id) if goal.status == GOAL_ACTIVE else None
 
     contributions = db.session.scalars(sa.select(GoalContribution).where(GoalContribution.goal_id == goal.id).order_by(GoalContribution.contribution_date.desc())).all()
     
@@ -100,6 +81,7 @@ def details(goal_id):
                            saved_value=saved_value,
                            remaining_value=remaining_value,
                            progress_percent=progress_percent,
+                           projection=projection,
                            contributions=contributions,
                            form=form)
 
@@ -166,18 +148,13 @@ def delete_contribution(goal_id, contribution_id):
         flash('Operação inválida.', 'danger')
         return redirect(url_for('goals.details', goal_id=goal_id))
     
-    db.session.delete(contribution)
+    previous_status = goal.status
+    GoalProgressService.remove_contribution(contribution)
     db.session.commit()
     flash('Contribuição excluída.', 'info')
 
-    if goal.status == 'Concluída':
-        total_saved_after_delete = db.session.scalar(
-            sa.select(func.sum(GoalContribution.value)).where(GoalContribution.goal_id == goal.id)
-        ) or Decimal('0.00')
-
-        if total_saved_after_delete < goal.target_value:
-            goal.status = 'Ativa'
-            db.session.commit()
-            flash(f'O status da meta "{goal.name}" foi revertido para "Ativa", pois o valor salvo ficou abaixo do alvo.', 'warning')
+    # A reabertura (total abaixo do alvo) acontece no mesmo UPDATE que desconta a contribuição
+    if previous_status == GOAL_DONE and goal.status == GOAL_ACTIVE:
+        flash(f'O status da meta "{goal.name}" foi revertido para "Ativa", pois o valor salvo ficou abaixo do alvo.', 'warning')
     
     return redirect(url_for('goals.details', goal_id=goal_id))
\ No newline at end of file
@@ -1,9 +1,14 @@
 # app/blueprints/kanban.py
 from flask import render_template, Blueprint, jsonify, request
 from flask_login import login_required
+import json
 import sqlalchemy as sa
+from sqlalchemy import func
 from app import db
-from app.models import Session, KANBAN_STAGES
+from app.models import ChangeEvent, DataVersion, Session, KANBAN_STAGES
+from app.session_service import selection_reset_required
+from app.query_budget import query_budget
+from app.http_cache import cached_page
 from sqlalchemy.orm import joinedload
 from datetime import datetime, date
 
@@ -12,9 +17,56 @@ bp = Blueprint('kanban', __name__, url_prefix='/kanban')
 EDITING_STAGE = 'Edição' 
 ARCHIVE_STAGE = KANBAN_STAGES[-1]
 
+# Tabelas cujos nomes aparecem nos cartões (cliente e tipo): mudar qualquer uma exige o quadro inteiro
+CARD_NAME_TABLES = ('client', 'session_type')
+# Acima disso, o sync devolve o quadro inteiro em vez de seguir os eventos um a um
+MAX_DELTA_EVENTS = 500
+
+def board_cursor():
+    """
+    Cursor do sync incremental: "<último ChangeEvent do estúdio>|<versão de clientes + tipos>", em uma consulta.
+    Os eventos são gravados na mesma transação das escritas e o SQLite tem um único escritor, então os ids
+    seguem a ordem de commit (ao contrário de updated_at, carimbado em Python antes do commit).
+    """
+    last_event, names_version = db.session.execute(sa.select(
+        sa.select(func.max(ChangeEvent.id)).scalar_subquery(),
+        sa.select(func.sum(DataVersion.version)).where(DataVersion.table_name.in_(CARD_NAME_TABLES)).scalar_subquery(),
+    )).one()
+    return f"{last_event or 0}|{names_version or 0}"
+
+def _parse_cursor(cursor):
+    """(id do último evento, versão de clientes + tipos) de um cursor; ValueError se malformado."""
+    last_event, names_version = cursor.split('|', 1)
+    return int(last_event), int(names_version)
+
+def changed_session_ids(since_event):
+    """
+    Ids dos ensaios tocados por eventos posteriores a `since_event`, ou None quando o sync precisa do quadro
+    inteiro (eventos já podados da fila ou em quantidade grande demais).
+    """
+    if since_event and db.session.get(ChangeEvent, since_event) is None:
+        return None
+    events = db.session.execute(
+        sa.select(ChangeEvent.event_type, ChangeEvent.payload)
+        .where(ChangeEvent.id > since_event, ChangeEvent.event_type.startswith('session.'))
+        .order_by(ChangeEvent.id).limit(MAX_DELTA_EVENTS + 1)
+    ).all()
+    if len(events) > MAX_DELTA_EVENTS:
+        return None
+    ids = set()
+    for event in events:
+        payload = json.loads(event.payload)
+        ids.update(payload.get('session_ids') or [payload.get('session_id')])
+    ids.discard(None)
+    return ids
+
 @bp.route('/')
 @login_required
+@query_budget(3)
+@cached_page('session', 'client', 'session_type', fragment=True)
 def index():
+    # ETag/304 pelo cache HTTP (inclui o dia, pois as cores de prazo dependem da data atual)
+    cursor = board_cursor()
     sessions = db.session.scalars(
         sa.select(Session)
         .options(joinedload(Session.client), joinedload(Session.type)) 
@@ -33,7 +85,50 @@ def index():
             # Fallback para segurança
             kanban_data[KANBAN_STAGES[0]].append(session)
 
-    return render_template('kanban.html', kanban_data=kanban_data, stages=KANBAN_STAGES, KANBAN_STAGES=KANBAN_STAGES)
+    return render_template('kanban.html', kanban_data=kanban_data, stages=KANBAN_STAGES,
+                           KANBAN_STAGES=KANBAN_STAGES, board_cursor=cursor)
+
+@bp.route('/delta')
+@login_required
+def delta():
+    """
+    Sync incremental: devolve apenas os cartões alterados desde o cursor informado (?since=),
+    já renderizados, mais a lista de ids ativos para o cliente remover cartões excluídos.
+    """
+    since_str = request.args.get('since', '')
+    try:
+        since_event, since_names = _parse_cursor(since_str) if since_str else (None, None)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Cursor inválido.'}), 400
+
+    cursor = board_cursor()
+    if since_str == cursor:
+        return jsonify({'success': True, 'cursor': cursor, 'cards': [], 'card_ids': None})
+
+    # Nome de cliente ou tipo alterado: todos os cartões podem ter mudado
+    session_ids = None
+    if since_event is not None and since_names == _parse_cursor(cursor)[1]:
+        session_ids = changed_session_ids(since_event)
+
+    query = sa.select(Session).options(joinedload(Session.client), joinedload(Session.type))
+    if session_ids is not None:
+        query = query.filter(Session.id.in_(session_ids))
+    else:
+        query = query.filter(Session.kanban_status != ARCHIVE_STAGE)
+    changed = db.session.scalars(query.order_by(Session.session_date.asc())).all() if session_ids != set() else []
+
+    cards = []
+    for session in changed:
+        status = session.kanban_status if session.kanban_status in KANBAN_STAGES else KANBAN_STAGES[0]
+        cards.append({
+            'id': session.id,
+            'status': status,
+            'archived': status == ARCHIVE_STAGE,
+            'html': '' if status == ARCHIVE_STAGE else render_template('kanban_card.html', session=session),
+        })
+
+    card_ids = db.session.scalars(sa.select(Session.id).filter(Session.kanban_status != ARCHIVE_STAGE)).all()
+    return jsonify({'success': True, 'cursor': cursor, 'cards': cards, 'card_ids': card_ids})
 
 @bp.route('/update_status', methods=['POST'])
 @login_required
@@ -59,15 +154,8 @@ def update_status():
         return jsonify({'success': True, 'action_required': 'confirm_selection_date', 'message': 'Confirmação de data necessária.'})
 
     # Reset data de seleção se voltar antes da edição (regra de negócio opcional, mantida do original)
-    try:
-        old_status_index = KANBAN_STAGES.index(old_status)
-        new_status_index = KANBAN_STAGES.index(new_status)
-        editing_stage_index = KANBAN_STAGES.index(EDITING_STAGE)
-        
-        if old_status_index >= editing_stage_index and new_status_index < editing_stage_index:
-            session.selection_completed_date = None
-    except ValueError:
-        pass
+    if selection_reset_required(old_status, new_status):
+        session.selection_completed_date = None
 
     session.kanban_status = new_status
     db.session.commit()
@@ -0,0 +1,39 @@
+# app/blueprints/monitoring.py
+import hmac
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from flask_login import current_user, login_required
+from app import limiter, metrics
+from app.instrumentation import monitor
+
+bp = Blueprint('monitoring', __name__)
+
+@bp.route('/monitoramento/desempenho')
+@login_required
+def performance():
+    """
+    Métricas de desempenho deste worker em JSON: latência (p50/p95/p99 e histograma),
+    consultas e tempo de banco/templates por endpoint, mais as últimas consultas lentas.
+    ?reset=1 zera a janela depois de ler.
+    Os dados misturam todos os estúdios: só para os operadores listados em PERF_OPERATORS.
+    """
+    if current_user.username not in current_app.config.get('PERF_OPERATORS', ()):
+        abort(404)
+    data = monitor.snapshot()
+    if request.args.get('reset') == '1':
+        monitor.reset()
+    return jsonify(data)
+
+@bp.route('/metrics')
+@limiter.exempt
+def prometheus():
+    """
+    Exportador no formato texto do Prometheus (somando todos os workers em modo multiprocesso).
+    Só responde com METRICS_TOKEN configurado: sem ele a rota não existe (404).
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if not current_app.config.get('METRICS_ENABLED') or not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    body, content_type = metrics.render_latest()
+    return Response(body, content_type=content_type)
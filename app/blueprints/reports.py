@@ -1,18 +1,26 @@
 # app/blueprints/reports.py
-from flask import render_template, Blueprint, request, redirect, url_for
+from flask import render_template, Blueprint, request, redirect, url_for, Response, abort, jsonify
 from flask_login import login_required
 import sqlalchemy as sa
 from sqlalchemy import func, case
 from app import db, get_month_name_pt_br
-from app.models import Transaction, Client, Session, SessionType
-from app.forms import DateRangeFilterForm
+from app.models import Transaction, Client, Session
+from app.forms import DateRangeFilterForm, ProfitabilityFilterForm
+from app.http_cache import cached_page
+from app.read_routing import read_only
+from app.cohort_report import CohortReportService
+from app.profitability import CostAllocationService, ALLOCATION_BASES
+from app.pivot import PivotService, PivotError, SOURCES as PIVOT_SOURCES, PRESETS as PIVOT_PRESETS, MAX_DIMENSIONS as MAX_PIVOT_DIMENSIONS
 from datetime import date, datetime
 from decimal import Decimal
 
 bp = Blueprint('reports', __name__, url_prefix='/relatorios')
 
-def get_dates_from_request():
-    """Helper para obter e validar datas da URL, com fallback para o ano corrente."""
+# Tabelas lidas pelos relatórios (versões que compõem a ETag)
+REPORT_TABLES = ('transaction', 'session', 'client', 'session_type')
+
+def get_dates_from_request(default_start=None):
+    """Helper para obter e validar datas da URL, com fallback para o ano corrente (ou a partir de default_start)."""
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
     today = date.today()
@@ -28,7 +36,7 @@ def get_dates_from_request():
         start_date, end_date = None, None
 
     if not start_date or not end_date:
-        start_date = date(today.year, 1, 1)
+        start_date = default_start or date(today.year, 1, 1)
         end_date = today
         
     return start_date, end_date
@@ -40,6 +48,8 @@ def index():
 
 @bp.route('/financeiro')
 @login_required
+@read_only
+@cached_page(*REPORT_TABLES, fragment=True)
 def financial_performance():
     form = DateRangeFilterForm(request.args, meta={'csrf': False})
     start_date, end_date = get_dates_from_request()
@@ -79,6 +89,8 @@ def financial_performance():
 
 @bp.route('/leads')
 @login_required
+@read_only
+@cached_page(*REPORT_TABLES, fragment=True)
 def lead_source_analysis():
     form = DateRangeFilterForm(request.args, meta={'csrf': False})
     start_date, end_date = get_dates_from_request()
@@ -124,52 +136,85 @@ def lead_source_analysis():
 
 @bp.route('/lucratividade')
 @login_required
+@read_only
+@cached_page(*REPORT_TABLES, fragment=True)
 def profitability_analysis():
+    form = ProfitabilityFilterForm(request.args, meta={'csrf': False})
+    start_date, end_date = get_dates_from_request()
+
+    form.start_date.data = start_date
+    form.end_date.data = end_date
+    basis = request.args.get('basis') if request.args.get('basis') in ALLOCATION_BASES else 'count'
+    form.basis.data = basis
+
+    report = CostAllocationService.report(start_date, end_date, basis)
+
+    return render_template('report_profitability.html', form=form, report=report, results=report['types'])
+
+@bp.route('/coortes')
+@login_required
+@read_only
+@cached_page(*REPORT_TABLES, fragment=True)
+def cohort_analysis():
+    form = DateRangeFilterForm(request.args, meta={'csrf': False})
+    # Coortes precisam de histórico: por padrão, os primeiros ensaios dos últimos dois anos
+    start_date, end_date = get_dates_from_request(default_start=date(date.today().year - 2, 1, 1))
+
+    form.start_date.data = start_date
+    form.end_date.data = end_date
+
+    view = 'revenue' if request.args.get('view') == 'revenue' else 'retention'
+    report = CohortReportService.build(start_date, end_date)
+
+    return render_template('report_cohort.html', form=form, report=report, view=view,
+                           get_month_name_pt_br=get_month_name_pt_br)
+
+def get_pivot_from_request():
+    """Consulta da tabela dinâmica a partir da URL: ?preset=<nome> ou ?source=&dim=&dim=&measure=&rollup=1."""
+    preset = request.args.get('preset')
+    if preset in PIVOT_PRESETS:
+        return PIVOT_PRESETS[preset][1]
+    if 'source' not in request.args:
+        return next(iter(PIVOT_PRESETS.values()))[1]
+    return PivotService.parse(
+        request.args['source'], request.args.getlist('dim'), request.args.getlist('measure'),
+        rollup=request.args.get('rollup') == '1')
+
+@bp.route('/dinamico')
+@login_required
+@read_only
+@cached_page(*REPORT_TABLES, fragment=True)
+def pivot():
     form = DateRangeFilterForm(request.args, meta={'csrf': False})
     start_date, end_date = get_dates_from_request()
 
     form.start_date.data = start_date
     form.end_date.data = end_date
-    
-    revenue_subquery = sa.select(
-        Transaction.session_id,
-        func.sum(Transaction.value).label('revenue')
-    ).where(
-        Transaction.transaction_type == 'entry',
-        Transaction.transaction_date.between(start_date, end_date)
-    ).group_by(Transaction.session_id).subquery()
-
-    profit_query = sa.select(
-        SessionType.name.label('session_type_name'),
-        func.count(Session.id).label('session_count'),
-        func.sum(revenue_subquery.c.revenue).label('total_revenue'),
-        func.sum(Session.session_cost).label('total_cost')
-    ).join(
-        SessionType, Session.session_type_id == SessionType.id
-    ).outerjoin(
-        revenue_subquery, Session.id == revenue_subquery.c.session_id
-    ).where(
-        Session.session_date.between(start_date, end_date)
-    ).group_by(
-        SessionType.name
-    )
-    
-    results_raw = db.session.execute(profit_query).all()
-    
-    results_with_profit = []
-    for row in results_raw:
-        rev = row.total_revenue or Decimal('0.00')
-        cost = row.total_cost or Decimal('0.00')
-        profit = rev - cost
-        
-        results_with_profit.append({
-            'session_type_name': row.session_type_name,
-            'session_count': row.session_count,
-            'total_revenue': rev,
-            'total_cost': cost,
-            'profit': profit
-        })
-        
-    results = sorted(results_with_profit, key=lambda x: x['profit'], reverse=True)
 
-    return render_template('report_profitability.html', form=form, results=results)
\ No newline at end of file
+    result, error = None, None
+    try:
+        query = get_pivot_from_request()
+        result = PivotService.run(query, start_date, end_date)
+    except PivotError as e:
+        query, error = None, str(e)
+
+    return render_template('report_pivot.html', form=form, query=query, result=result, error=error,
+                           sources=PIVOT_SOURCES, presets=PIVOT_PRESETS, max_dimensions=MAX_PIVOT_DIMENSIONS)
+
+@bp.route('/dinamico/exportar')
+@login_required
+@read_only
+@cached_page(*REPORT_TABLES)
+def pivot_export():
+    start_date, end_date = get_dates_from_request()
+    try:
+        result = PivotService.run(get_pivot_from_request(), start_date, end_date)
+    except PivotError as e:
+        abort(400, description=str(e))
+
+    if request.args.get('format') == 'json':
+        return jsonify(result.to_dict())
+    filename = f'tabela-{result.source}-{start_date.isoformat()}-{end_date.isoformat()}.csv'
+    # BOM para o Excel reconhecer UTF-8 (acentos)
+    return Response('\ufeff' + result.to_csv(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
@@ -1,31 +1,28 @@
 # app/blueprints/sessions.py
-from flask import render_template, flash, redirect, url_for, request, Blueprint, abort
+from flask import render_template, flash, redirect, url_for, request, Blueprint, abort, jsonify, current_app
 from flask_login import login_required
 import sqlalchemy as sa
 from app import db, get_month_name_pt_br
 from app.forms import SessionForm, SessionEditForm, SessionFilterForm
 from app.models import Session, Transaction, Client, SessionType, Configuration, KANBAN_STAGES
 from app.finance_service import SessionFinanceService # Serviço de Domínio
-from sqlalchemy import func, or_
-from datetime import date
+from app.session_service import SessionBulkService, filter_sessions, session_code_for
+from app.query_budget import query_budget
+from app.http_cache import cached_page
+from app.read_routing import archive_readable, archive_requested
+from app.archive import ArchiveService, ArchiveError
+from sqlalchemy import func
+from datetime import date, datetime
 from decimal import Decimal
 from sqlalchemy.orm import joinedload, selectinload
-import re
-import unicodedata
+from werkzeug.datastructures import MultiDict
 
 bp = Blueprint('sessions', __name__)
 
-def sanitize_text(text):
-    """Remove acentos e caracteres especiais para uso em códigos/URLs."""
-    if not text: return ""
-    nfkd_form = unicodedata.normalize('NFKD', text)
-    sanitized = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
-    sanitized = re.sub(r'[^a-zA-Z0-9]', '', sanitized)
-    return sanitized.upper()
-
 @bp.route('/')
 @bp.route('/index')
 @login_required
+@cached_page('transaction', 'session', fragment=True)
 def index():
     today = date.today()
     month, year = today.month, today.year
@@ -45,26 +42,32 @@ def index():
                            total_entries_month=entries_month, total_exits_month=exits_month, balance_month=entries_month - exits_month, monthly_session_count=monthly_session_count,
                            total_entries_year=entries_year, total_exits_year=exits_year, balance_year=entries_year - exits_year, yearly_session_count=yearly_session_count)
 
+def apply_session_filters(query, filter_form):
+    """Aplica os filtros do SessionFilterForm (status, busca, cliente, tipo, período) a um SELECT."""
+    return filter_sessions(
+        query, status=filter_form.status.data, search=filter_form.search.data,
+        client_id=filter_form.client.data.id if filter_form.client.data else None,
+        session_type_id=filter_form.session_type.data.id if filter_form.session_type.data else None,
+        start_date=filter_form.start_date.data, end_date=filter_form.end_date.data)
+
 @bp.route('/sessoes')
 @login_required
+@archive_readable
+@query_budget(4)
 def sessoes():
     filter_form = SessionFilterForm(request.args, meta={'csrf': False})
     query = sa.select(Session).options(joinedload(Session.client), joinedload(Session.type))
-    
-    query = query.filter(Session.kanban_status == KANBAN_STAGES[-1]) if filter_form.status.data == 'arquivados' else query.filter(Session.kanban_status != KANBAN_STAGES[-1])
-        
-    if filter_form.search.data:
-        search_term = f"%{filter_form.search.data}%"
-        query = query.join(Client).filter(or_(Client.name.ilike(search_term), Session.session_code.ilike(search_term)))
-    if filter_form.client.data: query = query.filter(Session.client_id == filter_form.client.data.id)
-    if filter_form.session_type.data: query = query.filter(Session.session_type_id == filter_form.session_type.data.id)
-    if filter_form.start_date.data: query = query.filter(Session.session_date >= filter_form.start_date.data)
-    if filter_form.end_date.data: query = query.filter(Session.session_date <= filter_form.end_date.data)
+    query = apply_session_filters(query, filter_form)
         
     sort_logic = {'date_desc': Session.session_date.desc(), 'date_asc': Session.session_date.asc(), 'value_desc': Session.total_value.desc(), 'value_asc': Session.total_value.asc()}
     query = query.order_by(sort_logic.get(filter_form.sort_by.data, Session.session_date.desc()))
-    
-    return render_template('sessoes.html', sessions=db.session.scalars(query).all(), filter_form=filter_form)
+    sessions = db.session.scalars(query).all()
+
+    # Com ?arquivo=1 a listagem inclui o histórico arquivado (somente leitura: sem ações nessas linhas)
+    include_archive = archive_requested()
+    archived = ArchiveService.archived_ids(Session, [session.id for session in sessions]) if include_archive else set()
+    return render_template('sessoes.html', sessions=sessions, filter_form=filter_form, stages=KANBAN_STAGES,
+                           include_archive=include_archive, archived=archived)
 
 @bp.route('/sessoes/restore/<int:session_id>', methods=['POST', 'GET'])
 @login_required
@@ -75,12 +78,80 @@ def restore_session(session_id):
     flash(f'O ensaio "{session.session_code}" foi restaurado.', 'success')
     return redirect(url_for('sessions.sessoes', status='arquivados'))
 
+@bp.route('/sessoes/bulk', methods=['POST'])
+@login_required
+def bulk_action():
+    """
+    Ações em lote: archive, restore, stage (mudança de etapa) e delete.
+    Alvo: lista 'session_ids' ou, com 'use_filter', os mesmos campos do SessionFilterForm.
+    Aceita formulário (redireciona com flash) ou JSON (responde JSON).
+    """
+    is_json = request.is_json
+    payload = (request.get_json(silent=True) or {}) if is_json else request.form
+    action = payload.get('action')
+
+    if is_json:
+        session_ids = payload.get('session_ids') or []
+        filter_data = MultiDict(payload.get('filter') or {})
+        use_filter = bool(payload.get('use_filter'))
+    else:
+        session_ids = payload.getlist('session_ids')
+        filter_data = payload
+        use_filter = bool(payload.get('use_filter'))
+
+    def respond(success, message, category='success', status_code=200, **extra):
+        if is_json:
+            return jsonify({'success': success, 'message': message, **extra}), status_code
+        flash(message, category)
+        return redirect(url_for('sessions.sessoes', status=filter_data.get('status') or None))
+
+    if action not in ('archive', 'restore', 'stage', 'delete'):
+        return respond(False, 'Ação em lote inválida.', 'danger', 400)
+
+    if use_filter:
+        filter_form = SessionFilterForm(filter_data, meta={'csrf': False})
+        session_ids = db.session.scalars(apply_session_filters(sa.select(Session.id), filter_form)).all()
+    else:
+        try:
+            session_ids = [int(session_id) for session_id in session_ids]
+        except (TypeError, ValueError):
+            return respond(False, 'Lista de ensaios inválida.', 'danger', 400)
+
+    if not session_ids:
+        return respond(False, 'Nenhum ensaio selecionado.', 'warning', 400)
+
+    skipped = 0
+    if action == 'delete':
+        affected = ArchiveService.trash_sessions(session_ids)
+        message = f'{affected} ensaio(s) e suas transações foram movidos para a lixeira.'
+    else:
+        new_status = {'archive': KANBAN_STAGES[-1], 'restore': KANBAN_STAGES[0]}.get(action) or payload.get('new_status')
+        if new_status not in KANBAN_STAGES:
+            return respond(False, 'Etapa inválida.', 'danger', 400)
+
+        selection_date = None
+        if payload.get('selection_date'):
+            try:
+                selection_date = datetime.strptime(payload.get('selection_date'), '%Y-%m-%d').date()
+            except ValueError:
+                return respond(False, 'Formato de data inválido.', 'danger', 400)
+
+        affected, skipped = SessionBulkService.change_stage(session_ids, new_status, selection_date)
+        message = f'{affected} ensaio(s) movido(s) para "{new_status}".'
+        if skipped:
+            message += f' {skipped} ignorado(s) por não terem data de seleção.'
+
+    db.session.commit()
+    return respond(True, message, 'warning' if skipped else 'success', affected=affected, skipped=skipped)
+
 @bp.route('/add_session', methods=['GET', 'POST'])
 @login_required
 def add_session():
     form = SessionForm()
     if not db.session.query(SessionType).count():
         flash('Cadastre um "Tipo de Ensaio" nas configurações primeiro.', 'warning')
+        if 'config' not in current_app.config['ENABLED_BLUEPRINTS']:
+            return redirect(url_for('sessions.sessoes'))
         return redirect(url_for('config.session_types'))
         
     if form.validate_on_submit():
@@ -116,9 +187,7 @@ def add_session():
         db.session.flush()
         
         # 3. Geração do Código
-        cleaned_name = sanitize_text(target_client.name)
-        first_name = cleaned_name.split()[0] if cleaned_name.split() else f"CLI{target_client.id}"
-        session.session_code = f"{session.session_date.strftime('%y%m%d')}_{first_name}_{session.type.abbreviation}_{session.id}"
+        session.session_code = session_code_for(session, target_client)
         
         # 4. Sincronização Financeira via Serviço (Unificado!)
         # Aqui substituímos 30 linhas de código manual repetido pela chamada segura
@@ -180,13 +249,59 @@ def edit_session(session_id):
         printing = (Decimal(session.printing_qty) * session.printing_unit_price)
         form.printing_paid.data = True if printing <= 0 else session.has_printing_transaction
         
-    return render_template('edit_session.html', form=form)
+    return render_template('edit_session.html', form=form, session_id=session_id)
 
 @bp.route('/delete_session/<int:session_id>', methods=['POST', 'GET'])
 @login_required
 def delete_session(session_id):
     session = db.get_or_404(Session, session_id)
-    db.session.delete(session)
+    session_code = session.session_code
+    ArchiveService.trash_sessions([session.id])
+    db.session.commit()
+    flash(f'Ensaio "{session_code}" e todas as transações associadas foram movidos para a lixeira.', 'info')
+    return redirect(url_for('sessions.sessoes'))
+
+# LIXEIRA (exclusões de ensaios e lançamentos, restauráveis até o `flask archive purge`)
+@bp.route('/lixeira')
+@login_required
+@query_budget(3)
+def lixeira():
+    sessions, transactions = ArchiveService.trash()
+    return render_template('lixeira.html', sessions=sessions, transactions=transactions,
+                           trash_days=current_app.config.get('ARCHIVE_TRASH_DAYS', 30))
+
+@bp.route('/lixeira/ensaio/<int:session_id>/restaurar', methods=['POST'])
+@login_required
+def restore_trashed_session(session_id):
+    try:
+        session = ArchiveService.restore_session(session_id)
+        session_code = session.session_code
+        db.session.commit()
+    except ArchiveError as error:
+        db.session.rollback()
+        flash(str(error), 'danger')
+        return redirect(url_for('sessions.lixeira'))
+    flash(f'Ensaio "{session_code}" restaurado com seus lançamentos.', 'success')
+    return redirect(url_for('sessions.lixeira'))
+
+@bp.route('/lixeira/lancamento/<int:transaction_id>/restaurar', methods=['POST'])
+@login_required
+def restore_trashed_transaction(transaction_id):
+    try:
+        transaction = ArchiveService.restore_transaction(transaction_id)
+        description = transaction.description
+        db.session.commit()
+    except ArchiveError as error:
+        db.session.rollback()
+        flash(str(error), 'danger')
+        return redirect(url_for('sessions.lixeira'))
+    flash(f'Lançamento "{description}" restaurado.', 'success')
+    return redirect(url_for('sessions.lixeira'))
+
+@bp.route('/lixeira/esvaziar', methods=['POST'])
+@login_required
+def empty_trash():
+    sessions, transactions = ArchiveService.purge(days=0)
     db.session.commit()
-    flash('Ensaio e todas as transações associadas foram excluídos.', 'info')
-    return redirect(url_for('sessions.sessoes'))
\ No newline at end of file
+    flash(f'Lixeira esvaziada: {sessions} ensaio(s) e {transactions} lançamento(s) apagados definitivamente.', 'info')
+    return redirect(url_for('sessions.lixeira'))
\ No newline at end of file
@@ -0,0 +1,146 @@
+# app/change_events.py
+import itertools
+import json
+import threading
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from app import db
+from app.models import ChangeEvent, Session, Transaction
+
+# Eventos mais antigos que isso são descartados (o stream só precisa do passado recente para reconexões)
+EVENT_RETENTION = timedelta(hours=1)
+PRUNE_EVERY = 100
+
+class ChangeBroker:
+    """
+    Pub/sub em processo. Não carrega os eventos em si: apenas acorda os streams SSE deste
+    worker logo após um commit. O conteúdo é sempre lido da tabela ChangeEvent, o que também
+    cobre eventos gravados por outros workers (percebidos no próximo polling).
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0
+
+    def notify(self):
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait(self, generation, timeout):
+        """Espera por um commit posterior a `generation` (ou pelo timeout). Retorna a geração atual."""
+        with self._condition:
+            if self._generation == generation:
+                self._condition.wait(timeout)
+            return self._generation
+
+    @property
+    def generation(self):
+        return self._generation
+
+broker = ChangeBroker()
+_write_counter = itertools.count(1)
+
+def queue_event(session, event_type, **payload):
+    """Agenda um evento para ser gravado na mesma transação do banco (flush/commit atual)."""
+    session.info.setdefault('change_events', []).append((event_type, payload))
+
+def queue_totals_changed(session, days):
+    """Marca os dias cujo saldo/totais mudaram; vira um único evento 'ledger.totals_changed'."""
+    session.info.setdefault('changed_days', set()).update(days)
+
+def fetch_events(after_id, limit=200):
+    """Eventos posteriores ao id informado, em ordem."""
+    return db.session.scalars(
+        sa.select(ChangeEvent).where(ChangeEvent.id > after_id).order_by(ChangeEvent.id).limit(limit)
+    ).all()
+
+def last_event_id():
+    return db.session.scalar(sa.select(sa.func.max(ChangeEvent.id))) or 0
+
+def _json_default(value):
+    return str(value)
+
+def _write_pending(session):
+    events = session.info.pop('change_events', [])
+    changed_days = session.info.pop('changed_days', None)
+    if changed_days:
+        months = sorted({day.strftime('%Y-%m') for day in changed_days})
+        events.append(('ledger.totals_changed', {'months': months}))
+    if not events:
+        return
+
+    now = datetime.utcnow()
+    connection = session.connection()
+    table = ChangeEvent.__table__
+    connection.execute(table.insert(), [
+        {'created_at': now, 'event_type': event_type, 'payload': json.dumps(payload, default=_json_default)}
+        for event_type, payload in events
+    ])
+    session.info['change_events_written'] = True
+
+    # Poda ocasional da fila, no mesmo commit
+    if next(_write_counter) % PRUNE_EVERY == 0:
+        connection.execute(table.delete().where(table.c.created_at < now - EVENT_RETENTION))
+
+# CAPTURA VIA EVENTOS DO ORM
+@sa.event.listens_for(Session, 'after_insert')
+def _session_created(mapper, connection, target):
+    queue_event(sa.orm.object_session(target), 'session.created', session_id=target.id, status=target.kanban_status)
+
+@sa.event.listens_for(Session, 'after_update')
+def _session_updated(mapper, connection, target):
+    history = sa.inspect(target).attrs.kanban_status.history
+    if history.has_changes():
+        old_status = history.deleted[0] if history.deleted else None
+        queue_event(sa.orm.object_session(target), 'session.stage_changed',
+                    session_id=target.id, old_status=old_status, new_status=target.kanban_status)
+    else:
+        queue_event(sa.orm.object_session(target), 'session.updated', session_id=target.id)
+
+@sa.event.listens_for(Session, 'after_delete')
+def _session_deleted(mapper, connection, target):
+    queue_event(sa.orm.object_session(target), 'session.deleted', session_id=target.id)
+
+@sa.event.listens_for(Transaction, 'after_insert')
+def _transaction_created(mapper, connection, target):
+    session = sa.orm.object_session(target)
+    queue_event(session, 'transaction.created', transaction_id=target.id, session_id=target.session_id,
+                transaction_type=target.transaction_type, value=target.value, transaction_date=target.transaction_date)
+    queue_totals_changed(session, [target.transaction_date])
+
+@sa.event.listens_for(Transaction, 'after_update')
+def _transaction_updated(mapper, connection, target):
+    session = sa.orm.object_session(target)
+    queue_event(session, 'transaction.updated', transaction_id=target.id, session_id=target.session_id)
+    days = [target.transaction_date]
+    date_history = sa.inspect(target).attrs.transaction_date.history
+    days.extend(date_history.deleted)
+    queue_totals_changed(session, days)
+
+@sa.event.listens_for(Transaction, 'after_delete')
+def _transaction_deleted(mapper, connection, target):
+    session = sa.orm.object_session(target)
+    queue_event(session, 'transaction.deleted', transaction_id=target.id, session_id=target.session_id)
+    queue_totals_changed(session, [target.transaction_date])
+
+# GRAVAÇÃO NA MESMA TRANSAÇÃO E NOTIFICAÇÃO APÓS O COMMIT
+@sa.event.listens_for(sa.orm.Session, 'after_flush')
+def _events_after_flush(session, flush_context):
+    _write_pending(session)
+
+@sa.event.listens_for(sa.orm.Session, 'before_commit')
+def _events_before_commit(session):
+    # Eventos agendados por comandos em lote (sem flush do ORM) são gravados aqui
+    _write_pending(session)
+
+@sa.event.listens_for(sa.orm.Session, 'after_commit')
+def _events_after_commit(session):
+    if session.info.pop('change_events_written', False):
+        broker.notify()
+
+@sa.event.listens_for(sa.orm.Session, 'after_rollback')
+def _events_discard_pending(session):
+    session.info.pop('change_events', None)
+    session.info.pop('changed_days', None)
+    session.info.pop('change_events_written', None)
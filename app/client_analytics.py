@@ -0,0 +1,153 @@
+# app/client_analytics.py
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+import sqlalchemy as sa
+from sqlalchemy import func
+from app import db
+from app.models import Client, ClientMetrics, Configuration, Session, Transaction
+from app.http_cache import DataVersionService
+from app.tenancy import for_each_tenant, require_tenant_id, tenant_option
+
+# Tabelas que alimentam o retrato: qualquer escrita nelas o torna desatualizado
+SOURCE_TABLES = ('client', 'session', 'transaction')
+
+# Estado do retrato por estúdio (Configuration): guardado fora das linhas para que um estúdio
+# sem clientes, cujo retrato é vazio, também seja reconhecido como atualizado
+VERSION_KEY = 'client_analytics_version'
+REFRESHED_AT_KEY = 'client_analytics_refreshed_at'
+
+# Segmentos RFM (na ordem de exibição) -> cor do badge
+SEGMENTS = {
+    'Campeões': 'success',
+    'Fiéis': 'primary',
+    'Novos': 'info',
+    'Atenção': 'warning',
+    'Em risco': 'danger',
+    'Hibernando': 'secondary',
+    'Sem ensaios': 'light',
+}
+
+class ClientAnalyticsService:
+    """
+    Métricas por cliente, calculadas para todos de uma vez:
+    - recência (último ensaio), frequência (nº de ensaios) e valor monetário (entradas efetivadas dos ensaios);
+    - LTV: valor monetário menos as saídas efetivadas ligadas aos ensaios (custos);
+    - notas de 1 a 5 por percentil (empates recebem a mesma nota) e o segmento derivado delas.
+    O retrato (ClientMetrics) é reconstruído com um único INSERT ... SELECT agrupado; as telas apenas o leem.
+    """
+
+    @staticmethod
+    def source_version():
+        return ','.join(map(str, DataVersionService.versions(SOURCE_TABLES)))
+
+    @staticmethod
+    def _score(column, active):
+        # Percentil dentro dos clientes com ensaios: 1 + floor(percent_rank * 5), limitado a 5
+        percentile = func.percent_rank().over(partition_by=active, order_by=column.asc())
+        return sa.case((active, func.min(5, 1 + sa.cast(percentile * 5, sa.Integer))), else_=0)
+
+    @staticmethod
+    def metrics_select(source_version, refreshed_at):
+        """
+        SELECT com uma linha por cliente do estúdio atual, no formato da tabela client_metrics
+        (histórico arquivado incluso). Percentis calculados dentro do estúdio.
+        """
+        tenant_id = require_tenant_id()
+        from app.archive import ArchiveService  # import tardio: app.archive depende dos serviços de escrita
+        sessions = ArchiveService.union(Session)
+        ledger = ArchiveService.union(Transaction)
+        efetivado = ledger.status == 'efetivado'
+        entries = sa.case((sa.and_(ledger.transaction_type == 'entry', efetivado), ledger.value), else_=0)
+        exits = sa.case((sa.and_(ledger.transaction_type == 'exit', efetivado), ledger.value), else_=0)
+        totals = (
+            sa.select(
+                Client.id.label('client_id'),
+                func.min(sessions.session_date).label('first_session_date'),
+                func.max(sessions.session_date).label('last_session_date'),
+                func.count(sa.distinct(sessions.id)).label('frequency'),
+                func.coalesce(func.sum(entries), 0).label('monetary'),
+                func.coalesce(func.sum(entries) - func.sum(exits), 0).label('lifetime_value'),
+            )
+            .select_from(Client)
+            .outerjoin(sessions, sessions.client_id == Client.id)
+            .outerjoin(ledger, ledger.session_id == sessions.id)
+            .where(Client.tenant_id == tenant_id)
+            .group_by(Client.id)
+            .subquery()
+        )
+        active = totals.c.frequency > 0
+        scored = sa.select(
+            totals,
+            ClientAnalyticsService._score(totals.c.last_session_date, active).label('r_score'),
+            ClientAnalyticsService._score(totals.c.frequency, active).label('f_score'),
+            ClientAnalyticsService._score(totals.c.monetary, active).label('m_score'),
+        ).subquery()
+
+        r, f = scored.c.r_score, scored.c.f_score
+        segment = sa.case(
+            (scored.c.frequency == 0, 'Sem ensaios'),
+            (sa.and_(r >= 4, f >= 4), 'Campeões'),
+            (sa.and_(r <= 2, f >= 3), 'Em risco'),
+            (f >= 4, 'Fiéis'),
+            (sa.and_(r >= 4, f <= 2), 'Novos'),
+            (sa.and_(r <= 2, f <= 2), 'Hibernando'),
+            else_='Atenção',
+        )
+        return sa.select(
+            scored.c.client_id, scored.c.first_session_date, scored.c.last_session_date, scored.c.frequency,
+            scored.c.monetary, scored.c.lifetime_value, r, f, scored.c.m_score, segment,
+            sa.literal(source_version), sa.literal(refreshed_at, sa.DateTime), sa.literal(tenant_id),
+        )
+
+    @staticmethod
+    def refresh(source_version=None):
+        """
+        Reconstrói o retrato do estúdio atual (DELETE + INSERT ... SELECT na mesma transação)
+        e registra a versão das fontes usada. Retorna o nº de clientes.
+        """
+        source_version = source_version or ClientAnalyticsService.source_version()
+        refreshed_at = datetime.now()
+        tenant_id = require_tenant_id()
+        table = ClientMetrics.__table__
+        db.session.execute(sa.delete(table).where(table.c.tenant_id == tenant_id))
+        result = db.session.execute(sa.insert(table).from_select(
+            [column.name for column in table.columns],
+            ClientAnalyticsService.metrics_select(source_version, refreshed_at),
+        ))
+        # Pelo Core: o estado do retrato não deve versionar a tabela configuration (ETags das telas)
+        config = Configuration.__table__
+        db.session.execute(sa.delete(config).where(config.c.tenant_id == tenant_id,
+                                                   config.c.key.in_((VERSION_KEY, REFRESHED_AT_KEY))))
+        db.session.execute(sa.insert(config), [
+            {'tenant_id': tenant_id, 'key': VERSION_KEY, 'value': source_version},
+            {'tenant_id': tenant_id, 'key': REFRESHED_AT_KEY, 'value': refreshed_at.isoformat()},
+        ])
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def ensure_fresh():
+        """
+        Reconstrói o retrato se ensaios, lançamentos ou clientes mudaram desde a última vez
+        (com CLIENT_ANALYTICS_AUTO_REFRESH desligado, só pelo botão/comando). Retorna a data do retrato.
+        """
+        state = dict(db.session.execute(
+            sa.select(Configuration.key, Configuration.value).where(Configuration.key.in_((VERSION_KEY, REFRESHED_AT_KEY)))
+        ).all())
+        if current_app.config.get('CLIENT_ANALYTICS_AUTO_REFRESH', True):
+            source_version = ClientAnalyticsService.source_version()
+            if state.get(VERSION_KEY) != source_version:
+                ClientAnalyticsService.refresh(source_version)
+                return datetime.now()
+        return datetime.fromisoformat(state[REFRESHED_AT_KEY]) if REFRESHED_AT_KEY in state else None
+
+@click.command('clients-analytics')
+@tenant_option
+@with_appcontext
+def clients_analytics_command(tenant_key):
+    """Recalcula o retrato RFM/LTV dos clientes."""
+    for tenant_id in for_each_tenant(tenant_key):
+        count = ClientAnalyticsService.refresh()
+        click.echo(f'Estúdio #{tenant_id}: métricas recalculadas para {count} cliente(s).')
@@ -0,0 +1,274 @@
+# app/cohort_report.py
+import sqlite3
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from flask import current_app
+import sqlalchemy as sa
+from sqlalchemy import func
+from app import db
+from app.models import Session, SessionType, Transaction
+from app.tenancy import current_tenant_id
+from app.http_cache import DataVersionService, FragmentCache
+from app.read_routing import archive_engine_active
+
+# Tabelas lidas pelo relatório de coortes (versões que invalidam o cache)
+SOURCE_TABLES = ('session', 'transaction', 'session_type')
+
+# Colunas de meses após o primeiro ensaio exibidas na matriz (a última acumula o restante)
+COHORT_MONTHS = 12
+
+_cache = FragmentCache()
+
+def month_offset(start, end):
+    """Meses de calendário entre duas datas (jan/2024 -> mar/2024 = 2)."""
+    return (end.year - start.year) * 12 + end.month - start.month
+
+class CohortReportService:
+    """
+    Coortes de clientes pelo mês do primeiro ensaio:
+    - retorno: clientes que fizeram um segundo ensaio, acumulado por meses após o primeiro;
+    - troca de tipo: clientes que voltaram para um tipo diferente do primeiro (ex.: newborn -> smash the cake);
+    - faturamento: entradas efetivadas dos ensaios da coorte, acumulado por meses após o primeiro.
+    O cálculo usa funções de janela do SQLite (3.25+) com um único GROUP BY por (coorte, mês);
+    sem elas, o mesmo resultado é montado em Python a partir de uma leitura ordenada dos ensaios.
+    Sempre sobre o histórico completo (tabelas quentes + arquivo): quem é "novo" depende do primeiro ensaio.
+    """
+
+    @staticmethod
+    def window_functions_supported():
+        engine = current_app.config.get('COHORT_REPORT_ENGINE', 'auto')
+        if engine != 'auto':
+            return engine == 'sql'
+        return db.engine.dialect.name == 'sqlite' and sqlite3.sqlite_version_info >= (3, 25, 0)
+
+    @staticmethod
+    def _history(model):
+        """
+        Ensaios ou lançamentos com o histórico arquivado: o primeiro ensaio de um cliente pode já estar no arquivo.
+        Na engine de ?arquivo=1 as próprias tabelas já são a união (views); fora dela, ArchiveService.union.
+        """
+        if archive_engine_active():
+            return model
+        from app.archive import ArchiveService  # import tardio: app.archive depende dos serviços de escrita
+        return ArchiveService.union(model)
+
+    @staticmethod
+    def _session_revenue():
+        ledger = CohortReportService._history(Transaction)
+        efetivado = sa.and_(ledger.transaction_type == 'entry', ledger.status == 'efetivado')
+        return (
+            sa.select(ledger.session_id, func.sum(sa.case((efetivado, ledger.value), else_=0)).label('revenue'))
+            .where(ledger.session_id.isnot(None))
+            .group_by(ledger.session_id)
+            .subquery()
+        )
+
+    @staticmethod
+    def _sql_rows(start, end, today):
+        """Linhas (coorte, mês após o primeiro, novos, retornos, trocas de tipo, ensaios, faturamento) + transições."""
+        sessions = CohortReportService._history(Session)
+        revenue = CohortReportService._session_revenue()
+        order = (sessions.session_date, sessions.id)
+        window = {'partition_by': sessions.client_id, 'order_by': order}
+        ranked = (
+            sa.select(
+                sessions.id, sessions.client_id, sessions.session_date, sessions.session_type_id,
+                func.coalesce(revenue.c.revenue, 0).label('revenue'),
+                func.row_number().over(**window).label('seq'),
+                func.first_value(sessions.session_date).over(**window).label('first_date'),
+                func.first_value(sessions.session_type_id).over(**window).label('first_type_id'),
+            )
+            .outerjoin(revenue, revenue.c.session_id == sessions.id)
+            .where(sessions.session_date <= today)
+            .subquery()
+        )
+        # Segunda janela: ordem do ensaio entre os de tipo diferente do primeiro (1 = primeira troca)
+        other_type = ranked.c.session_type_id != ranked.c.first_type_id
+        flagged = sa.select(
+            ranked,
+            other_type.label('other_type'),
+            func.row_number().over(partition_by=(ranked.c.client_id, other_type),
+                                   order_by=(ranked.c.session_date, ranked.c.id)).label('other_seq'),
+        ).where(ranked.c.first_date.between(start, end)).subquery()
+        # A janela roda sobre todo o histórico; o filtro de período vale para a data do primeiro ensaio
+        # (filtrar antes mudaria quem é o "primeiro").
+
+        def part(fmt, column):
+            return sa.cast(func.strftime(fmt, column), sa.Integer)
+        offset = ((part('%Y', flagged.c.session_date) - part('%Y', flagged.c.first_date)) * 12
+                  + part('%m', flagged.c.session_date) - part('%m', flagged.c.first_date))
+        cohort = func.strftime('%Y-%m', flagged.c.first_date)
+        switched = sa.and_(flagged.c.other_type, flagged.c.other_seq == 1)
+
+        # Um único GROUP BY: (coorte, mês, tipo do primeiro ensaio, tipo para o qual trocou) alimenta as duas saídas
+        switched_type = sa.case((switched, flagged.c.session_type_id), else_=None)
+        grouped = db.session.execute(
+            sa.select(
+                cohort.label('cohort'), offset.label('month_offset'),
+                flagged.c.first_type_id, switched_type.label('switched_type_id'),
+                func.sum(sa.case((flagged.c.seq == 1, 1), else_=0)).label('new_clients'),
+                func.sum(sa.case((flagged.c.seq == 2, 1), else_=0)).label('returned'),
+                func.sum(sa.case((switched, 1), else_=0)).label('switched'),
+                func.count().label('sessions'),
+                func.sum(flagged.c.revenue).label('revenue'),
+            ).group_by('cohort', 'month_offset', flagged.c.first_type_id, 'switched_type_id')
+        ).all()
+
+        cells = defaultdict(lambda: [0, 0, 0, 0, Decimal('0')])
+        transitions = defaultdict(int)
+        for row in grouped:
+            cell = cells[(row.cohort, row.month_offset)]
+            for index, value in enumerate((row.new_clients, row.returned, row.switched, row.sessions)):
+                cell[index] += value or 0
+            cell[4] += Decimal(row.revenue or 0)
+            if row.switched_type_id is not None:
+                transitions[(row.first_type_id, row.switched_type_id)] += row.switched
+        return CohortReportService._flatten(cells, transitions)
+
+    @staticmethod
+    def _flatten(cells, transitions):
+        rows = [(cohort, offset, *values) for (cohort, offset), values in cells.items()]
+        return rows, [(first_type_id, type_id, count) for (first_type_id, type_id), count in transitions.items()]
+
+    @staticmethod
+    def _python_rows(start, end, today):
+        """Mesmo resultado de _sql_rows, percorrendo os ensaios ordenados por cliente e data."""
+        history = CohortReportService._history(Session)
+        revenue = CohortReportService._session_revenue()
+        sessions = db.session.execute(
+            sa.select(history.client_id, history.session_date, history.session_type_id,
+                      func.coalesce(revenue.c.revenue, 0))
+            .outerjoin(revenue, revenue.c.session_id == history.id)
+            .where(history.session_date <= today)
+            .order_by(history.client_id, history.session_date, history.id)
+        ).all()
+
+        cells = defaultdict(lambda: [0, 0, 0, 0, Decimal('0')])
+        transitions = defaultdict(int)
+        client_id = first = None
+        for row_client_id, session_date, type_id, value in sessions:
+            if row_client_id != client_id:
+                client_id, first, seq, switched = row_client_id, (session_date, type_id), 0, False
+            seq += 1
+            first_date, first_type_id = first
+            if not start <= first_date <= end:
+                continue
+            cell = cells[(first_date.strftime('%Y-%m'), month_offset(first_date, session_date))]
+            cell[0] += seq == 1
+            cell[1] += seq == 2
+            if type_id != first_type_id and not switched:
+                switched = True
+                cell[2] += 1
+                transitions[(first_type_id, type_id)] += 1
+            cell[3] += 1
+            cell[4] += Decimal(value)
+        return CohortReportService._flatten(cells, transitions)
+
+    @staticmethod
+    def _assemble(rows, transitions, today):
+        """Monta as coortes (acumulados por mês, limitados ao que já pôde ser observado) e as transições de tipo."""
+        by_cohort = defaultdict(dict)
+        for cohort, offset, new_clients, returning, switched, sessions, revenue in rows:
+            by_cohort[cohort][offset] = (new_clients or 0, returning or 0, switched or 0, sessions or 0,
+                                         Decimal(revenue or 0))
+
+        cohorts = []
+        for cohort in sorted(by_cohort):
+            cells = by_cohort[cohort]
+            year, month = map(int, cohort.split('-'))
+            clients = sum(cell[0] for cell in cells.values())
+            observed = min(month_offset(date(year, month, 1), today), COHORT_MONTHS)
+            retention, revenue_per_client = [], []
+            returned = total_revenue = 0
+            # A última coluna acumula todos os meses a partir de COHORT_MONTHS
+            buckets = defaultdict(lambda: [0, Decimal('0')])
+            for offset, cell in cells.items():
+                bucket = buckets[min(offset, COHORT_MONTHS)]
+                bucket[0] += cell[1]
+                bucket[1] += cell[4]
+            for offset in range(COHORT_MONTHS + 1):
+                returned += buckets[offset][0]
+                total_revenue += buckets[offset][1]
+                if offset > observed:
+                    retention.append(None)
+                    revenue_per_client.append(None)
+                else:
+                    retention.append(returned / clients * 100 if clients else 0)
+                    revenue_per_client.append(total_revenue / clients if clients else Decimal('0'))
+            switched = sum(cell[2] for cell in cells.values())
+            cohorts.append({
+                'cohort': cohort,
+                'year': year,
+                'month': month,
+                'clients': clients,
+                'returned': returned,
+                'switched': switched,
+                'repeat_rate': returned / clients * 100 if clients else 0,
+                'switch_rate': switched / clients * 100 if clients else 0,
+                'sessions': sum(cell[3] for cell in cells.values()),
+                'revenue': total_revenue,
+                'revenue_per_client': total_revenue / clients if clients else Decimal('0'),
+                'retention': retention,
+                'revenue_curve': revenue_per_client,
+            })
+
+        type_names = dict(db.session.execute(sa.select(SessionType.id, SessionType.name)).all()) if transitions else {}
+        first_type_clients = defaultdict(int)
+        for first_type_id, _, count in transitions:
+            first_type_clients[first_type_id] += count
+        type_transitions = sorted((
+            {
+                'from_type': type_names.get(first_type_id, '—'),
+                'to_type': type_names.get(type_id, '—'),
+                'clients': count,
+                'share': count / first_type_clients[first_type_id] * 100,
+            }
+            for first_type_id, type_id, count in transitions
+        ), key=lambda item: (-item['clients'], item['from_type'], item['to_type']))
+
+        total_clients = sum(item['clients'] for item in cohorts)
+        total_returned = sum(item['returned'] for item in cohorts)
+        total_switched = sum(item['switched'] for item in cohorts)
+        total_revenue = sum((item['revenue'] for item in cohorts), Decimal('0'))
+        return {
+            'cohorts': cohorts,
+            'transitions': type_transitions,
+            'months': COHORT_MONTHS,
+            'totals': {
+                'clients': total_clients,
+                'repeat_rate': total_returned / total_clients * 100 if total_clients else 0,
+                'switch_rate': total_switched / total_clients * 100 if total_clients else 0,
+                'revenue': total_revenue,
+                'revenue_per_client': total_revenue / total_clients if total_clients else Decimal('0'),
+            },
+        }
+
+    @staticmethod
+    def build(start_date, end_date, today=None):
+        """
+        Relatório das coortes cujo primeiro ensaio cai entre os meses de start_date e end_date (meses inteiros).
+        Guardado por worker, por período e engine (com ou sem ?arquivo=1), enquanto ensaios, lançamentos e tipos não mudarem.
+        """
+        today = today or date.today()
+        start = start_date.replace(day=1)
+        end = end_date.replace(day=monthrange(end_date.year, end_date.month)[1])
+        use_sql = CohortReportService.window_functions_supported()
+        key = (start, end, today, use_sql, archive_engine_active(), tuple(DataVersionService.versions(SOURCE_TABLES)))
+        cached = _cache.get(current_tenant_id(), key)
+        if cached is not None:
+            return cached
+
+        if use_sql:
+            try:
+                rows, transitions = CohortReportService._sql_rows(start, end, today)
+            except sa.exc.OperationalError:
+                # Banco sem suporte a janelas (ou a strftime): cai para o cálculo em Python
+                db.session.rollback()
+                rows, transitions = CohortReportService._python_rows(start, end, today)
+        else:
+            rows, transitions = CohortReportService._python_rows(start, end, today)
+        report = CohortReportService._assemble(rows, transitions, today)
+        _cache.set(current_tenant_id(), key, report, current_app.config.get('COHORT_REPORT_CACHE_ENTRIES', 32))
+        return report
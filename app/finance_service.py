@@ -1,8 +1,30 @@
 # app/finance_service.py
 from decimal import Decimal
 from datetime import date
-from app import db
-from app.models import Transaction
+from types import SimpleNamespace
+from app import db, metrics
+from app.models import Transaction, Session, SESSION_LEDGER_CATEGORIES
+import sqlalchemy as sa
+
+# Categorias gerenciadas automaticamente pelo ensaio -> prefixo de descrição do padrão legado
+# (no máximo um lançamento de cada por ensaio: índice único parcial em Transaction)
+SESSION_CATEGORIES = {
+    'session_down_payment': 'Entrada ensaio',
+    'session_settlement': 'Pag. final ensaio',
+    'session_extra_photos': 'Fotos extras ensaio',
+    'session_printing': 'Impressões ensaio',
+    'session_cost': 'Custo ensaio',
+}
+
+def filter_transactions(query, search=None, trans_type=None, client_id=None, start_date=None, end_date=None):
+    """Filtros do TransactionFilterForm sobre um SELECT que envolve Transaction (livro-caixa e API)."""
+    if search: query = query.filter(Transaction.description.ilike(f'%{search}%'))
+    if trans_type: query = query.filter(Transaction.transaction_type == trans_type)
+    if start_date: query = query.filter(Transaction.transaction_date >= start_date)
+    if end_date: query = query.filter(Transaction.transaction_date <= end_date)
+    if client_id:
+        query = query.filter(Transaction.session_id.in_(sa.select(Session.id).where(Session.client_id == client_id)))
+    return query
 
 class SessionFinanceService:
     """
@@ -11,123 +33,159 @@ class SessionFinanceService:
     """
 
     @staticmethod
-    def sync_transaction(session, should_exist, value, trans_type, category_key, desc_prefix, desc_full, use_date=None):
+    def index_transactions(session):
         """
-        Sincroniza uma única transação vinculada a uma sessão.
-        - Se deve existir (should_exist=True) e não existe: Cria.
-        - Se existe: Atualiza valores.
-        - Se não deve existir (should_exist=False) mas existe: Deleta.
+        Mapeia categoria -> transação em uma única passada sobre session.transactions.
         - Utiliza a coluna 'category' para identificação precisa (Novo padrão).
-        - Fallback para 'startswith' description (Padrão legado).
+        - Fallback para 'startswith' description (Padrão legado), apenas se a categoria não existir.
         """
-        if use_date is None:
-            use_date = date.today()
-
-        # Busca a transação existente
-        # 1. Tenta achar pela categoria oficial (Padrão Novo)
-        managed_trans = next((t for t in session.transactions if t.category == category_key), None)
-        
-        # 2. Fallback: Tenta achar pelo padrão antigo de texto (Legado) se não achou pela categoria
-        # Isso garante a migração suave dos dados antigos sem scripts SQL manuais
-        if not managed_trans and desc_prefix:
-            managed_trans = next((t for t in session.transactions if (not t.category) and t.description and t.description.startswith(desc_prefix)), None)
-        
-        # Validações de segurança
-        final_value = value if value is not None else Decimal('0.00')
-        
-        if should_exist and final_value > 0:
-            if managed_trans:
-                # Atualiza transação existente (Lazy Migration de categoria inclusa)
-                managed_trans.value = final_value
-                managed_trans.transaction_date = use_date
-                if not managed_trans.category:
-                    managed_trans.category = category_key 
-            else:
-                # Cria nova transação
-                new_trans = Transaction(
-                    description=desc_full,
-                    transaction_type=trans_type,
-                    value=final_value,
-                    transaction_date=use_date,
-                    session_id=session.id,
-                    category=category_key,
-                    status='efetivado' # Padrão para sessões que são pagas no ato ou confirmadas
-                )
-                db.session.add(new_trans)
-        
-        elif managed_trans:
-            # Se foi desmarcado ou o valor zerou, remove a transação existente
-            db.session.delete(managed_trans)
+        by_category, legacy = {}, {}
+        for trans in session.transactions:
+            if trans.category:
+                if trans.category in SESSION_CATEGORIES:
+                    by_category.setdefault(trans.category, trans)
+            elif trans.description:
+                for category_key, desc_prefix in SESSION_CATEGORIES.items():
+                    if category_key not in legacy and trans.description.startswith(desc_prefix):
+                        legacy[category_key] = trans
+                        break
+        return {key: by_category.get(key) or legacy.get(key) for key in SESSION_CATEGORIES}
 
     @staticmethod
-    def update_session_financials(session, form):
+    def desired_ledger(session, form):
         """
-        Orquestra a atualização de todas as categorias financeiras de um ensaio.
+        Estado desejado do livro-caixa do ensaio: {categoria: dados do lançamento}.
+        Categorias ausentes do dicionário não devem ter lançamento.
         """
         # Cálculos auxiliares (Regra de Negócio)
         remaining_value = form.total_value.data - form.down_payment.data
         extra_photos_value = (Decimal(form.extra_photos_qty.data or 0) * form.extra_photo_unit_price.data)
         printing_value = (Decimal(form.printing_qty.data or 0) * form.printing_unit_price.data)
-        
-        # 1. Entrada
-        SessionFinanceService.sync_transaction(
-            session=session,
-            should_exist=form.down_payment_paid.data,
-            value=form.down_payment.data,
-            trans_type='entry',
-            category_key='session_down_payment',
-            desc_prefix='Entrada ensaio',
-            desc_full=f"Entrada ensaio ({session.type.name}): {session.session_code}",
-            use_date=form.session_date.data
-        )
-        
-        # 2. Pagamento Final
-        # A regra aqui diz: se o valor restante for zero, não gera transação final (lógica 'paid')
-        should_exist_final = form.total_value_paid.data and remaining_value > 0
-        SessionFinanceService.sync_transaction(
-            session=session,
-            should_exist=should_exist_final,
-            value=remaining_value,
-            trans_type='entry',
-            category_key='session_settlement',
-            desc_prefix='Pag. final ensaio',
-            desc_full=f"Pag. final ensaio: {session.session_code}",
-            use_date=form.session_date.data
-        )
+        use_date = form.session_date.data or date.today()
+
+        candidates = [
+            # 1. Entrada
+            ('session_down_payment', form.down_payment_paid.data, form.down_payment.data, 'entry',
+             f"Entrada ensaio ({session.type.name}): {session.session_code}"),
+            # 2. Pagamento Final
+            # A regra aqui diz: se o valor restante for zero, não gera transação final (lógica 'paid')
+            ('session_settlement', form.total_value_paid.data and remaining_value > 0, remaining_value, 'entry',
+             f"Pag. final ensaio: {session.session_code}"),
+            # 3. Fotos Extras
+            ('session_extra_photos', form.extra_photos_paid.data, extra_photos_value, 'entry',
+             f"Fotos extras ensaio: {session.session_code}"),
+            # 4. Impressões
+            ('session_printing', form.printing_paid.data, printing_value, 'entry',
+             f"Impressões ensaio: {session.session_code}"),
+            # 5. Custo
+            ('session_cost', bool(session.session_cost and session.session_cost > 0), session.session_cost, 'exit',
+             f"Custo ensaio: {session.session_code}"),
+        ]
 
-        # 3. Fotos Extras
-        SessionFinanceService.sync_transaction(
-            session=session,
-            should_exist=form.extra_photos_paid.data,
-            value=extra_photos_value,
-            trans_type='entry',
-            category_key='session_extra_photos',
-            desc_prefix='Fotos extras ensaio',
-            desc_full=f"Fotos extras ensaio: {session.session_code}",
-            use_date=form.session_date.data
-        )
+        desired = {}
+        for category_key, should_exist, value, trans_type, description in candidates:
+            # Validações de segurança
+            final_value = value if value is not None else Decimal('0.00')
+            if should_exist and final_value > 0:
+                desired[category_key] = {
+                    'transaction_type': trans_type,
+                    'value': final_value,
+                    'transaction_date': use_date,
+                    'description': description,
+                }
+        return desired
 
-        # 4. Impressões
-        SessionFinanceService.sync_transaction(
-            session=session,
-            should_exist=form.printing_paid.data,
-            value=printing_value,
-            trans_type='entry',
-            category_key='session_printing',
-            desc_prefix='Impressões ensaio',
-            desc_full=f"Impressões ensaio: {session.session_code}",
-            use_date=form.session_date.data
-        )
+    @staticmethod
+    def apply_ledger(session, desired):
+        """
+        Aplica a diferença entre o estado atual e o desejado.
+        Nada é escrito durante o cálculo: inserts, updates e deletes ficam pendentes e são
+        enviados juntos no próximo flush (em lote pelo unit of work), mantendo o lock de escrita
+        do SQLite pelo menor tempo possível. Reaplicar o mesmo estado não gera escrita alguma.
+        Retorna a contagem de escritas pendentes por operação (insert/update/delete).
+        """
+        current = SessionFinanceService.index_transactions(session)
+        writes = {'insert': 0, 'update': 0, 'delete': 0}
 
-        # 5. Custo
-        cost_exists = bool(session.session_cost and session.session_cost > 0)
-        SessionFinanceService.sync_transaction(
-            session=session,
-            should_exist=cost_exists,
-            value=session.session_cost,
-            trans_type='exit',
-            category_key='session_cost',
-            desc_prefix='Custo ensaio',
-            desc_full=f"Custo ensaio: {session.session_code}",
-            use_date=form.session_date.data
-        )
\ No newline at end of file
+        for category_key, managed_trans in current.items():
+            spec = desired.get(category_key)
+            if spec is None:
+                # Se foi desmarcado ou o valor zerou, remove a transação existente (delete-orphan)
+                if managed_trans is not None:
+                    session.transactions.remove(managed_trans)
+                    writes['delete'] += 1
+            elif managed_trans is None:
+                # Cria nova transação
+                session.transactions.append(Transaction(
+                    description=spec['description'],
+                    transaction_type=spec['transaction_type'],
+                    value=spec['value'],
+                    transaction_date=spec['transaction_date'],
+                    category=category_key,
+                    status='efetivado' # Padrão para sessões que são pagas no ato ou confirmadas
+                ))
+                writes['insert'] += 1
+            else:
+                # Atualiza transação existente apenas no que mudou (Lazy Migration de categoria inclusa)
+                changed = False
+                if managed_trans.value != spec['value']:
+                    managed_trans.value = spec['value']
+                    changed = True
+                if managed_trans.transaction_date != spec['transaction_date']:
+                    managed_trans.transaction_date = spec['transaction_date']
+                    changed = True
+                if not managed_trans.category:
+                    managed_trans.category = category_key
+                    changed = True
+                if changed:
+                    writes['update'] += 1
+        return writes
+
+    @staticmethod
+    def ledger_form(session, down_payment_paid=False, total_value_paid=False, extra_photos_paid=False, printing_paid=False):
+        """
+        Equivalente ao SessionForm (cada campo expõe `.data`) montado a partir do próprio ensaio,
+        para escritas que não passam por formulário (API, lotes).
+        """
+        values = {name: getattr(session, name) for name in (
+            'session_date', 'total_value', 'down_payment', 'extra_photos_qty', 'extra_photo_unit_price',
+            'printing_qty', 'printing_unit_price')}
+        values.update(down_payment_paid=down_payment_paid, total_value_paid=total_value_paid,
+                      extra_photos_paid=extra_photos_paid, printing_paid=printing_paid)
+        return SimpleNamespace(**{name: SimpleNamespace(data=value) for name, value in values.items()})
+
+    @staticmethod
+    def lock_ledger(session):
+        """
+        Serializa edições concorrentes do mesmo ensaio: trava a linha do ensaio até o commit e relê os
+        lançamentos já sob a trava. Sem isso, dois salvamentos simultâneos veriam a mesma categoria
+        ausente e ambos a criariam.
+        """
+        if not sa.inspect(session).persistent:
+            return  # ensaio novo, ainda não gravado: ninguém mais o edita
+        if db.session.get_bind().dialect.name == 'sqlite':
+            # SQLite não tem SELECT ... FOR UPDATE: um UPDATE neutro adquire a trava de escrita do banco
+            # (espera pelo escritor atual até o busy_timeout)
+            db.session.execute(
+                sa.update(Session).where(Session.id == session.id).values(updated_at=Session.updated_at),
+                execution_options={'synchronize_session': False},
+            )
+        else:
+            db.session.execute(sa.select(Session.id).where(Session.id == session.id).with_for_update())
+        for trans in session.transactions:
+            db.session.expire(trans)
+        db.session.expire(session, ['transactions'])
+
+    @staticmethod
+    def update_session_financials(session, form):
+        """
+        Orquestra a atualização de todas as categorias financeiras de um ensaio.
+        """
+        # Sem autoflush: as leituras (tipo, transações) não disparam escritas antecipadas, então as mudanças
+        # vão juntas no flush/commit final; a trava do ensaio é o único comando antes disso
+        with db.session.no_autoflush:
+            SessionFinanceService.lock_ledger(session)
+            desired = SessionFinanceService.desired_ledger(session, form)
+            writes = SessionFinanceService.apply_ledger(session, desired)
+        metrics.record_session_save(writes)
+        return writes
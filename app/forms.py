@@ -1,13 +1,16 @@
 # app/forms.py
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, SelectField, BooleanField, IntegerField, TextAreaField, EmailField, RadioField
+from wtforms import StringField, PasswordField, SubmitField, SelectField, BooleanField, IntegerField, TextAreaField, EmailField, RadioField, DecimalField
 from wtforms.fields import DateField
 from wtforms_sqlalchemy.fields import QuerySelectField 
-from wtforms.validators import DataRequired, EqualTo, ValidationError, Optional, Length, Email
+from wtforms.validators import DataRequired, EqualTo, ValidationError, Optional, Length, Email, NumberRange
 from app.models import User, SessionType, Client, Configuration
 import sqlalchemy as sa
+from decimal import Decimal
 from app import db
 from app.fields import CurrencyField
+from app.client_analytics import SEGMENTS
+from app.profitability import ALLOCATION_BASES
 
 msg_required = 'Este campo é obrigatório.'
 def get_session_types(): return db.session.scalars(sa.select(SessionType).order_by(SessionType.name))
@@ -23,6 +26,9 @@ class DateRangeFilterForm(FlaskForm):
     end_date = DateField('Até:', validators=[Optional()], format='%Y-%m-%d')
     submit = SubmitField('Gerar Relatório')
 
+class ProfitabilityFilterForm(DateRangeFilterForm):
+    basis = SelectField('Rateio dos custos fixos', choices=list(ALLOCATION_BASES.items()), default='count')
+
 class PricingForm(FlaskForm):
     extra_photo_price = CurrencyField('Preço Padrão da Foto Extra', validators=[DataRequired()])
     printing_price = CurrencyField('Preço Padrão da Impressão', validators=[DataRequired()])
@@ -34,6 +40,7 @@ class LoginForm(FlaskForm):
     submit = SubmitField('Entrar')
 
 class RegistrationForm(FlaskForm):
+    studio_name = StringField('Nome do Estúdio', validators=[DataRequired(message=msg_required), Length(max=120)])
     username = StringField('Usuário', validators=[DataRequired(message=msg_required)])
     password = PasswordField('Senha', validators=[DataRequired(message=msg_required)])
     password2 = PasswordField('Repita a Senha', validators=[DataRequired(message=msg_required), EqualTo('password', message='As senhas devem ser iguais.')])
@@ -88,6 +95,9 @@ class ClientFilterForm(FlaskForm):
     search = StringField('Buscar por Nome', validators=[Optional()])
     lead_source = SelectField('Origem', choices=[('', '[Todas]')] + LEAD_SOURCE_CHOICES[1:], validators=[Optional()])
     tags = StringField('Tags', validators=[Optional()])
+    segment = SelectField('Segmento', choices=[('', '[Todos]')] + [(name, name) for name in SEGMENTS], validators=[Optional()])
+    sort_by = SelectField('Ordenar por', choices=[('name', 'Nome'), ('ltv_desc', 'Maior LTV'), ('recency', 'Ensaio mais recente'),
+                                                  ('frequency_desc', 'Mais ensaios')], default='name')
 
 class ClientForm(FlaskForm):
     name = StringField('Nome do Cliente', validators=[DataRequired(message=msg_required)])
@@ -155,6 +165,7 @@ class SessionTypeForm(FlaskForm):
     abbreviation = StringField('Abreviatura (Ex: NB, GEST)', validators=[DataRequired(message=msg_required), Length(min=2, max=10)])
     selection_deadline_days = IntegerField('Prazo para Seleção (dias)', validators=[DataRequired(message=msg_required)])
     editing_deadline_days = IntegerField('Prazo para Edição (dias)', validators=[DataRequired(message=msg_required)])
+    duration_hours = DecimalField('Duração Estimada (horas)', places=1, default=Decimal('1.0'), validators=[DataRequired(message=msg_required), NumberRange(min=0.1)], description='Captura + edição; usada no rateio de custos fixos por duração.')
     submit = SubmitField('Salvar')
     def __init__(self, original_abbreviation=None, *args, **kwargs): super().__init__(*args, **kwargs); self.original_abbreviation = original_abbreviation
     def validate_abbreviation(self, abbreviation):
@@ -181,4 +192,5 @@ class GoalEditForm(GoalAddForm):
 class GoalContributionForm(FlaskForm):
     value = CurrencyField('Valor da Contribuição', validators=[DataRequired(message=msg_required)])
     contribution_date = DateField('Data', validators=[DataRequired(message=msg_required)])
+    link_transaction = BooleanField('Lançar como saída no livro-caixa')
     submit = SubmitField('Adicionar')
\ No newline at end of file
@@ -0,0 +1,317 @@
+# app/goal_service.py
+import math
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+import click
+from flask.cli import with_appcontext
+import sqlalchemy as sa
+from sqlalchemy import func
+from app import db
+from app.models import Goal, GoalContribution, Transaction
+from app.ledger_service import _committed_value
+from app.http_cache import mark_tables_changed
+from app.audit import record_bulk_update
+from app.tenancy import for_each_tenant, tenant_option
+
+GOAL_ACTIVE = 'Ativa'
+GOAL_DONE = 'Concluída'
+# Categoria das saídas do livro-caixa geradas por contribuições de metas
+GOAL_CATEGORY = 'goal_contribution'
+
+class GoalProgressService:
+    """
+    Total salvo das metas (Goal.saved_total), mantido incrementalmente a cada escrita de GoalContribution.
+    As páginas de metas leem o total direto da linha da meta, sem somar as contribuições.
+    """
+
+    @staticmethod
+    def apply_deltas(connection, deltas):
+        """
+        Aplica as variações {goal_id: delta} e, no mesmo UPDATE, as transições automáticas de status:
+        - meta ativa que atinge o alvo passa a "Concluída";
+        - meta concluída que perde contribuições e fica abaixo do alvo volta a "Ativa".
+        Retorna ([linhas antes], [linhas depois]) com id e status das metas, para a auditoria.
+        """
+        table = Goal.__table__
+        goal_ids = [goal_id for goal_id, delta in deltas.items() if delta]
+        if not goal_ids:
+            return [], []
+        before = connection.execute(sa.select(table.c.id, table.c.status).where(table.c.id.in_(goal_ids))).mappings().all()
+        after = []
+        for goal_id in goal_ids:
+            delta = deltas[goal_id]
+            new_total = table.c.saved_total + delta
+            if delta > 0:
+                reached = sa.and_(table.c.status == GOAL_ACTIVE, table.c.target_value > 0, new_total >= table.c.target_value)
+                status = sa.case((reached, GOAL_DONE), else_=table.c.status)
+            else:
+                reopened = sa.and_(table.c.status == GOAL_DONE, new_total < table.c.target_value)
+                status = sa.case((reopened, GOAL_ACTIVE), else_=table.c.status)
+            after.extend(connection.execute(
+                sa.update(table).where(table.c.id == goal_id).values(saved_total=new_total, status=status)
+                .returning(table.c.id, table.c.status)
+            ).mappings().all())
+        return before, after
+
+    @staticmethod
+    def progress(goal):
+        """Percentual atingido e valor restante de uma meta (a partir do total desnormalizado)."""
+        saved_value = goal.saved_total or Decimal('0.00')
+        # Cálculo com Decimal: evitar divisão por zero
+        progress_percent = (saved_value / goal.target_value) * 100 if goal.target_value > 0 else Decimal(0)
+        return saved_value, goal.target_value - saved_value, progress_percent
+
+    @staticmethod
+    def add_contribution(goal, value, contribution_date, link_transaction=False):
+        """
+        Registra uma contribuição. Com link_transaction=True, lança também a saída correspondente no
+        livro-caixa (efetivada se a data já passou, prevista se futura), vinculada à contribuição.
+        """
+        contribution = GoalContribution(value=value, contribution_date=contribution_date, goal_id=goal.id)
+        if link_transaction:
+            contribution.transaction = Transaction(
+                description=f'Meta: {goal.name}', transaction_type='exit', value=value,
+                transaction_date=contribution_date, category=GOAL_CATEGORY,
+                status='efetivado' if contribution_date <= date.today() else 'previsto')
+        db.session.add(contribution)
+        return contribution
+
+    @staticmethod
+    def remove_contribution(contribution):
+        """Exclui a contribuição e, se houver, a saída vinculada no livro-caixa."""
+        if contribution.transaction_id is not None and contribution.transaction is not None:
+            db.session.delete(contribution.transaction)
+        db.session.delete(contribution)
+
+    @staticmethod
+    def mismatches():
+        """Metas cujo total salvo diverge da soma das contribuições: [(goal_id, name, gravado, real)]."""
+        actual = (sa.select(GoalContribution.goal_id, func.sum(GoalContribution.value).label('total'))
+                  .group_by(GoalContribution.goal_id).subquery())
+        real_total = func.coalesce(actual.c.total, 0)
+        rows = db.session.execute(
+            sa.select(Goal.id, Goal.name, Goal.saved_total, real_total)
+            .outerjoin(actual, actual.c.goal_id == Goal.id)
+            .where(Goal.saved_total != real_total)
+            .order_by(Goal.id)
+        ).all()
+        return [(goal_id, name, saved, Decimal(real)) for goal_id, name, saved, real in rows]
+
+    @staticmethod
+    def rebuild(goal_ids=None):
+        """Recalcula o total salvo a partir das contribuições (todas as metas ou apenas as informadas)."""
+        real_total = (sa.select(func.coalesce(func.sum(GoalContribution.value), 0))
+                      .where(GoalContribution.goal_id == Goal.id).scalar_subquery())
+        statement = sa.update(Goal).values(saved_total=real_total)
+        if goal_ids is not None:
+            statement = statement.where(Goal.id.in_(goal_ids))
+        db.session.execute(statement, execution_options={'synchronize_session': False})
+        mark_tables_changed(db.session, 'goal')
+        db.session.commit()
+
+GoalProjection = namedtuple('GoalProjection', 'monthly_rate predicted_date on_track needed_monthly')
+
+DAYS_PER_MONTH = 30.4375
+
+class GoalProjectionService:
+    """
+    Previsão de conclusão das metas: reta de mínimos quadrados sobre o total acumulado das contribuições
+    ao longo do tempo (mais o ponto de hoje, para que metas paradas percam ritmo). A inclinação é o ritmo
+    em R$/dia; a data prevista é hoje + restante / ritmo.
+    Uma única consulta (funções de janela + agregação) calcula as somas da regressão de todas as metas
+    pedidas. O resultado fica em cache por meta, assinado pelo total salvo, alvo e dia atual:
+    contribuições novas mudam o total (e invalidam a entrada no próprio worker na hora).
+    """
+
+    _cache = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _signature(goal, today):
+        return (goal.saved_total, goal.target_value, goal.target_date, today)
+
+    @staticmethod
+    def projections(goals):
+        """{goal.id: GoalProjection} para as metas informadas (tipicamente as ativas da página)."""
+        today = date.today()
+        cache = GoalProjectionService._cache
+        result, missing = {}, []
+        for goal in goals:
+            cached = cache.get(goal.id)
+            if cached is not None and cached[0] == GoalProjectionService._signature(goal, today):
+                result[goal.id] = cached[1]
+            else:
+                missing.append(goal)
+        if missing:
+            stats = GoalProjectionService.regression_stats([goal.id for goal in missing])
+            with GoalProjectionService._lock:
+                for goal in missing:
+                    projection = GoalProjectionService.project(goal, stats.get(goal.id), today)
+                    cache[goal.id] = (GoalProjectionService._signature(goal, today), projection)
+                    result[goal.id] = projection
+        return result
+
+    @staticmethod
+    def invalidate(goal_ids):
+        with GoalProjectionService._lock:
+            for goal_id in goal_ids:
+                GoalProjectionService._cache.pop(goal_id, None)
+
+    @staticmethod
+    def regression_stats(goal_ids):
+        """
+        Somas da regressão por meta: {goal_id: (primeira data, n, Σx, Σy, Σx², Σxy)}, com x = dias desde a
+        primeira contribuição e y = total acumulado após cada contribuição.
+        """
+        contribution = GoalContribution
+        first_day = func.min(contribution.contribution_date).over(partition_by=contribution.goal_id)
+        points = (
+            sa.select(
+                contribution.goal_id.label('goal_id'),
+                first_day.label('first_day'),
+                (func.julianday(contribution.contribution_date) - func.julianday(first_day)).label('x'),
+                func.sum(contribution.value).over(
+                    partition_by=contribution.goal_id, order_by=(contribution.contribution_date, contribution.id)
+                ).label('y'),
+            )
+            .where(contribution.goal_id.in_(goal_ids))
+            .subquery()
+        )
+        x, y = sa.type_coerce(points.c.x, sa.Float), sa.type_coerce(points.c.y, sa.Float)
+        rows = db.session.execute(
+            sa.select(points.c.goal_id, func.min(points.c.first_day), func.count(),
+                      func.sum(x), func.sum(y), func.sum(x * x), func.sum(x * y))
+            .group_by(points.c.goal_id)
+        ).all()
+        return {goal_id: (date.fromisoformat(first_day) if isinstance(first_day, str) else first_day, *sums)
+                for goal_id, first_day, *sums in rows}
+
+    @staticmethod
+    def project(goal, stats, today):
+        remaining = float(goal.target_value - (goal.saved_total or 0))
+        needed_monthly = None
+        if goal.target_date and remaining > 0:
+            months = max((goal.target_date - today).days, 1) / DAYS_PER_MONTH
+            needed_monthly = Decimal(remaining / months).quantize(Decimal('0.01'))
+        if stats is None:
+            return GoalProjection(None, None, None, needed_monthly)
+
+        first_day, n, sum_x, sum_y, sum_xx, sum_xy = stats
+        # Ponto de hoje (total atual): sem contribuições recentes, o ritmo estimado cai
+        x_today = float((today - first_day).days)
+        if x_today > 0:
+            saved = float(goal.saved_total or 0)
+            n, sum_x, sum_y = n + 1, sum_x + x_today, sum_y + saved
+            sum_xx, sum_xy = sum_xx + x_today * x_today, sum_xy + x_today * saved
+        denominator = n * sum_xx - sum_x * sum_x
+        if n < 2 or denominator <= 0:
+            return GoalProjection(None, None, None, needed_monthly)
+
+        daily_rate = (n * sum_xy - sum_x * sum_y) / denominator
+        monthly_rate = Decimal(daily_rate * DAYS_PER_MONTH).quantize(Decimal('0.01'))
+        predicted_date = None
+        if daily_rate > 0 and remaining > 0:
+            predicted_date = today + timedelta(days=math.ceil(remaining / daily_rate))
+        on_track = predicted_date <= goal.target_date if predicted_date and goal.target_date else None
+        return GoalProjection(monthly_rate, predicted_date, on_track, needed_monthly)
+
+def _pending_deltas(target):
+    session = sa.orm.object_session(target)
+    return session.info.setdefault('goal_deltas', {})
+
+def _add_delta(deltas, goal_id, value):
+    if value and goal_id is not None:
+        deltas[goal_id] = deltas.get(goal_id, Decimal('0.00')) + Decimal(value)
+
+def _track_previous_value(target, value, oldvalue, initiator):
+    return value
+
+# active_history garante que o valor antigo seja carregado mesmo quando o atributo estava expirado (pós-commit)
+for _attr in (GoalContribution.value, GoalContribution.goal_id):
+    sa.event.listen(_attr, 'set', _track_previous_value, active_history=True, retval=True)
+
+# EVENTOS DE ESCRITA: acumulam as variações por meta durante o flush e gravam todas de uma vez no final
+@sa.event.listens_for(GoalContribution, 'after_insert')
+def _goal_after_insert(mapper, connection, target):
+    _add_delta(_pending_deltas(target), target.goal_id, target.value)
+
+@sa.event.listens_for(GoalContribution, 'after_update')
+def _goal_after_update(mapper, connection, target):
+    state = sa.inspect(target)
+    deltas = _pending_deltas(target)
+    old_value = _committed_value(state, 'value')
+    _add_delta(deltas, _committed_value(state, 'goal_id'), -old_value if old_value else None)
+    _add_delta(deltas, target.goal_id, target.value)
+
+@sa.event.listens_for(GoalContribution, 'after_delete')
+def _goal_after_delete(mapper, connection, target):
+    state = sa.inspect(target)
+    old_value = _committed_value(state, 'value')
+    _add_delta(_pending_deltas(target), _committed_value(state, 'goal_id'), -old_value if old_value else None)
+
+# SAÍDAS VINCULADAS: editar a saída no livro-caixa atualiza a contribuição; excluí-la apenas desfaz o vínculo
+@sa.event.listens_for(Transaction, 'after_update')
+def _goal_transaction_updated(mapper, connection, target):
+    if target.category != GOAL_CATEGORY:
+        return
+    table = GoalContribution.__table__
+    linked = connection.execute(
+        sa.select(table.c.id, table.c.goal_id, table.c.value, table.c.contribution_date)
+        .where(table.c.transaction_id == target.id)
+    ).first()
+    if linked is None or (linked.value == target.value and linked.contribution_date == target.transaction_date):
+        return
+    connection.execute(sa.update(table).where(table.c.id == linked.id)
+                       .values(value=target.value, contribution_date=target.transaction_date))
+    _add_delta(_pending_deltas(target), linked.goal_id, Decimal(target.value) - linked.value)
+    GoalProjectionService.invalidate([linked.goal_id])
+    mark_tables_changed(sa.orm.object_session(target), 'goal_contribution')
+
+@sa.event.listens_for(Transaction, 'after_delete')
+def _goal_transaction_deleted(mapper, connection, target):
+    if _committed_value(sa.inspect(target), 'category') != GOAL_CATEGORY:
+        return
+    table = GoalContribution.__table__
+    connection.execute(sa.update(table).where(table.c.transaction_id == target.id).values(transaction_id=None))
+
+@sa.event.listens_for(sa.orm.Session, 'after_flush')
+def _goal_apply_pending(session, flush_context):
+    deltas = session.info.pop('goal_deltas', None)
+    if not deltas:
+        return
+    before, after = GoalProgressService.apply_deltas(session.connection(), deltas)
+    # Transições automáticas de status (UPDATE via Core) também entram na trilha de auditoria
+    record_bulk_update(session, Goal, before, after)
+    GoalProjectionService.invalidate(deltas)
+    mark_tables_changed(session, 'goal')
+    # As metas já carregadas nesta sessão releem total e status na próxima leitura
+    for goal_id in deltas:
+        goal = session.identity_map.get(sa.orm.util.identity_key(Goal, goal_id))
+        if goal is not None:
+            session.expire(goal, ['saved_total', 'status'])
+
+@sa.event.listens_for(sa.orm.Session, 'after_rollback')
+def _goal_discard_pending(session):
+    session.info.pop('goal_deltas', None)
+
+@click.command('goals-check')
+@click.option('--fix', is_flag=True, help='Corrige os totais divergentes.')
+@tenant_option
+@with_appcontext
+def goals_check_command(fix, tenant_key):
+    """Confere o total salvo de cada meta contra a soma das contribuições."""
+    found = 0
+    for tenant_id in for_each_tenant(tenant_key):
+        mismatches = GoalProgressService.mismatches()
+        for goal_id, name, saved, real in mismatches:
+            click.echo(f'Estúdio #{tenant_id}, meta {goal_id} ({name}): gravado {saved}, contribuições somam {real}')
+        if mismatches and fix:
+            GoalProgressService.rebuild([goal_id for goal_id, *_ in mismatches])
+            click.echo(f'Estúdio #{tenant_id}: {len(mismatches)} meta(s) corrigida(s).')
+        found += len(mismatches)
+    if not found:
+        click.echo('Todos os totais de metas estão consistentes.')
+    elif not fix:
+        raise SystemExit(1)
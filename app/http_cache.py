@@ -0,0 +1,199 @@
+# app/http_cache.py
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from flask import current_app, make_response, request, session as http_session
+from flask_login import current_user
+import sqlalchemy as sa
+from app import db
+from app.models import DataVersion
+from app.tenancy import current_tenant_id
+
+# Tabelas internas, globais ou derivadas de outras: escrever nelas não muda nenhuma página por si só
+IGNORED_TABLES = {'data_version', 'change_event', 'daily_balance', 'balance_checkpoint', 'tenant'}
+
+class DataVersionService:
+    """
+    Versão de dados por estúdio e tabela (DataVersion), incrementada na mesma transação de cada escrita.
+    É a base das ETags: ler as versões custa uma consulta minúscula, em vez de todas as consultas da página.
+    """
+
+    # estúdio -> (retrato das versões, instante da leitura)
+    _snapshots = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def bump(connection, tables):
+        """Incrementa a versão dos pares (estúdio, tabela) informados, criando a linha se ainda não existir."""
+        table = DataVersion.__table__
+        for tenant_id, name in sorted(tables):
+            result = connection.execute(
+                sa.update(table).where(table.c.tenant_id == tenant_id, table.c.table_name == name)
+                .values(version=table.c.version + 1)
+            )
+            if result.rowcount == 0:
+                connection.execute(sa.insert(table).values(tenant_id=tenant_id, table_name=name, version=1))
+
+    @staticmethod
+    def versions(tables):
+        """
+        Versões atuais das tabelas do estúdio atual, na ordem pedida. Com HTTP_CACHE_VERSION_TTL > 0 o retrato
+        é reaproveitado pelo worker durante esse intervalo (commits do próprio worker invalidam na hora; os de
+        outros workers aparecem em até TTL segundos).
+        """
+        ttl = current_app.config.get('HTTP_CACHE_VERSION_TTL', 0)
+        now = time.monotonic()
+        tenant_id = current_tenant_id()
+        snapshot, snapshot_at = DataVersionService._snapshots.get(tenant_id, ({}, 0.0))
+        if not ttl or now - snapshot_at > ttl:
+            snapshot = dict(db.session.execute(sa.select(DataVersion.table_name, DataVersion.version)).all())
+            with DataVersionService._lock:
+                DataVersionService._snapshots[tenant_id] = (snapshot, now)
+        return tuple(snapshot.get(name, 0) for name in tables)
+
+    @staticmethod
+    def invalidate(tenant_ids=None):
+        with DataVersionService._lock:
+            if tenant_ids is None:
+                DataVersionService._snapshots.clear()
+            for tenant_id in tenant_ids or ():
+                DataVersionService._snapshots.pop(tenant_id, None)
+
+def mark_tables_changed(session, *tables, tenant_id=None):
+    """Para escritas em lote (Core) que não passam pelo flush do ORM: versiona as tabelas no commit."""
+    tenant_id = tenant_id if tenant_id is not None else current_tenant_id()
+    if tenant_id is not None:
+        session.info.setdefault('changed_tables', set()).update((tenant_id, name) for name in tables)
+
+# CACHE DE PÁGINAS RENDERIZADAS (por worker, LRU por estúdio, chaveado pela ETag)
+class FragmentCache:
+    """Um LRU por estúdio: o volume de um estúdio não expulsa as páginas dos outros."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id, key):
+        with self._lock:
+            entries = self._entries.get(tenant_id)
+            entry = entries.get(key) if entries is not None else None
+            if entry is not None:
+                entries.move_to_end(key)
+            return entry
+
+    def set(self, tenant_id, key, value, max_entries):
+        with self._lock:
+            entries = self._entries.setdefault(tenant_id, OrderedDict())
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+fragments = FragmentCache()
+_template_version = None
+
+def template_version():
+    """Assinatura dos templates (caminho + mtime): um deploy com templates novos muda todas as ETags."""
+    global _template_version
+    if _template_version is None:
+        digest = hashlib.sha1()
+        root = os.path.join(current_app.root_path, current_app.template_folder or 'templates')
+        for directory, _, files in sorted(os.walk(root)):
+            for name in sorted(files):
+                path = os.path.join(directory, name)
+                digest.update(f'{path}:{os.path.getmtime(path)}'.encode())
+        _template_version = digest.hexdigest()[:12]
+    return _template_version
+
+def page_etag(tables):
+    """ETag da página: rota + parâmetros + estúdio + usuário + versões das tabelas + dia atual + templates."""
+    raw = '|'.join([
+        request.endpoint or '', request.full_path, str(current_tenant_id()), str(current_user.get_id()),
+        ','.join(map(str, DataVersionService.versions(tables))),
+        date.today().isoformat(), template_version(),
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def cached_page(*tables, fragment=False):
+    """
+    Cache HTTP opcional por rota (GET). `tables` são as tabelas cujo conteúdo a página exibe.
+    - Responde 304 a If-None-Match antes de executar a view (nenhuma consulta da página);
+    - com fragment=True, guarda o HTML renderizado no worker e o reaproveita enquanto a ETag valer.
+    Use só em páginas sem conteúdo por requisição (tokens CSRF etc.). Respostas que exibem mensagens
+    flash não são cacheadas.
+
+        @bp.route('/')
+        @login_required
+        @cached_page('transaction', 'session', fragment=True)
+        def index(): ...
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            if not config.get('HTTP_CACHE_ENABLED') or request.method != 'GET' or '_flashes' in http_session:
+                return view(*args, **kwargs)
+
+            etag = page_etag(tables)
+            # Comparação fraca (RFC 9110): a compressão torna a ETag fraca (W/"...")
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            elif fragment and (cached := fragments.get(current_tenant_id(), etag)) is not None:
+                response = make_response(cached[0])
+                response.mimetype = cached[1]
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed or '_flashes' in http_session:
+                    return response
+                if fragment and config.get('HTTP_CACHE_FRAGMENTS', True):
+                    fragments.set(current_tenant_id(), etag, (response.get_data(), response.mimetype),
+                                  config.get('HTTP_CACHE_FRAGMENT_ENTRIES', 128))
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+# VERSIONAMENTO AUTOMÁTICO: toda escrita do ORM (inclusive cascatas) incrementa a versão da tabela tocada
+def _table_written(mapper, connection, target):
+    name = mapper.local_table.name
+    if name not in IGNORED_TABLES:
+        mark_tables_changed(sa.orm.object_session(target), name, tenant_id=getattr(target, 'tenant_id', None))
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    sa.event.listen(sa.orm.Mapper, _event, _table_written)
+
+def _write_versions(session):
+    pending = session.info.pop('changed_tables', set()) - session.info.setdefault('versioned_tables', set())
+    if pending:
+        DataVersionService.bump(session.connection(), pending)
+        # Uma vez por tabela e transação basta: a versão só fica visível aos outros no commit
+        session.info['versioned_tables'].update(pending)
+
+@sa.event.listens_for(sa.orm.Session, 'after_flush')
+def _versions_after_flush(session, flush_context):
+    _write_versions(session)
+
+@sa.event.listens_for(sa.orm.Session, 'before_commit')
+def _versions_before_commit(session):
+    _write_versions(session)
+
+@sa.event.listens_for(sa.orm.Session, 'after_commit')
+def _versions_after_commit(session):
+    versioned = session.info.pop('versioned_tables', None)
+    if versioned:
+        DataVersionService.invalidate({tenant_id for tenant_id, _ in versioned})
+
+@sa.event.listens_for(sa.orm.Session, 'after_rollback')
+def _versions_after_rollback(session):
+    session.info.pop('changed_tables', None)
+    session.info.pop('versioned_tables', None)
@@ -0,0 +1,196 @@
+# app/instrumentation.py
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from flask import g, has_request_context, request
+from flask.signals import request_started, request_finished, got_request_exception, before_render_template, template_rendered
+import sqlalchemy as sa
+
+slow_query_logger = logging.getLogger('app.slow_queries')
+
+# Limites (ms) das faixas do histograma de latência por endpoint
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class RequestProfile:
+    """Medições de uma requisição: consultas SQL, tempo de banco e de renderização de templates."""
+
+    __slots__ = ('started', 'query_count', 'db_time', 'template_time', 'slowest', '_template_stack')
+
+    SLOWEST_KEPT = 5
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.slowest = [] # heap (duração, instrução) com as N consultas mais lentas
+        self._template_stack = []
+
+    def add_query(self, duration, statement):
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.slowest) < self.SLOWEST_KEPT:
+            heapq.heappush(self.slowest, (duration, statement))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, statement))
+
+class PerformanceMonitor:
+    """
+    Instrumentação por requisição, ligada por PERF_INSTRUMENTATION.
+
+    Os eventos before/after_cursor_execute do SQLAlchemy e os sinais do Flask alimentam um
+    RequestProfile guardado em `g`. Ao final da requisição o resumo vai para o cabeçalho
+    Server-Timing e para uma janela deslizante (as últimas PERF_HISTORY_SIZE requisições)
+    de cada endpoint. Consultas acima de PERF_SLOW_QUERY_MS são registradas no logger
+    "app.slow_queries". O custo por consulta é de dois perf_counter e uma soma.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._slowest = {}
+        self.slow_queries = deque(maxlen=50)
+        self.history_size = 500
+        self.slow_query_seconds = 0.1
+        self.server_timing = True
+        self.enabled = False
+        # Funções chamadas com (endpoint, status, profile, duração) ao final de cada requisição
+        self.observers = []
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('PERF_INSTRUMENTATION'))
+        if not self.enabled:
+            return
+        self.history_size = app.config.get('PERF_HISTORY_SIZE', 500)
+        self.slow_query_seconds = app.config.get('PERF_SLOW_QUERY_MS', 100) / 1000
+        self.server_timing = app.config.get('PERF_SERVER_TIMING', True)
+
+        request_started.connect(self._request_started, app)
+        request_finished.connect(self._request_finished, app)
+        got_request_exception.connect(self._request_failed, app)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        if not sa.event.contains(sa.engine.Engine, 'before_cursor_execute', _before_cursor_execute):
+            sa.event.listen(sa.engine.Engine, 'before_cursor_execute', _before_cursor_execute)
+            sa.event.listen(sa.engine.Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    # SINAIS DO FLASK
+    def _request_started(self, sender, **extra):
+        g._perf = RequestProfile()
+
+    def _before_render(self, sender, template, context, **extra):
+        profile = g.get('_perf')
+        if profile is not None:
+            profile._template_stack.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        profile = g.get('_perf')
+        if profile is not None and profile._template_stack:
+            profile.template_time += time.perf_counter() - profile._template_stack.pop()
+
+    def _request_failed(self, sender, exception, **extra):
+        self._finish(500)
+
+    def _request_finished(self, sender, response, **extra):
+        duration, profile = self._finish(response.status_code)
+        if profile is not None and self.server_timing:
+            response.headers['Server-Timing'] = (
+                f'db;dur={profile.db_time * 1000:.1f};desc="{profile.query_count} consultas", '
+                f'tpl;dur={profile.template_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+
+    def _finish(self, status):
+        profile = g.pop('_perf', None)
+        if profile is None:
+            return 0.0, None
+        duration = time.perf_counter() - profile.started
+        self.record(request.endpoint or 'desconhecido', duration, profile)
+        for observer in self.observers:
+            observer(request.endpoint or 'desconhecido', status, profile, duration)
+        return duration, profile
+
+    # JANELA DESLIZANTE POR ENDPOINT
+    def record(self, endpoint, duration, profile):
+        samples = self._endpoints.get(endpoint)
+        if samples is None:
+            with self._lock:
+                samples = self._endpoints.setdefault(endpoint, deque(maxlen=self.history_size))
+        samples.append((duration * 1000, profile.db_time * 1000, profile.query_count, profile.template_time * 1000))
+        if profile.slowest:
+            # Mantém as consultas mais lentas já vistas em cada endpoint
+            with self._lock:
+                slowest = self._slowest.setdefault(endpoint, [])
+                for item in profile.slowest:
+                    if len(slowest) < RequestProfile.SLOWEST_KEPT:
+                        heapq.heappush(slowest, item)
+                    elif item[0] > slowest[0][0]:
+                        heapq.heapreplace(slowest, item)
+
+    def log_slow_query(self, duration, statement):
+        endpoint = request.endpoint if has_request_context() else None
+        entry = {'endpoint': endpoint, 'ms': round(duration * 1000, 1), 'statement': statement[:500],
+                 'at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self.slow_queries.append(entry)
+        slow_query_logger.warning('%.1f ms [%s] %s', entry['ms'], endpoint or '-', entry['statement'])
+
+    def snapshot(self):
+        """Resumo das janelas: percentis de latência, médias de banco/templates e histograma."""
+        endpoints = {}
+        for endpoint, samples in list(self._endpoints.items()):
+            rows = list(samples)
+            if not rows:
+                continue
+            latencies = sorted(row[0] for row in rows)
+            count = len(rows)
+            # Histograma cumulativo: quantas requisições terminaram em até `le_ms`
+            buckets = [{'le_ms': limit, 'count': sum(1 for value in latencies if value <= limit)}
+                       for limit in LATENCY_BUCKETS_MS]
+            buckets.append({'le_ms': None, 'count': count})
+            endpoints[endpoint] = {
+                'requests': count,
+                'p50_ms': round(_percentile(latencies, 0.50), 1),
+                'p95_ms': round(_percentile(latencies, 0.95), 1),
+                'p99_ms': round(_percentile(latencies, 0.99), 1),
+                'max_ms': round(latencies[-1], 1),
+                'avg_db_ms': round(sum(row[1] for row in rows) / count, 1),
+                'avg_queries': round(sum(row[2] for row in rows) / count, 1),
+                'max_queries': max(row[2] for row in rows),
+                'avg_template_ms': round(sum(row[3] for row in rows) / count, 1),
+                'histogram': buckets,
+                'slowest_statements': [
+                    {'ms': round(duration * 1000, 1), 'statement': statement[:500]}
+                    for duration, statement in sorted(self._slowest.get(endpoint, []), reverse=True)
+                ],
+            }
+        return {'window_size': self.history_size, 'endpoints': endpoints, 'slow_queries': list(self.slow_queries)}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._slowest.clear()
+            self.slow_queries.clear()
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+monitor = PerformanceMonitor()
+
+# EVENTOS DO SQLALCHEMY (valem para qualquer engine; fora de uma requisição não fazem nada)
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_perf' in g:
+        conn.info.setdefault('perf_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get('perf_started')
+    if not stack:
+        return
+    duration = time.perf_counter() - stack.pop()
+    profile = g.get('_perf') if has_request_context() else None
+    if profile is not None:
+        profile.add_query(duration, statement)
+    if duration >= monitor.slow_query_seconds:
+        monitor.log_slow_query(duration, statement)
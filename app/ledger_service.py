@@ -0,0 +1,212 @@
+# app/ledger_service.py
+from datetime import date, timedelta
+from decimal import Decimal
+import click
+from flask.cli import with_appcontext
+import sqlalchemy as sa
+from sqlalchemy import func
+from app import db
+from app.models import BalanceCheckpoint, Transaction, DailyBalance
+from app.tenancy import for_each_tenant, require_tenant_id, tenant_option
+
+class LedgerBalanceService:
+    """
+    Índice de saldo acumulado do livro-caixa.
+    Cada linha de DailyBalance guarda a variação líquida efetivada de um dia, atualizada
+    incrementalmente a cada escrita de Transaction. BalanceCheckpoint guarda o saldo acumulado no
+    fim de cada mês fechado: o saldo de qualquer data é o último checkpoint anterior mais a soma
+    de no máximo um mês de dias, independente do tamanho do histórico.
+    """
+
+    @staticmethod
+    def signed_value(transaction_type, value, status):
+        """Contribuição de um lançamento para o saldo (apenas lançamentos efetivados contam)."""
+        if status != 'efetivado' or value is None:
+            return Decimal('0.00')
+        return Decimal(value) if transaction_type == 'entry' else -Decimal(value)
+
+    @staticmethod
+    def apply_deltas(connection, deltas):
+        """Aplica as variações {data: delta} no índice do estúdio atual, criando o dia se ainda não existir."""
+        table = DailyBalance.__table__
+        tenant_id = require_tenant_id()
+        for balance_date, delta in deltas.items():
+            if not delta:
+                continue
+            result = connection.execute(
+                sa.update(table)
+                .where(table.c.tenant_id == tenant_id, table.c.balance_date == balance_date)
+                .values(net_change=table.c.net_change + delta)
+            )
+            if result.rowcount == 0:
+                connection.execute(sa.insert(table).values(tenant_id=tenant_id, balance_date=balance_date, net_change=delta))
+            # Checkpoints existentes a partir do dia alterado acompanham a variação
+            checkpoints = BalanceCheckpoint.__table__
+            connection.execute(
+                sa.update(checkpoints)
+                .where(checkpoints.c.tenant_id == tenant_id, checkpoints.c.checkpoint_date >= balance_date)
+                .values(closing_balance=checkpoints.c.closing_balance + delta)
+            )
+        LedgerBalanceService.ensure_checkpoints(connection, tenant_id)
+
+    @staticmethod
+    def ensure_checkpoints(connection, tenant_id, today=None):
+        """
+        Cria os checkpoints dos meses fechados que ainda não têm um (normalmente nenhum ou o mês anterior),
+        somando os dias depois do último checkpoint. Chamado a cada escrita no índice: uma consulta quando
+        já está em dia.
+        """
+        checkpoints, days = BalanceCheckpoint.__table__, DailyBalance.__table__
+        last_closed = (today or date.today()).replace(day=1) - timedelta(days=1)
+        latest = connection.execute(
+            sa.select(checkpoints.c.checkpoint_date, checkpoints.c.closing_balance)
+            .where(checkpoints.c.tenant_id == tenant_id)
+            .order_by(checkpoints.c.checkpoint_date.desc()).limit(1)
+        ).first()
+        if latest is not None and latest.checkpoint_date >= last_closed:
+            return
+        condition = [days.c.tenant_id == tenant_id, days.c.balance_date <= last_closed]
+        if latest is not None:
+            condition.append(days.c.balance_date > latest.checkpoint_date)
+        movements = connection.execute(
+            sa.select(days.c.balance_date, days.c.net_change).where(*condition).order_by(days.c.balance_date)
+        ).all()
+        if latest is None and not movements:
+            return
+
+        month = (latest.checkpoint_date + timedelta(days=1)) if latest is not None else movements[0].balance_date.replace(day=1)
+        running = latest.closing_balance if latest is not None else Decimal('0.00')
+        rows, index = [], 0
+        while month <= last_closed:
+            month_end = (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+            while index < len(movements) and movements[index].balance_date <= month_end:
+                running += movements[index].net_change
+                index += 1
+            rows.append({'tenant_id': tenant_id, 'checkpoint_date': month_end, 'closing_balance': running})
+            month = month_end + timedelta(days=1)
+        connection.execute(sa.insert(checkpoints), rows)
+
+    @staticmethod
+    def balance_before(day):
+        """Saldo efetivado acumulado até o dia anterior a `day` (exclusivo)."""
+        if day is None:
+            return Decimal('0.00')
+        return LedgerBalanceService.balance_on(day - timedelta(days=1))
+
+    @staticmethod
+    def balance_on(day):
+        """
+        Saldo efetivado de fechamento do dia `day` (inclusivo): último checkpoint até `day` mais os dias
+        seguintes a ele, em uma única consulta.
+        """
+        checkpoint = (
+            sa.select(BalanceCheckpoint.checkpoint_date, BalanceCheckpoint.closing_balance)
+            .where(BalanceCheckpoint.checkpoint_date <= day)
+            .order_by(BalanceCheckpoint.checkpoint_date.desc()).limit(1)
+            .subquery()
+        )
+        tail = sa.select(func.sum(DailyBalance.net_change)).where(
+            DailyBalance.balance_date <= day,
+            DailyBalance.balance_date > func.coalesce(sa.select(checkpoint.c.checkpoint_date).scalar_subquery(), date.min),
+        )
+        total = (func.coalesce(sa.select(checkpoint.c.closing_balance).scalar_subquery(), 0)
+                 + func.coalesce(tail.scalar_subquery(), 0))
+        return db.session.scalar(sa.select(sa.type_coerce(total, sa.Numeric(12, 2)))) or Decimal('0.00')
+
+    @staticmethod
+    def running_balances(transactions, opening_balance):
+        """
+        Calcula o saldo após cada lançamento da página, partindo do saldo de abertura.
+        Retorna {transaction.id: saldo}. Custo proporcional apenas aos itens exibidos.
+        """
+        balances = {}
+        running = opening_balance
+        for trans in sorted(transactions, key=lambda t: (t.transaction_date, t.id)):
+            running += LedgerBalanceService.signed_value(trans.transaction_type, trans.value, trans.status)
+            balances[trans.id] = running
+        return balances
+
+    @staticmethod
+    def rebuild():
+        """Recalcula o índice do estúdio atual a partir dos lançamentos, ativos e arquivados (verificação/correção)."""
+        from app.archive import ArchiveService  # import tardio: app.archive depende deste módulo
+        ledger = ArchiveService.union(Transaction)
+        signed = sa.case((ledger.transaction_type == 'entry', ledger.value), else_=-ledger.value)
+        rows = db.session.execute(
+            sa.select(ledger.transaction_date, func.sum(signed))
+            .where(ledger.status == 'efetivado')
+            .group_by(ledger.transaction_date)
+        ).all()
+        db.session.execute(sa.delete(DailyBalance))
+        db.session.execute(sa.delete(BalanceCheckpoint))
+        db.session.add_all([DailyBalance(balance_date=day, net_change=total) for day, total in rows if total])
+        db.session.flush()
+        LedgerBalanceService.ensure_checkpoints(db.session.connection(), require_tenant_id())
+        db.session.commit()
+        return len(rows)
+
+def _committed_value(state, key):
+    """Valor de um atributo como estava no banco antes do flush atual."""
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(state.obj(), key)
+
+def _pending_deltas(target):
+    session = sa.orm.object_session(target)
+    return session.info.setdefault('ledger_deltas', {})
+
+def _add_delta(deltas, day, value):
+    if value:
+        deltas[day] = deltas.get(day, Decimal('0.00')) + value
+
+def _track_previous_value(target, value, oldvalue, initiator):
+    return value
+
+# active_history garante que o valor antigo seja carregado mesmo quando o atributo estava expirado (pós-commit)
+for _attr in (Transaction.value, Transaction.transaction_date, Transaction.transaction_type, Transaction.status):
+    sa.event.listen(_attr, 'set', _track_previous_value, active_history=True, retval=True)
+
+# EVENTOS DE ESCRITA: acumulam as variações durante o flush e gravam todas de uma vez no final
+@sa.event.listens_for(Transaction, 'after_insert')
+def _ledger_after_insert(mapper, connection, target):
+    _add_delta(_pending_deltas(target), target.transaction_date,
+               LedgerBalanceService.signed_value(target.transaction_type, target.value, target.status))
+
+@sa.event.listens_for(Transaction, 'after_update')
+def _ledger_after_update(mapper, connection, target):
+    state = sa.inspect(target)
+    deltas = _pending_deltas(target)
+    old_value = LedgerBalanceService.signed_value(
+        _committed_value(state, 'transaction_type'), _committed_value(state, 'value'), _committed_value(state, 'status'))
+    _add_delta(deltas, _committed_value(state, 'transaction_date'), -old_value)
+    _add_delta(deltas, target.transaction_date,
+               LedgerBalanceService.signed_value(target.transaction_type, target.value, target.status))
+
+@sa.event.listens_for(Transaction, 'after_delete')
+def _ledger_after_delete(mapper, connection, target):
+    state = sa.inspect(target)
+    old_value = LedgerBalanceService.signed_value(
+        _committed_value(state, 'transaction_type'), _committed_value(state, 'value'), _committed_value(state, 'status'))
+    _add_delta(_pending_deltas(target), _committed_value(state, 'transaction_date'), -old_value)
+
+@sa.event.listens_for(sa.orm.Session, 'after_flush')
+def _ledger_apply_pending(session, flush_context):
+    deltas = session.info.pop('ledger_deltas', None)
+    if deltas:
+        LedgerBalanceService.apply_deltas(session.connection(), deltas)
+
+@sa.event.listens_for(sa.orm.Session, 'after_rollback')
+def _ledger_discard_pending(session):
+    session.info.pop('ledger_deltas', None)
+
+@click.command('ledger-rebuild')
+@tenant_option
+@with_appcontext
+def ledger_rebuild_command(tenant_key):
+    """Reconstrói o índice de saldo diário a partir dos lançamentos."""
+    for tenant_id in for_each_tenant(tenant_key):
+        days = LedgerBalanceService.rebuild()
+        click.echo(f'Estúdio #{tenant_id}: índice de saldo reconstruído, {days} dias processados.')
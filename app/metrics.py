@@ -0,0 +1,115 @@
+# app/metrics.py
+import os
+from flask import current_app, request
+
+# Métricas do Prometheus, criadas em init_app. Enquanto não houver init_app (METRICS_ENABLED desligado
+# ou instrumentação desligada) as funções record_* não fazem nada e o prometheus_client nem é importado.
+_metrics = {}
+
+# Faixas (segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def init_app(app, monitor):
+    """
+    Cria as métricas e passa a alimentá-las com o resumo de cada requisição do PerformanceMonitor.
+
+    Com vários workers do gunicorn, a variável de ambiente PROMETHEUS_MULTIPROC_DIR precisa apontar
+    para um diretório gravável antes do boot: cada worker grava seus valores em arquivos ali e o
+    /metrics soma todos (veja gunicorn.conf.py). Sem ela, os valores são apenas do processo atual.
+    """
+    if _observe_request not in monitor.observers:
+        monitor.observers.append(_observe_request)
+    if _metrics:
+        return # Métricas já criadas (create_app chamado mais de uma vez no mesmo processo)
+
+    from prometheus_client import Counter, Histogram
+    _metrics.update(
+        request_latency=Histogram(
+            'phatos_http_request_duration_seconds', 'Latência das requisições por endpoint',
+            ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS),
+        db_queries=Counter(
+            'phatos_db_queries_total', 'Consultas SQL executadas por endpoint', ['endpoint']),
+        db_time=Histogram(
+            'phatos_db_time_seconds', 'Tempo de banco por requisição', ['endpoint'], buckets=LATENCY_BUCKETS),
+        template_time=Histogram(
+            'phatos_template_render_seconds', 'Tempo de renderização de templates por requisição',
+            ['endpoint'], buckets=LATENCY_BUCKETS),
+        ratelimit_rejections=Counter(
+            'phatos_ratelimit_rejections_total', 'Requisições bloqueadas pelo rate limit (HTTP 429)',
+            ['endpoint', 'limit']),
+        session_saves=Counter(
+            'phatos_session_saves_total', 'Ensaios salvos pelo SessionFinanceService'),
+        transaction_writes=Counter(
+            'phatos_transaction_writes_total', 'Lançamentos escritos pelo SessionFinanceService', ['operation']),
+    )
+
+def _observe_request(endpoint, status, profile, duration):
+    _metrics['request_latency'].labels(endpoint, request.method, str(status)).observe(duration)
+    _metrics['db_queries'].labels(endpoint).inc(profile.query_count)
+    _metrics['db_time'].labels(endpoint).observe(profile.db_time)
+    _metrics['template_time'].labels(endpoint).observe(profile.template_time)
+
+def record_ratelimit_rejection(endpoint, limit):
+    if _metrics:
+        _metrics['ratelimit_rejections'].labels(endpoint or 'desconhecido', str(limit)).inc()
+
+def record_session_save(writes):
+    """`writes` = {operação: quantidade} retornado por SessionFinanceService.apply_ledger."""
+    if _metrics:
+        _metrics['session_saves'].inc()
+        for operation, count in writes.items():
+            if count:
+                _metrics['transaction_writes'].labels(operation).inc(count)
+
+class SQLiteCollector:
+    """
+    Estatísticas do arquivo SQLite lidas no momento da coleta (o arquivo é o mesmo para todos os workers,
+    então não há o que somar): páginas, páginas livres, cache configurado e tamanho do banco e do WAL.
+    """
+
+    PRAGMAS = ('page_count', 'page_size', 'freelist_count', 'cache_size')
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        engine = current_app.extensions['sqlalchemy'].engine
+        if engine.dialect.name != 'sqlite':
+            return
+        with engine.connect() as connection:
+            values = {name: connection.exec_driver_sql(f'PRAGMA {name}').scalar() for name in self.PRAGMAS}
+            journal_mode = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+
+        for name, value in values.items():
+            yield GaugeMetricFamily(f'phatos_sqlite_{name}', f'PRAGMA {name}', value=value)
+
+        # cache_size negativo significa KiB; positivo, número de páginas
+        cache_bytes = -values['cache_size'] * 1024 if values['cache_size'] < 0 else values['cache_size'] * values['page_size']
+        yield GaugeMetricFamily('phatos_sqlite_page_cache_bytes', 'Tamanho máximo do cache de páginas por conexão',
+                                value=cache_bytes)
+
+        path = engine.url.database
+        if path and path != ':memory:':
+            files = GaugeMetricFamily('phatos_sqlite_file_bytes', 'Tamanho dos arquivos do banco', labels=['file'])
+            for suffix, label in (('', 'db'), ('-wal', 'wal'), ('-shm', 'shm')):
+                if os.path.exists(path + suffix):
+                    files.add_metric([label], os.path.getsize(path + suffix))
+            yield files
+
+        mode = GaugeMetricFamily('phatos_sqlite_journal_mode', 'Modo de journal em uso', labels=['mode'])
+        mode.add_metric([str(journal_mode)], 1)
+        yield mode
+
+def render_latest():
+    """Texto no formato do Prometheus, somando os arquivos de todos os workers quando em modo multiprocesso."""
+    from prometheus_client import CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client import multiprocess
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    local = CollectorRegistry(auto_describe=False)
+    local.register(SQLiteCollector())
+    return generate_latest(registry) + generate_latest(local), CONTENT_TYPE_LATEST
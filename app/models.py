@@ -3,7 +3,9 @@ from app import db, login
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 import sqlalchemy as sa
-from datetime import date
+from sqlalchemy.orm import declared_attr
+from app.tenancy import require_tenant_id
+from datetime import date, datetime
 from decimal import Decimal
 
 KANBAN_STAGES = [
@@ -15,22 +17,45 @@ KANBAN_STAGES = [
 def load_user(id):
     return db.session.get(User, int(id))
 
-class Configuration(db.Model):
+class Tenant(db.Model):
+    """Estúdio hospedado na instalação (ver app/tenancy.py)."""
     id = db.Column(db.Integer, primary_key=True)
-    key = db.Column(db.String(50), unique=True, nullable=False)
+    name = db.Column(db.String(128), nullable=False)
+    slug = db.Column(db.String(64), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class TenantScoped:
+    """
+    Tabela por estúdio: tenant_id preenchido com o estúdio atual e filtrado em toda consulta do ORM
+    (app/tenancy.py). Os índices de cada modelo começam por tenant_id.
+    """
+    @declared_attr
+    def tenant_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('tenant.id'), nullable=False, default=require_tenant_id)
+
+class Configuration(TenantScoped, db.Model):
+    __table_args__ = (sa.Index('ix_configuration_tenant_key', 'tenant_id', 'key', unique=True),)
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(50), nullable=False)
     value = db.Column(db.String(200), nullable=False)
 
-class User(UserMixin, db.Model):
+class User(TenantScoped, UserMixin, db.Model):
+    # O nome de usuário continua único na instalação: é ele que identifica o estúdio no login
+    __table_args__ = (sa.Index('ix_user_tenant_username', 'tenant_id', 'username'),)
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), index=True, unique=True)
     password_hash = db.Column(db.String(256))
     def set_password(self, password): self.password_hash = generate_password_hash(password)
     def check_password(self, password): return check_password_hash(self.password_hash, password)
 
-class Client(db.Model):
+class Client(TenantScoped, db.Model):
+    __table_args__ = (
+        sa.Index('ix_client_tenant_name', 'tenant_id', 'name', unique=True),
+        sa.Index('ix_client_tenant_email', 'tenant_id', 'email'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(128), index=True, unique=True, nullable=False)
-    email = db.Column(db.String(128), nullable=True, index=True)
+    name = db.Column(db.String(128), nullable=False)
+    email = db.Column(db.String(128), nullable=True)
     whatsapp = db.Column(db.String(20), nullable=True)
     lead_source = db.Column(db.String(50), nullable=True)
     tags = db.Column(db.String(256), nullable=True)
@@ -43,18 +68,31 @@ class Client(db.Model):
     sessions = db.relationship('Session', back_populates='client', lazy='dynamic')
     interactions = db.relationship('InteractionLog', back_populates='client', lazy='dynamic', cascade='all, delete-orphan')
 
-class SessionType(db.Model):
+class SessionType(TenantScoped, db.Model):
+    __table_args__ = (
+        sa.Index('ix_session_type_tenant_name', 'tenant_id', 'name', unique=True),
+        sa.Index('ix_session_type_tenant_abbreviation', 'tenant_id', 'abbreviation', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(64), unique=True, nullable=False)
-    abbreviation = db.Column(db.String(10), unique=True, nullable=False)
+    name = db.Column(db.String(64), nullable=False)
+    abbreviation = db.Column(db.String(10), nullable=False)
     selection_deadline_days = db.Column(db.Integer, nullable=False, default=4)
     editing_deadline_days = db.Column(db.Integer, nullable=False, default=15)
+    # Horas de trabalho estimadas por ensaio (peso do rateio de custos fixos por duração)
+    duration_hours = db.Column(sa.Numeric(5, 1), nullable=False, default=Decimal('1.0'), server_default='1')
     sessions = db.relationship('Session', backref='type', lazy='dynamic')
 
-class Session(db.Model):
+class Session(TenantScoped, db.Model):
+    __table_args__ = (
+        sa.Index('ix_session_tenant_session_code', 'tenant_id', 'session_code', unique=True),
+        sa.Index('ix_session_tenant_session_date', 'tenant_id', 'session_date'),
+        sa.Index('ix_session_tenant_updated_at', 'tenant_id', 'updated_at'),
+        # AUTOINCREMENT: ids de ensaios levados ao arquivo/lixeira (app/archive.py) nunca são reaproveitados
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
-    session_code = db.Column(db.String(128), unique=True, nullable=False, index=True)
-    session_date = db.Column(db.Date, nullable=False, index=True)
+    session_code = db.Column(db.String(128), nullable=False)
+    session_date = db.Column(db.Date, nullable=False)
     selection_completed_date = db.Column(db.Date, nullable=True)
     
     total_value = db.Column(sa.Numeric(10, 2), nullable=False, default=Decimal('0.00'))
@@ -69,6 +107,8 @@ class Session(db.Model):
     
     notes = db.Column(db.Text, nullable=True)
     kanban_status = db.Column(db.String(50), nullable=False, default=KANBAN_STAGES[0])
+    # Marca de alteração usada pelo sync incremental do Kanban (cursor/ETag)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     session_type_id = db.Column(db.Integer, db.ForeignKey('session_type.id'), nullable=False)
@@ -142,38 +182,174 @@ class Session(db.Model):
             else:
                 return 'deadline-overdue'
 
-class Transaction(db.Model):
+# Categorias dos lançamentos gerados pelo próprio ensaio (ver app/finance_service.py)
+SESSION_LEDGER_CATEGORIES = ('session_down_payment', 'session_settlement', 'session_extra_photos',
+                             'session_printing', 'session_cost')
+
+class Transaction(TenantScoped, db.Model):
+    __table_args__ = (
+        # Um lançamento de cada categoria gerenciada por ensaio, mesmo com edições simultâneas
+        sa.Index('ix_transaction_tenant_session_category', 'tenant_id', 'session_id', 'category', unique=True,
+                 sqlite_where=sa.column('category').in_(SESSION_LEDGER_CATEGORIES),
+                 postgresql_where=sa.column('category').in_(SESSION_LEDGER_CATEGORIES)),
+        sa.Index('ix_transaction_tenant_transaction_type', 'tenant_id', 'transaction_type'),
+        sa.Index('ix_transaction_tenant_transaction_date', 'tenant_id', 'transaction_date'),
+        sa.Index('ix_transaction_tenant_recurrence_id', 'tenant_id', 'recurrence_id'),
+        sa.Index('ix_transaction_tenant_category', 'tenant_id', 'category'),
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(256))
-    transaction_type = db.Column(db.String(10), nullable=False, index=True)
+    transaction_type = db.Column(db.String(10), nullable=False)
     value = db.Column(sa.Numeric(10, 2), nullable=False)
-    transaction_date = db.Column(db.Date, nullable=False, index=True)
+    transaction_date = db.Column(db.Date, nullable=False)
     tags = db.Column(db.String(256))
     session_id = db.Column(db.Integer, db.ForeignKey('session.id'))
-    recurrence_id = db.Column(db.String(50), nullable=True, index=True)
+    recurrence_id = db.Column(db.String(50), nullable=True)
     recurrence_installment = db.Column(db.String(20), nullable=True)
     status = db.Column(db.String(20), nullable=False, server_default='efetivado', default='efetivado')
-    category = db.Column(db.String(50), index=True, nullable=True) 
+    category = db.Column(db.String(50), nullable=True) 
+
+def _archive_table(model):
+    """
+    Tabela de arquivo de `model` (ver app/archive.py): as mesmas colunas, sem chaves estrangeiras nem unicidade,
+    mais a data em que a linha saiu da tabela quente e, para itens da lixeira, a data da exclusão.
+    Índices: os da tabela quente e um por chave estrangeira, todos começando por tenant_id.
+    """
+    source = model.__table__
+    name = f'{source.name}_archive'
+    columns = [sa.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                         autoincrement=False)
+               for column in source.columns]
+    # Índices parciais (restrições da tabela quente) não se aplicam ao arquivo
+    indexes = [sa.Index(index.name.replace(f'ix_{source.name}_', f'ix_{name}_', 1), *[column.name for column in index.columns])
+               for index in source.indexes if index.dialect_options['sqlite'].get('where') is None]
+    indexes += [sa.Index(f'ix_{name}_tenant_{column.name}', 'tenant_id', column.name)
+                for column in source.columns if column.foreign_keys and column.name != 'tenant_id']
+    return db.Table(
+        name, *columns,
+        sa.Column('archived_at', db.DateTime, nullable=False),
+        sa.Column('deleted_at', db.DateTime, nullable=True),
+        sa.Index(f'ix_{name}_tenant_deleted_at', 'tenant_id', 'deleted_at'),
+        *indexes,
+    )
+
+SessionArchive = _archive_table(Session)
+TransactionArchive = _archive_table(Transaction)
+
+class DailyBalance(TenantScoped, db.Model):
+    """
+    Índice de saldo do livro-caixa: variação líquida efetivada por dia.
+    Mantido incrementalmente pelos eventos de escrita de Transaction (ver app/ledger_service.py).
+    """
+    __table_args__ = (sa.Index('ix_daily_balance_tenant_balance_date', 'tenant_id', 'balance_date', unique=True),)
+    id = db.Column(db.Integer, primary_key=True)
+    balance_date = db.Column(db.Date, nullable=False)
+    net_change = db.Column(sa.Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+
+class BalanceCheckpoint(TenantScoped, db.Model):
+    """
+    Saldo efetivado acumulado até o último dia de cada mês fechado (checkpoint do índice de saldo).
+    O saldo de uma data é o checkpoint anterior mais os poucos dias de DailyBalance depois dele.
+    """
+    __table_args__ = (sa.Index('ix_balance_checkpoint_tenant_checkpoint_date', 'tenant_id', 'checkpoint_date', unique=True),)
+    id = db.Column(db.Integer, primary_key=True)
+    checkpoint_date = db.Column(db.Date, nullable=False)
+    closing_balance = db.Column(sa.Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+
+class ChangeEvent(TenantScoped, db.Model):
+    """
+    Fila curta de eventos de alteração (Kanban/livro-caixa) para o canal SSE.
+    Serve de ponte entre workers do gunicorn: cada stream lê os eventos do seu estúdio pelo id crescente.
+    """
+    __table_args__ = (sa.Index('ix_change_event_tenant_id_id', 'tenant_id', 'id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+
+class AuditLog(TenantScoped, db.Model):
+    """
+    Trilha de auditoria somente de inserção (ver app/audit.py): uma linha por criação, alteração ou exclusão
+    de ensaio, lançamento ou meta, com o diff em JSON compacto. No SQLite, triggers recusam UPDATE e DELETE.
+    """
+    __table_args__ = (
+        # Histórico de uma entidade: igualdade em (estúdio, tipo, id) e ordem pelo id, sem ordenação extra
+        sa.Index('ix_audit_log_entity', 'tenant_id', 'entity_type', 'entity_id', 'id'),
+        sa.Index('ix_audit_log_tenant_changed_at', 'tenant_id', 'changed_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Agrupa as linhas gravadas no mesmo commit (ex.: edição de uma série de lançamentos)
+    changeset = db.Column(db.String(32), nullable=False)
+    entity_type = db.Column(db.String(32), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    origin = db.Column(db.String(64), nullable=True)
+    changes = db.Column(db.Text, nullable=False, default='{}')
+
+for _operation in ('UPDATE', 'DELETE'):
+    sa.event.listen(AuditLog.__table__, 'after_create', sa.DDL(
+        f"CREATE TRIGGER audit_log_no_{_operation.lower()} BEFORE {_operation} ON audit_log "
+        f"BEGIN SELECT RAISE(ABORT, 'audit_log aceita apenas inserções'); END"
+    ).execute_if(dialect='sqlite'))
+
+class DataVersion(TenantScoped, db.Model):
+    """
+    Contador de alterações por estúdio e tabela, incrementado na mesma transação de cada escrita
+    (ver app/http_cache.py). Base barata para ETags: ler as versões é uma consulta pela chave primária.
+    """
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenant.id'), primary_key=True, default=require_tenant_id)
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ClientMetrics(TenantScoped, db.Model):
+    """
+    Retrato das métricas RFM/LTV por cliente (ver app/client_analytics.py), recalculado por inteiro em uma
+    única instrução agrupada por estúdio quando ensaios, lançamentos ou clientes mudam (source_version).
+    """
+    __table_args__ = (sa.Index('ix_client_metrics_tenant_segment', 'tenant_id', 'segment'),)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), primary_key=True)
+    first_session_date = db.Column(db.Date, nullable=True)
+    last_session_date = db.Column(db.Date, nullable=True)
+    frequency = db.Column(db.Integer, nullable=False, default=0)
+    monetary = db.Column(sa.Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+    lifetime_value = db.Column(sa.Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+    r_score = db.Column(db.Integer, nullable=False, default=0)
+    f_score = db.Column(db.Integer, nullable=False, default=0)
+    m_score = db.Column(db.Integer, nullable=False, default=0)
+    segment = db.Column(db.String(20), nullable=False)
+    source_version = db.Column(db.String(64), nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
 
-class InteractionLog(db.Model):
+class InteractionLog(TenantScoped, db.Model):
+    __table_args__ = (sa.Index('ix_interaction_log_tenant_interaction_date', 'tenant_id', 'interaction_date'),)
     id = db.Column(db.Integer, primary_key=True)
-    interaction_date = db.Column(db.Date, nullable=False, index=True, default=date.today)
+    interaction_date = db.Column(db.Date, nullable=False, default=date.today)
     channel = db.Column(db.String(50), nullable=False)
     notes = db.Column(db.Text, nullable=False)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     client = db.relationship('Client', back_populates='interactions')
 
-class Goal(db.Model):
+class Goal(TenantScoped, db.Model):
+    __table_args__ = (sa.Index('ix_goal_tenant_status', 'tenant_id', 'status'),)
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
     target_value = db.Column(sa.Numeric(10, 2), nullable=False, default=Decimal('0.00'))
     target_date = db.Column(db.Date, nullable=True)
     status = db.Column(db.String(20), nullable=False, default='Ativa')
     notes = db.Column(db.Text, nullable=True)
+    # Soma das contribuições, mantida pelos eventos de escrita de GoalContribution (ver app/goal_service.py)
+    saved_total = db.Column(sa.Numeric(12, 2), nullable=False, default=Decimal('0.00'), server_default='0')
     contributions = db.relationship('GoalContribution', backref='goal', lazy='dynamic', cascade='all, delete-orphan')
 
-class GoalContribution(db.Model):
+class GoalContribution(TenantScoped, db.Model):
+    __table_args__ = (sa.Index('ix_goal_contribution_tenant_goal_id', 'tenant_id', 'goal_id'),)
     id = db.Column(db.Integer, primary_key=True)
     value = db.Column(sa.Numeric(10, 2), nullable=False, default=Decimal('0.00'))
     contribution_date = db.Column(db.Date, nullable=False)
-    goal_id = db.Column(db.Integer, db.ForeignKey('goal.id'), nullable=False)
\ No newline at end of file
+    goal_id = db.Column(db.Integer, db.ForeignKey('goal.id'), nullable=False)
+    # Saída correspondente no livro-caixa (opcional; ver GoalProgressService.add_contribution)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=True, index=True)
+    transaction = db.relationship('Transaction')
\ No newline at end of file
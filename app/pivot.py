@@ -0,0 +1,323 @@
+# app/pivot.py
+"""
+Motor de tabelas dinâmicas (pivot) sobre o livro-caixa e os ensaios.
+
+Uma consulta é (fonte, dimensões, medidas, período, subtotais?) e vira um único comando SQL:
+    WITH base AS (SELECT <dimensões>, <componentes somáveis> FROM <fato> WHERE <período> GROUP BY <dimensões>)
+    SELECT <dimensões>, 0 AS level, <medidas> FROM base GROUP BY d1, d2, ...
+    UNION ALL SELECT d1, NULL, 1 AS level, ... FROM base GROUP BY d1       -- subtotais (estilo ROLLUP)
+    UNION ALL SELECT NULL, NULL, 2 AS level, ... FROM base                 -- total geral
+O fato é lido uma vez; os subtotais reagregam o resultado já agrupado (pequeno). Medidas são fórmulas
+sobre componentes somáveis (soma, contagem), então médias e margens dos subtotais saem exatas.
+
+O resultado é colunar (PivotResult): a tela e a exportação (CSV/JSON) consomem a mesma estrutura.
+Um relatório novo é só uma declaração em PRESETS (ou uma dimensão/medida nova em SOURCES).
+"""
+import csv
+import io
+from collections import namedtuple
+import sqlalchemy as sa
+from sqlalchemy import func
+from app import db, get_month_name_pt_br
+from app.models import Client, Session, SessionType, Transaction
+
+MAX_DIMENSIONS = 3
+
+Dimension = namedtuple('Dimension', 'label expression display', defaults=(None,))
+Measure = namedtuple('Measure', 'label formula kind')  # kind: currency | number | percent
+
+class PivotError(ValueError):
+    pass
+
+class PivotSource:
+    """
+    Fato da tabela dinâmica: o FROM (com joins), a coluna de data do filtro de período, os componentes
+    somáveis (nome -> agregado SQL) e as dimensões/medidas oferecidas. Dimensões com `joins` extras
+    (ex.: etiquetas) recebem o FROM e devolvem o FROM com o join; como multiplicam as linhas do fato
+    (um lançamento com duas etiquetas aparece nas duas), os subtotais sem elas vêm de um agrupamento sem o join.
+    """
+
+    def __init__(self, label, from_clause, date_column, components, dimensions, measures, joins=None):
+        self.label = label
+        self.from_clause = from_clause
+        self.date_column = date_column
+        self.components = components
+        self.dimensions = dimensions
+        self.measures = measures
+        self.joins = joins or {}
+
+PivotQuery = namedtuple('PivotQuery', 'source dimensions measures rollup', defaults=(True,))
+
+# DIMENSÕES COMUNS
+def _month(column):
+    return Dimension('Mês', func.strftime('%Y-%m', column), _display_month)
+
+def _quarter(column):
+    quarter = (sa.cast(func.strftime('%m', column), sa.Integer) + 2) // 3
+    return Dimension('Trimestre', func.strftime('%Y', column) + '-T' + sa.cast(quarter, sa.String))
+
+def _year(column):
+    return Dimension('Ano', func.strftime('%Y', column))
+
+def _display_month(value):
+    year, month = value.split('-')
+    return f'{get_month_name_pt_br(int(month))}/{year}'
+
+def _tag_split(model):
+    """
+    Etiquetas separadas por vírgula -> linhas (owner_id, tag), via CTE recursiva.
+    Só percorre registros com etiqueta; quem não tem recebe "Sem etiqueta" no LEFT JOIN.
+    """
+    anchor = (
+        sa.select(model.id.label('owner_id'), sa.literal('').label('tag'), (model.tags + ',').label('rest'))
+        .where(model.tags.isnot(None), model.tags != '')
+        .cte(f'{model.__tablename__}_tag_split', recursive=True)
+    )
+    separator = func.instr(anchor.c.rest, ',')
+    split = anchor.union_all(
+        sa.select(anchor.c.owner_id,
+                  func.trim(func.substr(anchor.c.rest, 1, separator - 1)),
+                  func.substr(anchor.c.rest, separator + 1))
+        .where(anchor.c.rest != '')
+    )
+    return sa.select(split.c.owner_id, split.c.tag).where(split.c.tag != '').distinct().subquery(f'{model.__tablename__}_tags')
+
+def _tag_dimension(model):
+    tags = _tag_split(model)
+    dimension = Dimension('Etiqueta', func.coalesce(tags.c.tag, 'Sem etiqueta'))
+    return dimension, lambda from_clause: from_clause.outerjoin(tags, tags.c.owner_id == model.id)
+
+def _ratio(numerator, denominator, scale=1):
+    return sa.cast(numerator, sa.Float) * scale / func.nullif(denominator, 0)
+
+def _money(expression):
+    return sa.type_coerce(expression, sa.Numeric(12, 2))
+
+# FONTES
+def _ledger_source():
+    efetivado = Transaction.status == 'efetivado'
+    entry = sa.and_(Transaction.transaction_type == 'entry', efetivado)
+    exit_ = sa.and_(Transaction.transaction_type == 'exit', efetivado)
+    tag, tag_join = _tag_dimension(Transaction)
+    return PivotSource(
+        'Livro-caixa',
+        sa.orm.outerjoin(Transaction, Session, Session.id == Transaction.session_id)
+        .outerjoin(SessionType, SessionType.id == Session.session_type_id)
+        .outerjoin(Client, Client.id == Session.client_id),
+        Transaction.transaction_date,
+        components={
+            'value': func.sum(Transaction.value),
+            'count': func.count(Transaction.id),
+            'entries': func.sum(sa.case((entry, Transaction.value), else_=0)),
+            'exits': func.sum(sa.case((exit_, Transaction.value), else_=0)),
+        },
+        dimensions={
+            'month': _month(Transaction.transaction_date),
+            'quarter': _quarter(Transaction.transaction_date),
+            'year': _year(Transaction.transaction_date),
+            'session_type': Dimension('Tipo de ensaio', func.coalesce(SessionType.name, 'Sem ensaio')),
+            'lead_source': Dimension('Origem do lead', func.coalesce(func.nullif(Client.lead_source, ''), 'Não informado')),
+            'tag': tag,
+            'category': Dimension('Categoria', func.coalesce(func.nullif(Transaction.category, ''), 'Sem categoria')),
+            'status': Dimension('Status', Transaction.status),
+            'transaction_type': Dimension('Tipo', sa.case((Transaction.transaction_type == 'entry', 'Entrada'), else_='Saída')),
+        },
+        measures={
+            'entries': Measure('Entradas', lambda c: _money(c.entries), 'currency'),
+            'exits': Measure('Saídas', lambda c: _money(c.exits), 'currency'),
+            'margin': Measure('Margem', lambda c: _money(c.entries - c.exits), 'currency'),
+            'margin_pct': Measure('Margem (%)', lambda c: _ratio(c.entries - c.exits, c.entries, 100), 'percent'),
+            'sum': Measure('Soma dos valores', lambda c: _money(c.value), 'currency'),
+            'count': Measure('Lançamentos', lambda c: c.count, 'number'),
+            'avg': Measure('Valor médio', lambda c: _money(_ratio(c.value, c.count)), 'currency'),
+        },
+        joins={'tag': tag_join},
+    )
+
+def _sessions_source():
+    cost = func.coalesce(Session.session_cost, 0)
+    tag, tag_join = _tag_dimension(Client)
+    return PivotSource(
+        'Ensaios',
+        sa.orm.join(Session, SessionType, SessionType.id == Session.session_type_id)
+        .join(Client, Client.id == Session.client_id),
+        Session.session_date,
+        components={
+            'count': func.count(Session.id),
+            'value': func.sum(Session.total_value),
+            'cost': func.sum(cost),
+        },
+        dimensions={
+            'month': _month(Session.session_date),
+            'quarter': _quarter(Session.session_date),
+            'year': _year(Session.session_date),
+            'session_type': Dimension('Tipo de ensaio', SessionType.name),
+            'lead_source': Dimension('Origem do lead', func.coalesce(func.nullif(Client.lead_source, ''), 'Não informado')),
+            'tag': Dimension('Etiqueta do cliente', tag.expression),
+            'status': Dimension('Etapa', Session.kanban_status),
+        },
+        measures={
+            'count': Measure('Ensaios', lambda c: c.count, 'number'),
+            'sum': Measure('Valor contratado', lambda c: _money(c.value), 'currency'),
+            'avg': Measure('Ticket médio', lambda c: _money(_ratio(c.value, c.count)), 'currency'),
+            'cost': Measure('Custos', lambda c: _money(c.cost), 'currency'),
+            'margin': Measure('Margem', lambda c: _money(c.value - c.cost), 'currency'),
+            'margin_pct': Measure('Margem (%)', lambda c: _ratio(c.value - c.cost, c.value, 100), 'percent'),
+        },
+        joins={'tag': tag_join},
+    )
+
+SOURCES = {
+    'ledger': _ledger_source(),
+    'sessions': _sessions_source(),
+}
+
+# Relatórios prontos: cada um é só uma declaração
+PRESETS = {
+    'margem-trimestral': ('Margem por trimestre', PivotQuery('ledger', ('quarter',), ('entries', 'exits', 'margin', 'margin_pct'))),
+    'faturamento-por-tipo': ('Faturamento por tipo de ensaio e mês', PivotQuery('ledger', ('session_type', 'month'), ('entries', 'count'))),
+    'leads-por-origem': ('Faturamento por origem do lead', PivotQuery('ledger', ('lead_source',), ('entries', 'margin', 'count'))),
+    'despesas-por-categoria': ('Despesas por categoria e status', PivotQuery('ledger', ('category', 'status'), ('exits', 'count', 'avg'))),
+    'etiquetas': ('Lançamentos por etiqueta', PivotQuery('ledger', ('tag',), ('entries', 'exits', 'count'))),
+    'ensaios-por-tipo': ('Ensaios por tipo e trimestre', PivotQuery('sessions', ('session_type', 'quarter'), ('count', 'avg', 'margin', 'margin_pct'))),
+}
+
+class PivotResult:
+    """
+    Resultado colunar: `columns` tem uma lista por dimensão e por medida (mesmo comprimento) e `levels`
+    diz quantas dimensões finais foram agregadas na linha (0 = detalhe, len(dimensions) = total geral).
+    """
+
+    def __init__(self, source, dimensions, measures, columns, levels):
+        self.source = source
+        self.dimensions = dimensions
+        self.measures = measures
+        self.columns = columns
+        self.levels = levels
+
+    def __len__(self):
+        return len(self.levels)
+
+    def rows(self):
+        """Linhas para a tela: (level, valores das dimensões, valores das medidas)."""
+        dimensions = list(zip(*(self.columns[name] for name in self.dimensions)))
+        measures = list(zip(*(self.columns[name] for name in self.measures)))
+        return zip(self.levels, dimensions, measures)
+
+    def headers(self):
+        source = SOURCES[self.source]
+        return ([source.dimensions[name].label for name in self.dimensions]
+                + [source.measures[name].label for name in self.measures])
+
+    def display(self, name, value):
+        """Valor de dimensão para exibição (ex.: 2025-03 -> Março/2025)."""
+        formatter = SOURCES[self.source].dimensions[name].display
+        return formatter(value) if formatter and value is not None else value
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'dimensions': list(self.dimensions),
+            'measures': list(self.measures),
+            'levels': self.levels,
+            'columns': self.columns,
+        }
+
+    def to_csv(self):
+        """CSV com ';' (abre direto no Excel em português); subtotais levam "Subtotal"/"Total" na dimensão agregada."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        writer.writerow(self.headers())
+        depth = len(self.dimensions)
+        for level, dims, measures in self.rows():
+            dims = list(dims)
+            if level:
+                dims[depth - level] = 'Total' if level == depth else 'Subtotal'
+            writer.writerow([*dims, *('' if value is None else round(value, 2) if isinstance(value, float) else value
+                                      for value in measures)])
+        return buffer.getvalue()
+
+class PivotService:
+
+    @staticmethod
+    def parse(source_name, dimensions, measures, rollup=True):
+        """Valida os nomes pedidos (URL/preset) contra a declaração da fonte."""
+        source = SOURCES.get(source_name)
+        if source is None:
+            raise PivotError(f'Fonte desconhecida: {source_name}.')
+        dimensions = tuple(dict.fromkeys(name for name in dimensions if name))
+        measures = tuple(dict.fromkeys(name for name in measures if name))
+        if not dimensions or len(dimensions) > MAX_DIMENSIONS:
+            raise PivotError(f'Escolha de 1 a {MAX_DIMENSIONS} dimensões.')
+        if not measures:
+            raise PivotError('Escolha ao menos uma medida.')
+        unknown = [name for name in dimensions if name not in source.dimensions]
+        unknown += [name for name in measures if name not in source.measures]
+        if unknown:
+            raise PivotError(f'Campos indisponíveis em {source.label}: {", ".join(unknown)}.')
+        return PivotQuery(source_name, dimensions, measures, bool(rollup))
+
+    @staticmethod
+    def _base(source, dimensions, start_date, end_date, name):
+        from_clause = source.from_clause
+        for dimension in dimensions:
+            if dimension in source.joins:
+                from_clause = source.joins[dimension](from_clause)
+        dims = [source.dimensions[dimension].expression.label(dimension) for dimension in dimensions]
+        components = [expression.label(component) for component, expression in source.components.items()]
+        query = (
+            sa.select(*dims, *components)
+            .select_from(from_clause)
+            .where(source.date_column.between(start_date, end_date))
+        )
+        if dims:
+            query = query.group_by(*dimensions)
+        return query.cte(name)
+
+    @staticmethod
+    def compile(query, start_date, end_date):
+        """Monta o comando único (CTE agrupada + níveis de subtotal em UNION ALL)."""
+        source = SOURCES[query.source]
+        base = PivotService._base(source, query.dimensions, start_date, end_date, 'pivot_base')
+        plain_dimensions = tuple(name for name in query.dimensions if name not in source.joins)
+        plain_base = None
+
+        depth = len(query.dimensions)
+        levels = range(depth + 1) if query.rollup else (0,)
+        selects = []
+        for level in levels:
+            kept = query.dimensions[:depth - level]
+            level_base = base
+            if len(plain_dimensions) < depth and not set(kept) - set(plain_dimensions):
+                # Nível sem dimensão multivalorada: agrega a partir do fato sem o join (sem contar em dobro)
+                if plain_base is None:
+                    plain_base = PivotService._base(source, plain_dimensions, start_date, end_date, 'pivot_plain')
+                level_base = plain_base
+            totals = namedtuple('Components', source.components)(
+                *(func.coalesce(func.sum(level_base.c[name]), 0) for name in source.components))
+            columns = [level_base.c[name] if name in kept else sa.null().label(name) for name in query.dimensions]
+            select = sa.select(
+                *columns, sa.literal(level).label('level'),
+                *(source.measures[name].formula(totals).label(name) for name in query.measures),
+            ).select_from(level_base)
+            if kept:
+                select = select.group_by(*(level_base.c[name] for name in kept))
+            selects.append(select)
+        statement = selects[0] if len(selects) == 1 else sa.union_all(*selects)
+        ordered = statement.subquery('pivot')
+        # Ordem de ROLLUP: detalhes de cada grupo antes do seu subtotal; total geral por último
+        order_by = []
+        for name in query.dimensions:
+            order_by += [ordered.c[name].is_(None), ordered.c[name]]
+        return sa.select(ordered).order_by(*order_by)
+
+    @staticmethod
+    def run(query, start_date, end_date):
+        rows = db.session.execute(PivotService.compile(query, start_date, end_date)).all()
+        names = [*query.dimensions, 'level', *query.measures]
+        columns = {name: [] for name in names}
+        for row in rows:
+            for name, value in zip(names, row):
+                columns[name].append(value)
+        levels = columns.pop('level')
+        return PivotResult(query.source, query.dimensions, query.measures, columns, levels)
@@ -0,0 +1,171 @@
+# app/profitability.py
+import heapq
+from collections import OrderedDict
+from decimal import Decimal
+from flask import current_app
+import sqlalchemy as sa
+from sqlalchemy import func
+from app import db
+from app.models import Client, Session, SessionType, Transaction
+from app.goal_service import GOAL_CATEGORY
+from app.tenancy import current_tenant_id
+from app.http_cache import DataVersionService, FragmentCache
+from app.read_routing import archive_engine_active
+
+# Tabelas lidas pelo rateio (versões que invalidam o cache)
+SOURCE_TABLES = ('session', 'transaction', 'session_type', 'client')
+
+# Base do rateio dos custos fixos -> rótulo
+ALLOCATION_BASES = OrderedDict([
+    ('count', 'Igual por ensaio'),
+    ('revenue', 'Proporcional ao faturamento'),
+    ('duration', 'Proporcional à duração do tipo'),
+])
+
+# Ensaios de menor margem listados na tela
+WORST_SESSIONS = 20
+
+_cache = FragmentCache()
+
+class CostAllocationService:
+    """
+    Lucratividade real por ensaio e por tipo de ensaio:
+    - faturamento e custos diretos: lançamentos efetivados ligados ao ensaio (qualquer data), para ensaios do período;
+    - custos fixos: saídas efetivadas sem ensaio (aluguel, equipamento...) do período, exceto aportes em metas;
+    - rateio mês a mês: os custos fixos de cada mês são divididos entre os ensaios do mesmo mês pelo peso
+      escolhido (1 por ensaio, faturamento ou duração estimada do tipo). Meses sem ensaios (ou sem peso)
+      ficam como "não rateado".
+    O rateio inteiro é um único SELECT com função de janela (peso / soma dos pesos do mês), sem laço por ensaio.
+    """
+
+    @staticmethod
+    def _month(column):
+        return func.strftime('%Y-%m', column)
+
+    @staticmethod
+    def overhead_filter(start_date, end_date):
+        return sa.and_(
+            Transaction.transaction_type == 'exit',
+            Transaction.status == 'efetivado',
+            Transaction.session_id.is_(None),
+            sa.or_(Transaction.category.is_(None), Transaction.category != GOAL_CATEGORY),
+            Transaction.transaction_date.between(start_date, end_date),
+        )
+
+    @staticmethod
+    def allocation_select(start_date, end_date, basis):
+        """Uma linha por ensaio do período com faturamento, custo direto, custo fixo rateado e margem."""
+        efetivado = Transaction.status == 'efetivado'
+        ledger = (
+            sa.select(
+                Transaction.session_id,
+                func.sum(sa.case((sa.and_(Transaction.transaction_type == 'entry', efetivado), Transaction.value), else_=0)).label('revenue'),
+                func.sum(sa.case((sa.and_(Transaction.transaction_type == 'exit', efetivado), Transaction.value), else_=0)).label('direct_cost'),
+            )
+            .where(Transaction.session_id.isnot(None))
+            .group_by(Transaction.session_id)
+            .subquery()
+        )
+        overhead = (
+            sa.select(CostAllocationService._month(Transaction.transaction_date).label('month'),
+                      func.sum(Transaction.value).label('total'))
+            .where(CostAllocationService.overhead_filter(start_date, end_date))
+            .group_by('month')
+            .subquery()
+        )
+        revenue = func.coalesce(ledger.c.revenue, 0)
+        direct_cost = func.coalesce(ledger.c.direct_cost, 0)
+        weight = {
+            'count': sa.literal(1),
+            'revenue': revenue,
+            'duration': SessionType.duration_hours,
+        }[basis]
+        month = CostAllocationService._month(Session.session_date)
+        month_weight = func.sum(weight).over(partition_by=month)
+        allocated = func.coalesce(
+            sa.cast(func.coalesce(overhead.c.total, 0), sa.Float) * weight / func.nullif(month_weight, 0), 0)
+        return (
+            sa.select(
+                Session.id, Session.session_code, Session.session_date,
+                SessionType.name.label('session_type_name'), Client.name.label('client_name'),
+                sa.type_coerce(revenue, sa.Numeric(12, 2)).label('revenue'),
+                sa.type_coerce(direct_cost, sa.Numeric(12, 2)).label('direct_cost'),
+                allocated.label('overhead'),
+                month.label('month'),
+                (func.coalesce(month_weight, 0) > 0).label('month_allocated'),
+            )
+            .join(SessionType, SessionType.id == Session.session_type_id)
+            .join(Client, Client.id == Session.client_id)
+            .outerjoin(ledger, ledger.c.session_id == Session.id)
+            .outerjoin(overhead, overhead.c.month == month)
+            .where(Session.session_date.between(start_date, end_date))
+        )
+
+    @staticmethod
+    def _compute(start_date, end_date, basis):
+        monthly_overhead = db.session.execute(
+            sa.select(CostAllocationService._month(Transaction.transaction_date).label('month'), func.sum(Transaction.value))
+            .where(CostAllocationService.overhead_filter(start_date, end_date))
+            .group_by('month')
+        ).all()
+        total_overhead = sum((Decimal(total) for _, total in monthly_overhead), Decimal('0'))
+        rows = db.session.execute(CostAllocationService.allocation_select(start_date, end_date, basis)).all()
+
+        zero = Decimal('0.00')
+        allocated_months = set()
+        by_type = {}
+        sessions = []
+        totals = {'session_count': 0, 'revenue': zero, 'direct_cost': zero, 'overhead': 0.0}
+        for row in rows:
+            revenue, direct_cost = row.revenue or zero, row.direct_cost or zero
+            # O rateio fica em float até o fim: arredondar por ensaio faria a soma se afastar do total rateado
+            overhead = row.overhead or 0.0
+            margin = revenue - direct_cost - Decimal(overhead).quantize(zero)
+            if row.month_allocated:
+                allocated_months.add(row.month)
+            sessions.append({
+                'id': row.id, 'session_code': row.session_code, 'session_date': row.session_date,
+                'session_type_name': row.session_type_name, 'client_name': row.client_name,
+                'revenue': revenue, 'direct_cost': direct_cost, 'overhead': Decimal(overhead).quantize(zero), 'margin': margin,
+            })
+            item = by_type.setdefault(row.session_type_name, {
+                'session_type_name': row.session_type_name, 'session_count': 0,
+                'revenue': zero, 'direct_cost': zero, 'overhead': 0.0})
+            for bucket in (item, totals):
+                bucket['session_count'] += 1
+                bucket['revenue'] += revenue
+                bucket['direct_cost'] += direct_cost
+                bucket['overhead'] += overhead
+
+        for bucket in (*by_type.values(), totals):
+            bucket['overhead'] = Decimal(bucket['overhead']).quantize(zero)
+            bucket['gross_profit'] = bucket['revenue'] - bucket['direct_cost']
+            bucket['margin'] = bucket['gross_profit'] - bucket['overhead']
+            bucket['margin_pct'] = float(bucket['margin'] / bucket['revenue'] * 100) if bucket['revenue'] else None
+            bucket['margin_per_session'] = bucket['margin'] / bucket['session_count'] if bucket['session_count'] else zero
+        totals['total_overhead'] = Decimal(total_overhead).quantize(zero)
+        # Não rateado: custos fixos de meses sem ensaio (ou com peso total zero)
+        totals['unallocated'] = sum((Decimal(total).quantize(zero) for month, total in monthly_overhead
+                                     if month not in allocated_months), zero)
+
+        return {
+            'basis': basis,
+            'types': sorted(by_type.values(), key=lambda item: item['margin'], reverse=True),
+            'worst_sessions': heapq.nsmallest(WORST_SESSIONS, sessions, key=lambda item: item['margin']),
+            'totals': totals,
+        }
+
+    @staticmethod
+    def report(start_date, end_date, basis='count'):
+        """
+        Resultado do rateio, guardado por worker por (período, base, engine) enquanto os dados não mudarem:
+        com ?arquivo=1 as mesmas consultas leem também as linhas arquivadas.
+        """
+        if basis not in ALLOCATION_BASES:
+            basis = 'count'
+        key = (start_date, end_date, basis, archive_engine_active(), tuple(DataVersionService.versions(SOURCE_TABLES)))
+        cached = _cache.get(current_tenant_id(), key)
+        if cached is None:
+            cached = CostAllocationService._compute(start_date, end_date, basis)
+            _cache.set(current_tenant_id(), key, cached, current_app.config.get('PROFITABILITY_CACHE_ENTRIES', 32))
+        return cached
@@ -0,0 +1,78 @@
+# app/query_budget.py
+import json
+import threading
+import sqlalchemy as sa
+
+def query_budget(max_queries, **url_values):
+    """
+    Declara o número máximo de comandos SQL que uma rota pode executar por requisição.
+    Verificado pelo plugin benchmarks/pytest_query_budget.py sobre a base semeada.
+
+    `url_values` monta a URL de rotas com parâmetros; valores entre chaves são preenchidos com os
+    dados da base semeada (ex.: client_name='{busiest_client}'). Uso:
+
+        @bp.route('/<client_name>')
+        @login_required
+        @query_budget(8, client_name='{busiest_client}')
+        def client_details(client_name): ...
+    """
+    def decorator(view):
+        view.query_budget = {'max_queries': max_queries, 'url_values': url_values}
+        return view
+    return decorator
+
+def route_budgets(app):
+    """Orçamentos declarados nas rotas: {endpoint: {'max_queries': n, 'url_values': {...}}}."""
+    budgets = {}
+    for endpoint, view in app.view_functions.items():
+        # Segue a cadeia de decoradores (login_required etc. usam functools.wraps)
+        while view is not None and not hasattr(view, 'query_budget'):
+            view = getattr(view, '__wrapped__', None)
+        if view is not None:
+            budgets[endpoint] = dict(view.query_budget)
+    return budgets
+
+def load_budget_file(path):
+    """
+    Orçamentos de um arquivo JSON, para rotas que não são anotadas no código:
+        {"finance.index": {"max_queries": 6}, "crm.client_details": {"max_queries": 8, "url": "/clientes/{busiest_client}"}}
+    """
+    with open(path, encoding='utf-8') as handle:
+        return {endpoint: dict(spec) for endpoint, spec in json.load(handle).items() if not endpoint.startswith('_')}
+
+class QueryCounter:
+    """
+    Conta os comandos SQL executados na thread atual enquanto ativo.
+        with QueryCounter(db.engine) as counter:
+            client.get('/')
+        counter.count, counter.statements
+    Com `sa.engine.Engine` no lugar de uma engine, conta em todas (principal e de leitura).
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self._thread = None
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self._thread = threading.get_ident()
+        self.statements = []
+        sa.event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        sa.event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+    def report(self, limit=None):
+        """Texto com as instruções executadas (para a mensagem de falha)."""
+        lines = [f'{n:3}. {" ".join(statement.split())[:200]}' for n, statement in enumerate(self.statements, 1)]
+        return '\n'.join(lines[:limit])
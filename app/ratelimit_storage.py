@@ -0,0 +1,95 @@
+# app/ratelimit_storage.py
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+from limits.storage import Storage
+
+class SQLiteStorage(Storage):
+    """
+    Backend de armazenamento do Flask-Limiter em um arquivo SQLite compartilhado.
+
+    Todos os workers do gunicorn enxergam os mesmos contadores (o que o "memory://" não faz)
+    sem precisar de Redis. Cada incremento é um único UPSERT ... RETURNING, atômico no SQLite,
+    e o modo WAL mantém as leituras livres de bloqueio. Suporta a estratégia "fixed-window"
+    (padrão do Flask-Limiter).
+
+    Uso: RATELIMIT_STORAGE_URI = "sqlite:////data/ratelimit.db"
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    # Remove contadores expirados a cada N incrementos
+    PURGE_EVERY = 500
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        parsed = urlparse(uri or 'sqlite:///ratelimit.db')
+        # sqlite:////abs/path.db -> /abs/path.db ; sqlite:///rel.db -> rel.db
+        self.path = parsed.path[1:] if parsed.path.startswith('//') else parsed.path.lstrip('/') or 'ratelimit.db'
+        self.timeout = float(options.get('timeout', 5))
+        self._local = threading.local()
+        self._increments = 0
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            # Uma conexão por thread e por processo (o gunicorn faz fork dos workers)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS ratelimit_counter ('
+                ' key TEXT PRIMARY KEY, value INTEGER NOT NULL, expiry REAL NOT NULL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        row = self._connection.execute(
+            'INSERT INTO ratelimit_counter (key, value, expiry) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            ' value = CASE WHEN ratelimit_counter.expiry <= ? THEN excluded.value ELSE ratelimit_counter.value + excluded.value END, '
+            ' expiry = CASE WHEN ratelimit_counter.expiry <= ? THEN excluded.expiry ELSE ratelimit_counter.expiry END '
+            'RETURNING value',
+            (key, amount, now + expiry, now, now)
+        ).fetchone()
+
+        self._increments += 1
+        if self._increments % self.PURGE_EVERY == 0:
+            self._connection.execute('DELETE FROM ratelimit_counter WHERE expiry <= ?', (now,))
+        return row[0]
+
+    def get(self, key):
+        row = self._connection.execute(
+            'SELECT value FROM ratelimit_counter WHERE key = ? AND expiry > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connection.execute(
+            'SELECT expiry FROM ratelimit_counter WHERE key = ? AND expiry > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self):
+        try:
+            self._connection.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._connection.execute('DELETE FROM ratelimit_counter').rowcount
+
+    def clear(self, key):
+        self._connection.execute('DELETE FROM ratelimit_counter WHERE key = ?', (key,))
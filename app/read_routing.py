@@ -0,0 +1,158 @@
+# app/read_routing.py
+"""
+Roteamento de leituras pesadas (relatórios e exportações) para uma engine só de leitura.
+
+Modos (READ_ROUTING_MODE):
+- 'wal': o banco principal roda em WAL e os relatórios usam outro pool, com conexões somente leitura
+  no mesmo arquivo. Em WAL leitores não bloqueiam o escritor (nem o contrário), e uma consulta longa
+  não ocupa as conexões usadas pelo cadastro de ensaios e lançamentos;
+- 'snapshot': os relatórios leem uma cópia do banco feita com a API de backup do SQLite, renovada quando
+  fica mais velha que READ_SNAPSHOT_MAX_AGE segundos (dados podem atrasar até esse intervalo);
+- 'replica': READ_REPLICA_URI (outro backend, ex.: réplica do PostgreSQL);
+- 'primary': sem roteamento;
+- 'auto' (padrão): 'replica' se READ_REPLICA_URI estiver definido, 'wal' para SQLite em arquivo, senão 'primary'.
+
+Uso nas rotas (depois do login, antes do cache, para que ETag e conteúdo venham da mesma fonte):
+
+    @bp.route('/financeiro')
+    @login_required
+    @read_only
+    @cached_page(*REPORT_TABLES, fragment=True)
+    def financial_performance(): ...
+
+Dentro da rota, todo SELECT do db.session vai para a engine de leitura; flush e escritas continuam no principal.
+
+Com ?arquivo=1 (rotas @read_only ou @archive_readable), os SELECTs vão para a engine de arquivo (app/archive.py),
+em que "session" e "transaction" incluem as linhas arquivadas.
+"""
+import functools
+import os
+import threading
+import time
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session as FlaskSession
+import sqlalchemy as sa
+from app.backup import copy_database, sqlite_path
+
+ARCHIVE_ARG = 'arquivo'
+
+def archive_requested():
+    """A página pediu o histórico arquivado (?arquivo=1)?"""
+    return request.args.get(ARCHIVE_ARG) == '1'
+
+def archive_engine_active():
+    """Os SELECTs desta requisição vão para a engine de arquivo (views de união quente + arquivo)?"""
+    engine = g.get('read_engine') if has_app_context() else None
+    router = current_app.extensions.get('read_router') if engine is not None else None
+    return router is not None and router.archive_engine is not None and engine is router.archive_engine
+
+class RoutingSession(FlaskSession):
+    """Sessão do Flask-SQLAlchemy que envia SELECTs para a engine de leitura quando a rota pediu (g.read_engine)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context():
+            engine = g.get('read_engine')
+            if engine is not None and getattr(clause, 'is_select', False):
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+class ReadRouter:
+
+    def __init__(self):
+        self.mode = 'primary'
+        self.engine = None
+        self.archive_engine = None
+        self.snapshot_path = None
+        self._refresh_lock = threading.Lock()
+
+    def init_app(self, app, primary_engine):
+        config = app.config
+        uri = config['SQLALCHEMY_DATABASE_URI']
+        path = sqlite_path(uri)
+        mode = config.get('READ_ROUTING_MODE', 'auto')
+        if mode == 'auto':
+            mode = 'replica' if config.get('READ_REPLICA_URI') else ('wal' if path else 'primary')
+        if mode in ('wal', 'snapshot') and not path:
+            mode = 'primary'
+        self.mode = mode
+
+        if path:
+            # Todas as conexões do principal: WAL, espera por lock em vez de erro imediato
+            @sa.event.listens_for(primary_engine, 'connect')
+            def _sqlite_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                if config.get('SQLITE_WAL', True):
+                    cursor.execute('PRAGMA journal_mode=WAL')
+                    cursor.execute('PRAGMA synchronous=NORMAL')
+                cursor.execute(f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+                cursor.close()
+
+        if mode == 'wal':
+            self.engine = sa.create_engine(f'sqlite:///file:{path}?mode=ro&uri=true')
+        elif mode == 'snapshot':
+            self.snapshot_path = config.get('READ_SNAPSHOT_PATH') or f'{path}.snapshot'
+            self.max_age = float(config.get('READ_SNAPSHOT_MAX_AGE', 300))
+            self.source_path = path
+            # Sem pool: cada checkout abre o arquivo atual (o snapshot é trocado por rename)
+            self.engine = sa.create_engine(f'sqlite:///file:{self.snapshot_path}?mode=ro&uri=true',
+                                           poolclass=sa.pool.NullPool)
+        elif mode == 'replica':
+            self.engine = sa.create_engine(config['READ_REPLICA_URI'], pool_pre_ping=True)
+        app.extensions['read_router'] = self
+
+    def snapshot_age(self):
+        try:
+            return time.time() - os.path.getmtime(self.snapshot_path)
+        except OSError:
+            return None
+
+    def refresh_snapshot(self, force=False):
+        """Renova o snapshot se passou de READ_SNAPSHOT_MAX_AGE. Uma thread por vez; as demais seguem com o atual."""
+        age = self.snapshot_age()
+        if not force and age is not None and age < self.max_age:
+            return False
+        blocking = age is None  # sem snapshot ainda: espera quem estiver copiando
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return False
+        try:
+            age = self.snapshot_age()
+            if force or age is None or age >= self.max_age:
+                copy_database(self.source_path, self.snapshot_path,
+                              pages=current_app.config.get('READ_SNAPSHOT_PAGES_PER_STEP', 256))
+                return True
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def read_engine(self, include_archive=False):
+        engine = self.archive_engine if include_archive and self.archive_engine is not None else self.engine
+        if engine is None:
+            return None
+        if self.mode == 'snapshot':
+            self.refresh_snapshot()
+        return engine
+
+def _routed(view, archive_only):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        router = current_app.extensions.get('read_router')
+        include_archive = archive_requested()
+        engine = None
+        if router is not None and (include_archive or not archive_only):
+            engine = router.read_engine(include_archive)
+        if engine is None:
+            return view(*args, **kwargs)
+        g.read_engine = engine
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.pop('read_engine', None)
+    return wrapper
+
+def read_only(view):
+    """Executa a rota com os SELECTs do db.session na engine de leitura (ver docstring do módulo)."""
+    return _routed(view, archive_only=False)
+
+def archive_readable(view):
+    """Rota comum (leituras no principal) que, com ?arquivo=1, lê pela engine de arquivo."""
+    return _routed(view, archive_only=True)
@@ -0,0 +1,141 @@
+# app/session_service.py
+import re
+import unicodedata
+from collections import defaultdict
+import sqlalchemy as sa
+from sqlalchemy import func
+from app import db
+from app.models import Session, Transaction, Client, KANBAN_STAGES
+from app.ledger_service import LedgerBalanceService
+from app.change_events import queue_event, queue_totals_changed
+from app.http_cache import mark_tables_changed
+from app.audit import record_bulk_update
+
+EDITING_STAGE = 'Edição'
+ARCHIVE_STAGE = KANBAN_STAGES[-1]
+
+def selection_reset_required(old_status, new_status):
+    """Regra do Kanban: voltar de Edição (ou depois) para antes dela zera a data de seleção."""
+    try:
+        editing_stage_index = KANBAN_STAGES.index(EDITING_STAGE)
+        return KANBAN_STAGES.index(old_status) >= editing_stage_index and KANBAN_STAGES.index(new_status) < editing_stage_index
+    except ValueError:
+        return False
+
+def sanitize_text(text):
+    """Remove acentos e caracteres especiais para uso em códigos/URLs."""
+    if not text: return ""
+    nfkd_form = unicodedata.normalize('NFKD', text)
+    sanitized = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
+    sanitized = re.sub(r'[^a-zA-Z0-9]', '', sanitized)
+    return sanitized.upper()
+
+def session_code_for(session, client):
+    """Código do ensaio (AAMMDD_NOME_TIPO_ID). Requer o id, ou seja, a sessão já enviada com flush."""
+    cleaned_name = sanitize_text(client.name)
+    first_name = cleaned_name.split()[0] if cleaned_name.split() else f"CLI{client.id}"
+    return f"{session.session_date.strftime('%y%m%d')}_{first_name}_{session.type.abbreviation}_{session.id}"
+
+def filter_sessions(query, status='ativos', search=None, client_id=None, session_type_id=None, start_date=None, end_date=None):
+    """
+    Filtros do SessionFilterForm sobre um SELECT que envolve Session (telas, ações em lote e API).
+    A busca por nome do cliente usa subconsulta, sem JOIN, para combinar com qualquer projeção.
+    """
+    query = query.filter(Session.kanban_status == ARCHIVE_STAGE) if status == 'arquivados' else query.filter(Session.kanban_status != ARCHIVE_STAGE)
+    if search:
+        search_term = f"%{search}%"
+        query = query.filter(sa.or_(Session.client_id.in_(sa.select(Client.id).where(Client.name.ilike(search_term))),
+                                    Session.session_code.ilike(search_term)))
+    if client_id: query = query.filter(Session.client_id == client_id)
+    if session_type_id: query = query.filter(Session.session_type_id == session_type_id)
+    if start_date: query = query.filter(Session.session_date >= start_date)
+    if end_date: query = query.filter(Session.session_date <= end_date)
+    return query
+
+class SessionBulkService:
+    """
+    Operações em lote sobre ensaios (mudança de etapa, arquivar, restaurar, excluir).
+    Cada operação é executada como comandos SQL sobre o conjunto (UPDATE/DELETE ... WHERE id IN),
+    sem carregar os ensaios um a um.
+    """
+
+    @staticmethod
+    def change_stage(session_ids, new_status, selection_date=None):
+        """
+        Move os ensaios selecionados para `new_status`. `session_ids` é a lista de ids.
+        - Aplica o reset de selection_completed_date para quem volta para antes da Edição.
+        - Entrar em Edição exige data de seleção: usa `selection_date` para quem não tem;
+          sem ela, esses ensaios são ignorados.
+        Retorna (atualizados, ignorados).
+        """
+        columns = (Session.id, Session.kanban_status, Session.selection_completed_date)
+        before = db.session.execute(
+            sa.select(*columns).where(Session.id.in_(session_ids), Session.kanban_status != new_status)
+        ).mappings().all()
+        values = {'kanban_status': new_status}
+        skipped = 0
+
+        editing_stage_index = KANBAN_STAGES.index(EDITING_STAGE)
+        if KANBAN_STAGES.index(new_status) < editing_stage_index:
+            values['selection_completed_date'] = sa.case(
+                (Session.kanban_status.in_(KANBAN_STAGES[editing_stage_index:]), sa.null()),
+                else_=Session.selection_completed_date
+            )
+        elif new_status == EDITING_STAGE:
+            if selection_date is not None:
+                values['selection_completed_date'] = func.coalesce(Session.selection_completed_date, selection_date)
+            else:
+                skipped = sum(row['selection_completed_date'] is None for row in before)
+                before = [row for row in before if row['selection_completed_date'] is not None]
+        return SessionBulkService._move(before, columns, values, new_status), skipped
+
+    @staticmethod
+    def _move(before, columns, values, new_status):
+        """UPDATE dos ensaios lidos em `before` (sem outra mudança de etapa no meio), com auditoria do antes/depois."""
+        if not before:
+            return 0
+        after = db.session.execute(
+            sa.update(Session)
+            .where(Session.id.in_([row['id'] for row in before]), Session.kanban_status != new_status)
+            .values(**values).returning(*columns),
+            execution_options={'synchronize_session': False}
+        ).mappings().all()
+        if after:
+            session_ids = [row['id'] for row in after]
+            record_bulk_update(db.session, Session, before, after)
+            queue_event(db.session, 'session.bulk_stage_changed', session_ids=session_ids, new_status=new_status)
+            mark_tables_changed(db.session, 'session')
+        return len(after)
+
+    @staticmethod
+    def delete(session_ids):
+        """
+        Exclui os ensaios selecionados e, em cascata, suas transações.
+        Como o DELETE em lote não passa pelos eventos do ORM, o índice de saldo diário
+        é corrigido aqui com uma única agregação por data.
+        """
+        signed = sa.case((Transaction.transaction_type == 'entry', Transaction.value), else_=-Transaction.value)
+        rows = db.session.execute(
+            sa.select(Transaction.transaction_date, func.sum(signed))
+            .where(Transaction.session_id.in_(session_ids), Transaction.status == 'efetivado')
+            .group_by(Transaction.transaction_date)
+        ).all()
+        deltas = defaultdict(int)
+        for day, total in rows:
+            if total:
+                deltas[day] -= total
+
+        db.session.execute(
+            sa.delete(Transaction).where(Transaction.session_id.in_(session_ids)),
+            execution_options={'synchronize_session': False}
+        )
+        result = db.session.execute(
+            sa.delete(Session).where(Session.id.in_(session_ids)),
+            execution_options={'synchronize_session': False}
+        )
+        LedgerBalanceService.apply_deltas(db.session.connection(), deltas)
+        if result.rowcount:
+            queue_event(db.session, 'session.bulk_deleted', session_ids=list(session_ids))
+            queue_totals_changed(db.session, deltas.keys())
+            mark_tables_changed(db.session, 'session', 'transaction')
+        return result.rowcount
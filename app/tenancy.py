@@ -0,0 +1,172 @@
+# app/tenancy.py
+"""
+Vários estúdios (Tenant) na mesma instalação: toda tabela de dados tem tenant_id (TenantScoped em app/models.py).
+
+- Estúdio atual: g.tenant_id, definido no início de cada requisição a partir do usuário logado (User.tenant_id)
+  ou, na CLI, por `tenant_context` (os comandos rodam estúdio por estúdio, ver `for_each_tenant`).
+- Leitura: o hook do_orm_execute acrescenta `tenant_id = <atual>` a todo SELECT/UPDATE/DELETE do ORM
+  (with_loader_criteria, inclusive aliases, joins e carregamentos de relacionamentos). Sem estúdio atual
+  (login, CLI fora de tenant_context) nada é filtrado; `execution_options(all_tenants=True)` desliga o filtro.
+- Escrita: tenant_id tem como padrão o estúdio atual, também em INSERTs do Core; sem estúdio, o INSERT falha.
+- Instruções do Core sobre tabelas (Model.__table__) não passam pelo filtro: usam `tenant_filter(table)`.
+- Índices compostos começam por tenant_id, então o custo de cada consulta acompanha os dados do estúdio,
+  não da instalação; caches por worker (versões do cache HTTP e fragmentos) também são separados por estúdio.
+"""
+import contextlib
+import re
+import click
+from flask import g, has_app_context, request
+from flask.cli import with_appcontext
+from flask_login import current_user
+import sqlalchemy as sa
+from app import db
+
+class TenantError(Exception):
+    pass
+
+def current_tenant_id():
+    """Estúdio atual (None fora de requisição logada ou de tenant_context)."""
+    if not has_app_context():
+        return None
+    return g.get('tenant_id')
+
+def require_tenant_id():
+    """Padrão de tenant_id nos INSERTs: o estúdio atual, obrigatório."""
+    tenant_id = current_tenant_id()
+    if tenant_id is None:
+        raise TenantError('Nenhum estúdio ativo: grave dados dentro de uma requisição logada ou de tenant_context().')
+    return tenant_id
+
+@contextlib.contextmanager
+def tenant_context(tenant_id):
+    """Executa o bloco como o estúdio `tenant_id` (CLI, tarefas em segundo plano)."""
+    previous = g.get('tenant_id')
+    g.tenant_id = tenant_id
+    try:
+        yield
+    finally:
+        g.tenant_id = previous
+
+def tenant_filter(table):
+    """Condição de estúdio para instruções do Core sobre `table` (verdadeira sem estúdio atual)."""
+    tenant_id = current_tenant_id()
+    return sa.true() if tenant_id is None else table.c.tenant_id == tenant_id
+
+SLUG_LENGTH = 64
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')[:SLUG_LENGTH] or 'estudio'
+
+def _scope_to_tenant(execute_state):
+    if not (execute_state.is_select or execute_state.is_update or execute_state.is_delete):
+        return
+    if execute_state.is_column_load or execute_state.execution_options.get('all_tenants', False):
+        return
+    tenant_id = current_tenant_id()
+    if tenant_id is None:
+        return
+    from app.models import TenantScoped
+    execute_state.statement = execute_state.statement.options(sa.orm.with_loader_criteria(
+        TenantScoped, lambda cls: cls.tenant_id == tenant_id, include_aliases=True,
+    ))
+
+def _load_request_tenant():
+    # Carrega o usuário (a mesma consulta que o login_required faria depois) e fixa o estúdio da requisição
+    if request.endpoint != 'static':
+        g.tenant_id = current_user.tenant_id if current_user.is_authenticated else None
+
+def init_app(app):
+    sa.event.listen(sa.orm.Session, 'do_orm_execute', _scope_to_tenant)
+    app.before_request(_load_request_tenant)
+    app.cli.add_command(tenant_command)
+
+class TenantService:
+
+    @staticmethod
+    def create(name, slug=None):
+        """Novo estúdio (sem commit). O slug identifica o estúdio na CLI (--tenant)."""
+        from app.models import Tenant
+        slug = slug or slugify(name)
+        if db.session.scalar(sa.select(Tenant.id).where(Tenant.slug == slug)):
+            raise TenantError(f'Já existe um estúdio com o identificador "{slug}".')
+        tenant = Tenant(name=name, slug=slug)
+        db.session.add(tenant)
+        db.session.flush()
+        return tenant
+
+    @staticmethod
+    def available_slug(name):
+        """
+        slugify(name) ou, se já estiver em uso, o mesmo com sufixo numérico (-2, -3, ...), encurtado
+        para caber em SLUG_LENGTH: nomes longos que só diferem depois do corte não colidem.
+        """
+        from app.models import Tenant
+        base = slugify(name)
+        taken = set(db.session.scalars(sa.select(Tenant.slug).where(
+            Tenant.slug.startswith(base[:SLUG_LENGTH - 8].rstrip('-'), autoescape=True))))
+        slug, number = base, 1
+        while slug in taken:
+            number += 1
+            suffix = f'-{number}'
+            slug = base[:SLUG_LENGTH - len(suffix)].rstrip('-') + suffix
+        return slug
+
+    @staticmethod
+    def resolve(key):
+        """Estúdio pelo id ou slug."""
+        from app.models import Tenant
+        condition = Tenant.id == int(key) if str(key).isdigit() else Tenant.slug == key
+        tenant = db.session.scalar(sa.select(Tenant).where(condition))
+        if tenant is None:
+            raise TenantError(f'Estúdio "{key}" não encontrado.')
+        return tenant
+
+    @staticmethod
+    def all_ids():
+        from app.models import Tenant
+        return db.session.scalars(sa.select(Tenant.id).order_by(Tenant.id)).all()
+
+def tenant_option(command):
+    """Opção --tenant (id ou slug) dos comandos da CLI; sem ela, o comando roda para todos os estúdios."""
+    return click.option('--tenant', 'tenant_key', default=None, help='Estúdio (id ou slug); padrão: todos.')(command)
+
+def for_each_tenant(tenant_key):
+    """Ids dos estúdios a processar, já com o contexto de cada um ativo durante a iteração."""
+    tenant_ids = [TenantService.resolve(tenant_key).id] if tenant_key else TenantService.all_ids()
+    for tenant_id in tenant_ids:
+        with tenant_context(tenant_id):
+            yield tenant_id
+
+# CLI: flask tenant create|list
+@click.group('tenant')
+def tenant_command():
+    """Estúdios hospedados nesta instalação."""
+
+@tenant_command.command('create')
+@click.argument('name')
+@click.option('--slug', default=None, help='Identificador curto (padrão: derivado do nome).')
+@with_appcontext
+def tenant_create_command(name, slug):
+    """Cria um estúdio."""
+    try:
+        tenant = TenantService.create(name, slug)
+    except TenantError as error:
+        raise click.ClickException(str(error))
+    db.session.commit()
+    click.echo(f'Estúdio #{tenant.id} "{tenant.name}" ({tenant.slug}) criado.')
+
+@tenant_command.command('list')
+@with_appcontext
+def tenant_list_command():
+    """Lista os estúdios com o número de usuários, clientes e ensaios."""
+    from app.models import Client, Session, Tenant, User
+    counts = {}
+    for model in (User, Client, Session):
+        for tenant_id, total in db.session.execute(
+            sa.select(model.tenant_id, sa.func.count()).group_by(model.tenant_id)
+        ).all():
+            counts.setdefault(tenant_id, {})[model.__tablename__] = total
+    for tenant in db.session.scalars(sa.select(Tenant).order_by(Tenant.id)):
+        row = counts.get(tenant.id, {})
+        click.echo(f"#{tenant.id} {tenant.slug}: {tenant.name} — {row.get('user', 0)} usuário(s), "
+                   f"{row.get('client', 0)} cliente(s), {row.get('session', 0)} ensaio(s)")
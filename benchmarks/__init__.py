@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# Scripts de medição de desempenho. Cada módulo é executável com `python -m benchmarks.<nome>`
+# e usa um banco SQLite temporário (via DATABASE_URL), nunca o banco de produção.
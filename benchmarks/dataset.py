@@ -0,0 +1,201 @@
+# benchmarks/dataset.py
+"""
+Gera uma base sintética realista usando os modelos (e serviços) reais da aplicação.
+
+- Clientes com origem, tags, interações e aniversário;
+- Ensaios distribuídos por SessionType ao longo dos anos, em todas as etapas do Kanban,
+  com o livro-caixa gerado pelo SessionFinanceService (como no formulário de edição);
+- Lançamentos manuais avulsos e séries recorrentes (fixas mensais e parceladas),
+  no mesmo formato criado por finance.add_transaction;
+- Metas com aportes.
+
+Com tenants > 1, gera estúdios adicionais com o mesmo volume (sementes diferentes): as rotas medidas no
+estúdio de benchmark não devem ficar mais lentas conforme a instalação cresce.
+A geração é determinística para a mesma semente. Deve ser chamada dentro de um app_context.
+"""
+import random
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from dateutil.relativedelta import relativedelta
+import sqlalchemy as sa
+from app import db
+from app.models import (User, Client, Session, SessionType, Transaction, InteractionLog, Goal, GoalContribution,
+                        KANBAN_STAGES)
+from app.finance_service import SessionFinanceService
+from app.forms import LEAD_SOURCE_CHOICES
+from app.tenancy import TenantService, tenant_context
+
+BENCHMARK_USER = ('benchmark', 'benchmark')
+# Slug do estúdio do usuário de benchmark (o primeiro gerado)
+BENCHMARK_TENANT = 'benchmark'
+
+SESSION_TYPES = [
+    ('Newborn', 'NB', Decimal('1200.00')), ('Gestante', 'GE', Decimal('800.00')),
+    ('Família', 'FA', Decimal('650.00')), ('Smash the Cake', 'SC', Decimal('550.00')),
+    ('Acompanhamento', 'AC', Decimal('450.00')),
+]
+
+FIXED_EXPENSES = [
+    ('Aluguel do estúdio', Decimal('1800.00')), ('Internet', Decimal('120.00')),
+    ('Software de edição', Decimal('89.90')), ('Energia', Decimal('260.00')),
+]
+
+INSTALLMENT_PURCHASES = [
+    ('Lente 85mm', Decimal('320.00'), 10), ('Flash de estúdio', Decimal('180.00'), 6),
+    ('Cenário', Decimal('95.00'), 4),
+]
+
+LEAD_SOURCES = [value for value, _ in LEAD_SOURCE_CHOICES if value]
+CHANNELS = ['WhatsApp', 'Ligação', 'Email', 'Reunião Presencial']
+TAGS = ['vip', 'recorrente', 'indicou', 'parceria', 'desconto']
+
+def session_form(**values):
+    """Imita um SessionForm: cada campo expõe `.data`."""
+    return SimpleNamespace(**{name: SimpleNamespace(data=value) for name, value in values.items()})
+
+def _status_for(day, today):
+    return 'efetivado' if day <= today else 'previsto'
+
+def generate(clients=200, sessions_per_type=150, years=3, seed=42, batch_size=200, tenants=1, overwrite=False):
+    """
+    Recria as tabelas e gera a base: `tenants` estúdios com o mesmo volume, o primeiro com o usuário de benchmark.
+    Recusa (ValueError) um banco que já tenha tabelas, a menos que overwrite=True: drop_all apagaria tudo.
+    Retorna um resumo com as contagens geradas (do estúdio de benchmark).
+    """
+    existing = sa.inspect(db.engine).get_table_names()
+    if existing and not overwrite:
+        raise ValueError(f'O banco {db.engine.url.database} já tem tabelas ({len(existing)}); '
+                         f'use overwrite=True para apagá-lo')
+    db.drop_all()
+    db.create_all()
+
+    summary = None
+    for n in range(tenants):
+        tenant = TenantService.create('Estúdio Benchmark' if n == 0 else f'Estúdio {n + 1}',
+                                      BENCHMARK_TENANT if n == 0 else f'estudio-{n + 1}')
+        db.session.commit()
+        with tenant_context(tenant.id):
+            counts = _generate_tenant(random.Random(seed + n), clients, sessions_per_type, years, batch_size,
+                                      with_user=n == 0)
+        summary = summary or {**counts, 'tenant_id': tenant.id}
+    summary.update(seed=seed, tenants=tenants)
+    return summary
+
+def _generate_tenant(rng, clients, sessions_per_type, years, batch_size, with_user):
+    """Gera os dados do estúdio atual. Os ensaios ficam espalhados entre `years` anos atrás e três meses à frente."""
+    today = date.today()
+    start = date(today.year - years + 1, 1, 1)
+    span_days = (today + relativedelta(months=3) - start).days
+
+    if with_user:
+        user = User(username=BENCHMARK_USER[0])
+        user.set_password(BENCHMARK_USER[1])
+        db.session.add(user)
+
+    types = [SessionType(name=name, abbreviation=abbr) for name, abbr, _ in SESSION_TYPES]
+    db.session.add_all(types)
+
+    client_rows = []
+    for i in range(clients):
+        client = Client(
+            name=f'Cliente {i:05d}', email=f'cliente{i}@exemplo.com', whatsapp=f'11 9{i:08d}',
+            lead_source=rng.choice(LEAD_SOURCES), tags=','.join(rng.sample(TAGS, rng.randint(0, 2))) or None,
+            address_city='São Paulo', address_state='SP',
+            main_contact_birthday=date(1980 + i % 20, 1 + i % 12, 1 + i % 28),
+        )
+        client_rows.append(client)
+        for _ in range(rng.randint(0, 4)):
+            client.interactions.append(InteractionLog(
+                interaction_date=start + relativedelta(days=rng.randrange(span_days)),
+                channel=rng.choice(CHANNELS), notes='Contato gerado para benchmark'))
+    db.session.add_all(client_rows)
+    db.session.commit()
+
+    # ENSAIOS (livro-caixa pelo serviço de domínio, como na edição)
+    session_count = 0
+    for session_type, (_, abbr, price) in zip(types, SESSION_TYPES):
+        for i in range(sessions_per_type):
+            session_date = start + relativedelta(days=rng.randrange(span_days))
+            stage = KANBAN_STAGES[-1] if session_date < today - relativedelta(months=4) and rng.random() < 0.8 \
+                else rng.choice(KANBAN_STAGES)
+            total_value = price + Decimal(rng.randrange(0, 400))
+            down_payment = (total_value * Decimal('0.3')).quantize(Decimal('0.01'))
+            extra_qty = rng.choice([0, 0, 3, 5, 10])
+            printing_qty = rng.choice([0, 0, 1, 2])
+            session = Session(
+                session_code=f'{abbr}_{session_date:%Y%m%d}_{i:05d}', session_date=session_date,
+                client=rng.choice(client_rows), type=session_type, kanban_status=stage,
+                selection_completed_date=session_date + relativedelta(days=rng.randint(1, 10)) if stage in KANBAN_STAGES[2:] else None,
+                total_value=total_value, down_payment=down_payment, session_cost=Decimal(rng.choice([0, 80, 150])),
+                extra_photos_qty=extra_qty, extra_photo_unit_price=Decimal('25.00'),
+                printing_qty=printing_qty, printing_unit_price=Decimal('40.00'),
+            )
+            db.session.add(session)
+            paid = session_date <= today
+            SessionFinanceService.update_session_financials(session, session_form(
+                session_date=session_date, total_value=total_value, down_payment=down_payment,
+                down_payment_paid=True, total_value_paid=paid and rng.random() < 0.9,
+                extra_photos_qty=extra_qty, extra_photo_unit_price=Decimal('25.00'), extra_photos_paid=paid and extra_qty > 0,
+                printing_qty=printing_qty, printing_unit_price=Decimal('40.00'), printing_paid=paid and printing_qty > 0,
+            ))
+            session_count += 1
+            if session_count % batch_size == 0:
+                db.session.commit()
+    db.session.commit()
+
+    # LANÇAMENTOS MANUAIS: avulsos, séries fixas mensais e compras parceladas
+    manual = []
+    month = start
+    series = 0
+    while month <= today:
+        for _ in range(rng.randint(4, 10)):
+            day = month + relativedelta(days=rng.randrange(28))
+            kind = rng.choice(['entry', 'exit', 'exit'])
+            manual.append(Transaction(
+                description='Venda avulsa' if kind == 'entry' else 'Despesa operacional', transaction_type=kind,
+                value=Decimal(rng.randrange(30, 900)), transaction_date=day, tags='benchmark',
+                status=_status_for(day, today), category='manual'))
+        if month.month == 1:
+            # Uma série fixa de 24 meses para cada despesa, renovada a cada ano
+            for description, value in FIXED_EXPENSES:
+                series += 1
+                for n in range(24):
+                    day = month + relativedelta(months=n, day=5)
+                    manual.append(Transaction(
+                        description=description, transaction_type='exit', value=value, transaction_date=day,
+                        recurrence_id=f'rec-bench-{series}', recurrence_installment='Fixa',
+                        status=_status_for(day, today), category='manual'))
+        if rng.random() < 0.25:
+            description, value, count = rng.choice(INSTALLMENT_PURCHASES)
+            series += 1
+            for n in range(count):
+                day = month + relativedelta(months=n, day=10)
+                label = f'({n + 1}/{count})'
+                manual.append(Transaction(
+                    description=f'{description} {label}', transaction_type='exit', value=value, transaction_date=day,
+                    recurrence_id=f'rec-bench-{series}', recurrence_installment=label,
+                    status=_status_for(day, today), category='manual'))
+        month += relativedelta(months=1)
+    for offset in range(0, len(manual), batch_size * 5):
+        db.session.add_all(manual[offset:offset + batch_size * 5])
+        db.session.commit()
+
+    # METAS
+    for n, (name, target) in enumerate([('Reserva de emergência', 20000), ('Câmera nova', 15000), ('Reforma do estúdio', 30000)]):
+        goal = Goal(name=name, target_value=Decimal(target), target_date=today + relativedelta(years=1))
+        db.session.add(goal)
+        contribution_day = start
+        while contribution_day <= today:
+            goal.contributions.append(GoalContribution(value=Decimal(rng.randrange(100, 800)), contribution_date=contribution_day))
+            contribution_day += relativedelta(months=1 + n)
+    db.session.commit()
+
+    return {
+        'clients': clients,
+        'session_types': len(types),
+        'sessions': session_count,
+        'transactions': db.session.query(Transaction).count(),
+        'recurrence_series': series,
+        'years': years,
+    }
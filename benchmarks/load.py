@@ -0,0 +1,235 @@
+# benchmarks/load.py
+"""
+Teste de carga reprodutível das rotas mais usadas, em processo, pelo test client do Flask.
+
+Gera a base sintética (benchmarks/dataset.py), mede cada rota em sequência (latência, consultas SQL,
+pico de memória alocada) e depois sob concorrência (várias threads, cada uma com seu cliente logado).
+Com --tenants N, a base tem N estúdios do mesmo tamanho e as rotas são medidas no primeiro: comparar
+execuções com N diferentes mostra se a latência por estúdio depende do total da instalação.
+O resultado sai em JSON. Com --baseline, compara com um resultado salvo anteriormente e termina com
+código 1 se alguma rota piorar além da tolerância.
+
+Uso: python -m benchmarks.load [--clients 200] [--sessions-per-type 150] [--years 3]
+                                [--tenants 1] [--requests 30] [--threads 4] [--output resultado.json]
+                                [--database base.db [--reuse | --overwrite]]
+                                [--baseline baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROUTES = [
+    ('sessions.index', '/'),
+    ('sessions.sessoes', '/sessoes'),
+    ('finance.index', '/financeiro/'),
+    ('kanban.index', '/kanban/'),
+    ('crm.index', '/clientes/'),
+    ('crm.client_details', '/clientes/{busiest_client}'),
+    ('reports.financial_performance', '/relatorios/financeiro'),
+    ('reports.lead_source_analysis', '/relatorios/leads'),
+    ('reports.profitability_analysis', '/relatorios/lucratividade'),
+    ('reports.cohort_analysis', '/relatorios/coortes'),
+    ('reports.pivot', '/relatorios/dinamico'),
+]
+
+def create_benchmark_app(database_path):
+    from app import create_app, OPTIONAL_BLUEPRINTS
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'SECRET_KEY': 'benchmark',
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'RATELIMIT_ENABLED': False,
+        'RATELIMIT_STORAGE_URI': 'memory://',
+        'ENABLED_BLUEPRINTS': OPTIONAL_BLUEPRINTS,
+        'PERF_INSTRUMENTATION': True,
+        'PERF_SERVER_TIMING': False,
+        'METRICS_ENABLED': False,
+        # Mede o trabalho real das views (sem 304/HTML em cache nem resultados de relatório guardados no worker)
+        'HTTP_CACHE_ENABLED': False,
+        'PROFITABILITY_CACHE_ENTRIES': 0,
+        'COHORT_REPORT_CACHE_ENTRIES': 0,
+    })
+
+def logged_client(app):
+    from benchmarks.dataset import BENCHMARK_USER
+    client = app.test_client()
+    response = client.post('/auth/login', data={'username': BENCHMARK_USER[0], 'password': BENCHMARK_USER[1]})
+    if response.status_code != 302:
+        raise RuntimeError('Falha no login do usuário de benchmark')
+    return client
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies_ms):
+    values = sorted(latencies_ms)
+    return {
+        'p50_ms': round(percentile(values, 0.50), 2),
+        'p95_ms': round(percentile(values, 0.95), 2),
+        'p99_ms': round(percentile(values, 0.99), 2),
+        'mean_ms': round(statistics.fmean(values), 2),
+    }
+
+def measure_sequential(client, url, requests):
+    """Latências e consultas por requisição (via instrumentação) e pico de memória de uma requisição."""
+    from app.instrumentation import monitor
+
+    query_counts = []
+    observer = lambda endpoint, status, profile, duration: query_counts.append(profile.query_count)
+    monitor.observers.append(observer)
+    try:
+        client.get(url)  # aquecimento (templates compilados, caches)
+        query_counts.clear()
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} respondeu {response.status_code}')
+    finally:
+        monitor.observers.remove(observer)
+
+    tracemalloc.start()
+    client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = summarize(latencies)
+    result.update(queries=max(query_counts), peak_kib=round(peak / 1024, 1))
+    return result
+
+def measure_concurrent(app, url, requests, threads):
+    """Dispara `requests` requisições por thread, com `threads` clientes logados em paralelo."""
+    clients = [logged_client(app) for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def worker(client):
+        barrier.wait()
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = [value for chunk in executor.map(worker, clients) for value in chunk]
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies)
+    result['throughput_rps'] = round(len(latencies) / elapsed, 1)
+    return result
+
+def run(args):
+    from app import db
+    from benchmarks.dataset import BENCHMARK_TENANT, generate
+    from app.models import Client, Session
+    from app.tenancy import TenantService, tenant_context
+    import sqlalchemy as sa
+
+    database_path = args.database or os.path.join(tempfile.mkdtemp(prefix='phatos-load-'), 'load.db')
+    app = create_benchmark_app(database_path)
+
+    with app.app_context():
+        started = time.perf_counter()
+        if args.reuse and os.path.exists(database_path):
+            dataset = {'reused': database_path}
+        else:
+            dataset = generate(args.clients, args.sessions_per_type, args.years, args.seed, tenants=args.tenants,
+                               overwrite=args.overwrite)
+        dataset['seed_seconds'] = round(time.perf_counter() - started, 2)
+        with tenant_context(TenantService.resolve(BENCHMARK_TENANT).id):
+            busiest_client = db.session.scalar(
+                sa.select(Client.name).join(Session).group_by(Client.id).order_by(sa.func.count(Session.id).desc()).limit(1))
+        db.session.remove()
+
+    client = logged_client(app)
+    routes = {}
+    for endpoint, url in ROUTES:
+        if endpoint.split('.')[0] not in app.blueprints:
+            continue
+        url = url.format(busiest_client=busiest_client)
+        routes[endpoint] = {
+            'url': url,
+            'sequential': measure_sequential(client, url, args.requests),
+            'concurrent': measure_concurrent(app, url, max(1, args.requests // args.threads), args.threads),
+        }
+        print(f"{endpoint:32} p95 {routes[endpoint]['sequential']['p95_ms']:8.1f} ms | "
+              f"{routes[endpoint]['sequential']['queries']:3} consultas", file=sys.stderr)
+
+    return {
+        'dataset': dataset,
+        'settings': {'requests': args.requests, 'threads': args.threads},
+        'python': sys.version.split()[0],
+        'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'routes': routes,
+    }
+
+def compare(result, baseline, tolerance):
+    """Compara p95 (sequencial) e consultas com o baseline; retorna a lista de regressões."""
+    regressions = []
+    for endpoint, current in result['routes'].items():
+        previous = baseline.get('routes', {}).get(endpoint)
+        if not previous:
+            continue
+        before, after = previous['sequential'], current['sequential']
+        change = (after['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        current['baseline'] = {'p95_ms': before['p95_ms'], 'p95_change': round(change, 3),
+                               'queries': before['queries']}
+        if change > tolerance:
+            regressions.append(f"{endpoint}: p95 {before['p95_ms']} -> {after['p95_ms']} ms ({change:+.0%})")
+        if after['queries'] > before['queries']:
+            regressions.append(f"{endpoint}: consultas {before['queries']} -> {after['queries']}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--sessions-per-type', type=int, default=150)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tenants', type=int, default=1, help='Estúdios na base (as rotas são medidas no primeiro)')
+    parser.add_argument('--requests', type=int, default=30, help='Requisições medidas por rota')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--database', help='Arquivo SQLite a usar (padrão: temporário)')
+    parser.add_argument('--reuse', action='store_true', help='Não regera a base se --database já existir')
+    parser.add_argument('--overwrite', action='store_true', help='Apaga e regera um --database que já existe')
+    parser.add_argument('--output', help='Grava o resultado JSON neste arquivo (padrão: stdout)')
+    parser.add_argument('--baseline', help='Resultado JSON anterior para comparação')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Piora aceitável do p95 (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+    if args.database and os.path.exists(args.database) and not (args.reuse or args.overwrite):
+        parser.error(f'{args.database} já existe: use --reuse para medir sobre ele ou --overwrite para apagá-lo')
+
+    result = run(args)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            regressions = compare(result, json.load(handle), args.tolerance)
+        result['regressions'] = regressions
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+    for regression in regressions:
+        print(f'REGRESSÃO: {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
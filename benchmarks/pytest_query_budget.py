@@ -0,0 +1,158 @@
+# benchmarks/pytest_query_budget.py
+"""
+Plugin do pytest que verifica o orçamento de comandos SQL por rota.
+
+Os orçamentos vêm de duas fontes:
+- anotações nas rotas: @query_budget(8, client_name='{busiest_client}') (app/query_budget.py);
+- o arquivo query_budgets.json, para rotas não anotadas (a anotação prevalece).
+
+Cada rota vira um teste que faz um GET logado sobre uma base semeada por benchmarks/dataset.py
+(tamanho realista por padrão, para que padrões N+1 apareçam) e falha se a requisição executar
+mais comandos SQL que o orçamento, listando as instruções executadas.
+
+Uso:  python -m pytest -p benchmarks.pytest_query_budget query_budgets.json
+      [--query-budget-size 200:150:3]   (clientes : ensaios por tipo : anos)
+
+Para testes escritos à mão, o plugin também oferece as fixtures `budget_app`, `budget_client`,
+`budget_values` e `assert_max_queries`:
+
+    def test_kanban(budget_client, assert_max_queries):
+        with assert_max_queries(3):
+            budget_client.get('/kanban/')
+"""
+import contextlib
+import os
+import tempfile
+import pytest
+
+_STATE_KEY = pytest.StashKey()
+
+def pytest_addoption(parser):
+    group = parser.getgroup('query-budget', 'Orçamento de consultas SQL por rota')
+    group.addoption('--query-budget-size', default='200:150:3',
+                    help='Tamanho da base semeada: clientes:ensaios_por_tipo:anos (padrão 200:150:3)')
+    group.addoption('--query-budget-file', default='query_budgets.json',
+                    help='Nome do arquivo de orçamentos coletado como testes (padrão query_budgets.json)')
+
+class BudgetState:
+    """App, base semeada e cliente logado, criados uma única vez por execução."""
+
+    def __init__(self, config):
+        self.config = config
+        self._app = None
+        self.values = {}
+
+    @property
+    def app(self):
+        if self._app is None:
+            from benchmarks.load import create_benchmark_app
+            self._app = create_benchmark_app(os.path.join(tempfile.mkdtemp(prefix='phatos-budget-'), 'budget.db'))
+        return self._app
+
+    def seed(self):
+        if self.values:
+            return self.values
+        from app import db
+        from app.models import Client, Session, Goal, Transaction
+        from app.tenancy import tenant_context
+        from benchmarks.dataset import generate
+        import sqlalchemy as sa
+
+        clients, sessions_per_type, years = (int(part) for part in self.config.getoption('query_budget_size').split(':'))
+        with self.app.app_context():
+            dataset = generate(clients, sessions_per_type, years)
+            with tenant_context(dataset['tenant_id']):
+                busiest = db.session.execute(
+                    sa.select(Client.id, Client.name).join(Session).group_by(Client.id)
+                    .order_by(sa.func.count(Session.id).desc()).limit(1)).one()
+                self.values = {
+                    'busiest_client': busiest.name,
+                    'busiest_client_id': busiest.id,
+                    'session_id': db.session.scalar(sa.select(sa.func.min(Session.id))),
+                    'goal_id': db.session.scalar(sa.select(sa.func.min(Goal.id))),
+                    'transaction_id': db.session.scalar(sa.select(sa.func.min(Transaction.id))),
+                }
+            db.session.remove()
+        return self.values
+
+    def client(self):
+        from benchmarks.load import logged_client
+        self.seed()
+        return logged_client(self.app)
+
+    def url_for(self, endpoint, spec):
+        """URL da rota: `url` explícita do arquivo ou url_for com os valores da anotação."""
+        from flask import url_for
+        values = self.seed()
+        if spec.get('url'):
+            return spec['url'].format(**values)
+        url_values = {key: value.format(**values) if isinstance(value, str) else value
+                      for key, value in spec.get('url_values', {}).items()}
+        with self.app.test_request_context():
+            return url_for(endpoint, **url_values)
+
+def _state(config):
+    if _STATE_KEY not in config.stash:
+        config.stash[_STATE_KEY] = BudgetState(config)
+    return config.stash[_STATE_KEY]
+
+@contextlib.contextmanager
+def _assert_max_queries(app, max_queries, label='bloco'):
+    import sqlalchemy as sa
+    from app.query_budget import QueryCounter
+    # Todas as engines: rotas @read_only consultam a engine de leitura, não a principal
+    with QueryCounter(sa.engine.Engine) as counter:
+        yield counter
+    if counter.count > max_queries:
+        pytest.fail(f'{label}: {counter.count} comandos SQL (orçamento {max_queries})\n{counter.report()}', pytrace=False)
+
+# COLETA: o arquivo de orçamentos vira um teste por rota
+def pytest_collect_file(parent, file_path):
+    if file_path.name == parent.config.getoption('query_budget_file'):
+        return BudgetFile.from_parent(parent, path=file_path)
+
+class BudgetFile(pytest.File):
+    def collect(self):
+        from app.query_budget import load_budget_file, route_budgets
+        state = _state(self.config)
+        budgets = load_budget_file(self.path)
+        budgets.update(route_budgets(state.app))
+        for endpoint in sorted(budgets):
+            yield BudgetItem.from_parent(self, name=endpoint, spec=budgets[endpoint])
+
+class BudgetItem(pytest.Item):
+    def __init__(self, *, spec, **kwargs):
+        super().__init__(**kwargs)
+        self.spec = spec
+
+    def runtest(self):
+        state = _state(self.config)
+        client = state.client()
+        url = state.url_for(self.name, self.spec)
+        client.get(url)  # aquecimento: carrega usuário/configuração em cache como numa requisição comum
+        with _assert_max_queries(state.app, self.spec['max_queries'], f'{self.name} ({url})'):
+            response = client.get(url)
+        if response.status_code != 200:
+            pytest.fail(f'{self.name} ({url}) respondeu HTTP {response.status_code}', pytrace=False)
+
+    def reportinfo(self):
+        return self.path, None, f"{self.name}: até {self.spec['max_queries']} consultas"
+
+# FIXTURES
+@pytest.fixture(scope='session')
+def budget_app(pytestconfig):
+    state = _state(pytestconfig)
+    state.seed()
+    return state.app
+
+@pytest.fixture(scope='session')
+def budget_values(pytestconfig):
+    return _state(pytestconfig).seed()
+
+@pytest.fixture
+def budget_client(pytestconfig):
+    return _state(pytestconfig).client()
+
+@pytest.fixture
+def assert_max_queries(budget_app):
+    return lambda max_queries, label='bloco': _assert_max_queries(budget_app, max_queries, label)
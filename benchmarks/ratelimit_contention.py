@@ -0,0 +1,77 @@
+# benchmarks/ratelimit_contention.py
+"""
+Mede o custo por requisição do armazenamento do rate limit sob contenção: vários processos
+(como os workers do gunicorn) incrementam a mesma chave ao mesmo tempo. Ao final confere se
+o contador compartilhado é exato (nenhum incremento perdido).
+
+Uso: python -m benchmarks.ratelimit_contention [--workers 4] [--hits 2000] [--storage sqlite:///arquivo.db]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+KEY = 'benchmark/contention'
+EXPIRY = 3600
+
+def _worker(uri, hits, start, results):
+    from limits.storage import storage_from_string
+    import app.ratelimit_storage  # noqa: F401 (registra o esquema sqlite://)
+
+    storage = storage_from_string(uri)
+    timings = []
+    start.wait()
+    for _ in range(hits):
+        started = time.perf_counter()
+        storage.incr(KEY, EXPIRY)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    results.put(timings)
+
+def measure(uri, workers, hits):
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_worker, args=(uri, hits, start, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    started = time.perf_counter()
+    start.set()
+    timings = []
+    for _ in processes:
+        timings.extend(results.get())
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    return timings, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--hits', type=int, default=2000, help='Incrementos por worker')
+    parser.add_argument('--storage', default=None, help='URI do armazenamento (padrão: SQLite temporário)')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    uri = args.storage or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'ratelimit.db')}"
+
+    from limits.storage import storage_from_string
+    import app.ratelimit_storage  # noqa: F401
+    storage_from_string(uri).clear(KEY)
+
+    timings, elapsed = measure(uri, args.workers, args.hits)
+    timings.sort()
+    expected = args.workers * args.hits
+    counted = storage_from_string(uri).get(KEY)
+
+    print(f"armazenamento: {uri} | {args.workers} workers x {args.hits} incrementos")
+    print(f"por incremento: mediana {statistics.median(timings):.0f} µs | "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.0f} µs | p99 {timings[int(len(timings) * 0.99) - 1]:.0f} µs")
+    print(f"vazão total: {expected / elapsed:,.0f} incrementos/s")
+    print(f"contador: {counted} de {expected} esperados ({'exato' if counted == expected else 'DIVERGENTE'})")
+    return 0 if counted == expected else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
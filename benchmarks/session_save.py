@@ -0,0 +1,116 @@
+# benchmarks/session_save.py
+"""
+Mede quantos salvamentos de ensaio por segundo o SessionFinanceService sustenta.
+
+Cada "salvamento" reproduz o que sessions.edit_session faz: aplica os valores do formulário,
+sincroniza as transações financeiras e faz commit. Os formulários alternam entre cenários
+que criam, atualizam e removem lançamentos, para exercitar todos os caminhos do serviço.
+
+Uso: python -m benchmarks.session_save [--sessions 50] [--rounds 20] [--compare-audit]
+
+--compare-audit roda duas vezes, com e sem a trilha de auditoria (AUDIT_ENABLED), e mostra o custo dela.
+"""
+import argparse
+import sqlalchemy as sa
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+_tmp_dir = tempfile.mkdtemp(prefix='phatos-bench-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}")
+
+from app import create_app, db
+from app.models import Client, Session, SessionType
+from app.tenancy import TenantService, tenant_context
+from app.finance_service import SessionFinanceService
+
+app = create_app()
+
+def _form(**values):
+    """Imita um SessionForm: cada campo expõe `.data`."""
+    return SimpleNamespace(**{name: SimpleNamespace(data=value) for name, value in values.items()})
+
+SCENARIOS = [
+    # Tudo pago: cria entrada, pagamento final, extras e impressões
+    dict(total_value=Decimal('900.00'), down_payment=Decimal('300.00'), down_payment_paid=True, total_value_paid=True,
+         extra_photos_qty=5, extra_photo_unit_price=Decimal('25.00'), extra_photos_paid=True,
+         printing_qty=2, printing_unit_price=Decimal('40.00'), printing_paid=True),
+    # Valores alterados: apenas atualizações
+    dict(total_value=Decimal('1000.00'), down_payment=Decimal('400.00'), down_payment_paid=True, total_value_paid=True,
+         extra_photos_qty=6, extra_photo_unit_price=Decimal('25.00'), extra_photos_paid=True,
+         printing_qty=3, printing_unit_price=Decimal('40.00'), printing_paid=True),
+    # Desmarcados: remove pagamento final, extras e impressões
+    dict(total_value=Decimal('1000.00'), down_payment=Decimal('400.00'), down_payment_paid=True, total_value_paid=False,
+         extra_photos_qty=0, extra_photo_unit_price=Decimal('25.00'), extra_photos_paid=False,
+         printing_qty=0, printing_unit_price=Decimal('40.00'), printing_paid=False),
+]
+
+def seed(session_count):
+    """Recria as tabelas com um estúdio e `session_count` ensaios. Retorna (estúdio, ids dos ensaios)."""
+    db.drop_all()
+    db.create_all()
+    tenant = TenantService.create('Estúdio Benchmark', 'benchmark')
+    db.session.commit()
+    with tenant_context(tenant.id):
+        session_type = SessionType(name='Newborn', abbreviation='NB')
+        db.session.add(session_type)
+        db.session.flush()
+        ids = []
+        for i in range(session_count):
+            client = Client(name=f'Cliente {i}')
+            db.session.add(client)
+            db.session.flush()
+            session = Session(client_id=client.id, session_type_id=session_type.id, session_date=date(2025, 1, 1 + i % 28),
+                              session_cost=Decimal('120.00'), session_code=f'BENCH_{i}')
+            db.session.add(session)
+            db.session.flush()
+            ids.append(session.id)
+        db.session.commit()
+    return tenant.id, ids
+
+def run(session_count, rounds):
+    with app.app_context():
+        tenant_id, ids = seed(session_count)
+        statements = []
+        sa.event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+        saves = 0
+        started = time.perf_counter()
+        with tenant_context(tenant_id):
+            for round_index in range(rounds):
+                values = SCENARIOS[round_index % len(SCENARIOS)]
+                for session_id in ids:
+                    session = db.session.get(Session, session_id)
+                    form = _form(session_date=session.session_date, **values)
+                    session.total_value = values['total_value']
+                    session.down_payment = values['down_payment']
+                    SessionFinanceService.update_session_financials(session, form)
+                    db.session.commit()
+                    saves += 1
+        elapsed = time.perf_counter() - started
+    return saves, elapsed, len(statements)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--compare-audit', action='store_true', help='Mede o custo da trilha de auditoria.')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for audit in ((False, True) if args.compare_audit else (app.config['AUDIT_ENABLED'],)):
+        app.config['AUDIT_ENABLED'] = audit
+        saves, elapsed, statements = run(args.sessions, args.rounds)
+        results[audit] = elapsed / saves
+        label = f' [auditoria {"ligada" if audit else "desligada"}]' if args.compare_audit else ''
+        print(f'{saves} salvamentos em {elapsed:.2f}s -> {saves / elapsed:.1f} salvamentos/s '
+              f'({statements / saves:.1f} comandos SQL por salvamento){label}')
+    if args.compare_audit:
+        overhead = (results[True] / results[False] - 1) * 100
+        print(f'Custo da auditoria: {(results[True] - results[False]) * 1000:+.3f} ms por salvamento ({overhead:+.1f}%)')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# benchmarks/startup.py
+"""
+Mede o tempo de inicialização da aplicação (import + create_app) em processos novos,
+como acontece no boot de cada worker do gunicorn ou no início da suíte de testes.
+
+Uso: python -m benchmarks.startup [--runs 7] [--blueprints kanban,crm,reports]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SNIPPET = """
+import time
+started = time.perf_counter()
+from app import create_app
+create_app()
+print(time.perf_counter() - started)
+"""
+
+def measure(runs, blueprints):
+    env = dict(os.environ)
+    env.setdefault('SECRET_KEY', 'benchmark')
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'phatos-startup.db')}"
+    env['PHATOS_BLUEPRINTS'] = blueprints
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', SNIPPET], cwd=root, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]) * 1000)
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--blueprints', default='', help='Blueprints opcionais habilitados (PHATOS_BLUEPRINTS)')
+    args = parser.parse_args(argv)
+
+    timings = measure(args.runs, args.blueprints)
+    print(f"blueprints opcionais: {args.blueprints or '(nenhum)'}")
+    print(f"mediana {statistics.median(timings):.1f} ms | mín {min(timings):.1f} ms | máx {max(timings):.1f} ms ({args.runs} execuções)")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# config.py
+import os
+from dotenv import load_dotenv
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+# Carrega variáveis do arquivo .env se existir
+load_dotenv(os.path.join(basedir, '.env'))
+
+def _env_list(name, default=''):
+    """Lê uma lista separada por vírgulas de uma variável de ambiente."""
+    return [item.strip() for item in os.environ.get(name, default).split(',') if item.strip()]
+
+class Config:
+    # CONFIGURAÇÃO DE SEGURANÇA
+    # Tenta pegar do sistema (.env), se não tiver, usa fallback (APENAS PARA DEV)
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:////data/app.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Blueprints opcionais habilitados (config, kanban, goals, crm, reports, api).
+    # Os módulos desabilitados nem chegam a ser importados.
+    # Ex.: PHATOS_BLUEPRINTS="kanban,crm,reports"
+    ENABLED_BLUEPRINTS = _env_list('PHATOS_BLUEPRINTS')
+
+    # Flask-Migrate (e o Alembic) só são carregados quando necessários.
+    # None = automático: apenas quando a aplicação é criada pelo comando `flask` (ex.: flask db upgrade).
+    ENABLE_MIGRATIONS = None
+
+    # Armazenamento dos contadores do Flask-Limiter, compartilhado entre os workers do gunicorn.
+    # "sqlite:///<arquivo>" usa app/ratelimit_storage.py; também aceita "redis://..." ou "memory://" (dev/testes).
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'sqlite:////data/ratelimit.db')
+
+    # Instrumentação por requisição (app/instrumentation.py): Server-Timing, janela de latência
+    # por endpoint e log de consultas lentas. Barata o bastante para ficar ligada em produção.
+    PERF_INSTRUMENTATION = os.environ.get('PERF_INSTRUMENTATION', '1').lower() not in ('0', 'false', 'no', '')
+    PERF_SLOW_QUERY_MS = int(os.environ.get('PERF_SLOW_QUERY_MS', 100))
+    PERF_HISTORY_SIZE = 500
+    PERF_SERVER_TIMING = True
+    # Usuários (separados por vírgula) que podem ver e zerar /monitoramento/desempenho: os números são do
+    # worker inteiro, somando todos os estúdios. Vazio = rota fechada (404).
+    PERF_OPERATORS = {name.strip() for name in os.environ.get('PERF_OPERATORS', '').split(',') if name.strip()}
+
+    # Cache HTTP por rota (app/http_cache.py): ETag a partir das versões das tabelas + 304 antes de consultar,
+    # e HTML renderizado guardado por worker (até HTTP_CACHE_FRAGMENT_ENTRIES páginas).
+    # HTTP_CACHE_VERSION_TTL > 0 reaproveita as versões lidas por alguns segundos (evita até a consulta de versão,
+    # ao custo de só perceber commits de outros workers depois desse intervalo).
+    HTTP_CACHE_ENABLED = True
+    HTTP_CACHE_FRAGMENTS = True
+    HTTP_CACHE_FRAGMENT_ENTRIES = 128
+    HTTP_CACHE_VERSION_TTL = float(os.environ.get('HTTP_CACHE_VERSION_TTL', 0))
+
+    # Compressão das respostas (gzip, ou brotli se o pacote estiver instalado) a partir de COMPRESS_MIN_SIZE bytes.
+    # Os estáticos versionados e pré-comprimidos são gerados com `flask assets-build` (app/static/dist).
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+
+    # Exportador Prometheus em /metrics (requer PERF_INSTRUMENTATION). Fica fechado (404) até METRICS_TOKEN
+    # ser definido; o coletor então envia "Authorization: Bearer <token>". Para somar os workers do gunicorn,
+    # defina a variável de ambiente PROMETHEUS_MULTIPROC_DIR (veja gunicorn.conf.py).
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no', '')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Retrato RFM/LTV dos clientes (app/client_analytics.py): reconstruído na abertura do CRM quando
+    # ensaios, lançamentos ou clientes mudaram. Desligado, só pelo botão do CRM ou `flask clients-analytics`.
+    CLIENT_ANALYTICS_AUTO_REFRESH = True
+
+    # Leituras de relatórios e exportações (rotas @read_only, app/read_routing.py) em engine separada:
+    # 'auto' = READ_REPLICA_URI se definido, senão conexões somente leitura no mesmo arquivo SQLite (WAL).
+    # 'snapshot' lê uma cópia feita pela API de backup, renovada a cada READ_SNAPSHOT_MAX_AGE segundos.
+    READ_ROUTING_MODE = os.environ.get('READ_ROUTING_MODE', 'auto')
+    READ_REPLICA_URI = os.environ.get('READ_REPLICA_URI')
+    READ_SNAPSHOT_PATH = os.environ.get('READ_SNAPSHOT_PATH')
+    READ_SNAPSHOT_MAX_AGE = float(os.environ.get('READ_SNAPSHOT_MAX_AGE', 300))
+    READ_SNAPSHOT_PAGES_PER_STEP = 256
+    # Conexões SQLite do banco principal: WAL (leitores e escritor não se bloqueiam) e espera por lock
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', '1').lower() not in ('0', 'false', 'no', '')
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+
+    # Backups online (app/backup.py, `flask backup ...`): cópia pela API de backup do SQLite sem parar escritores,
+    # gzip, integrity_check e SHA-256. BACKUP_INTERVAL_MINUTES é o intervalo do `flask backup schedule` (processo próprio).
+    # Retenção: o mais recente de cada hora/dia/mês dentro das janelas abaixo (com rótulo: a janela diária inteira).
+    BACKUP_DIR = os.environ.get('BACKUP_DIR')  # padrão: <diretório do banco>/backups
+    BACKUP_INTERVAL_MINUTES = int(os.environ.get('BACKUP_INTERVAL_MINUTES', 60))
+    BACKUP_PAGES_PER_STEP = 256
+    BACKUP_COMPRESS_LEVEL = 6
+    BACKUP_KEEP_HOURLY = int(os.environ.get('BACKUP_KEEP_HOURLY', 48))
+    BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', 30))
+    BACKUP_KEEP_MONTHLY = int(os.environ.get('BACKUP_KEEP_MONTHLY', 12))
+
+    # Relatório de coortes (app/cohort_report.py): 'auto' usa funções de janela quando o SQLite as suporta
+    # (3.25+) e o cálculo em Python caso contrário; 'sql'/'python' forçam um dos caminhos.
+    COHORT_REPORT_ENGINE = os.environ.get('COHORT_REPORT_ENGINE', 'auto')
+    COHORT_REPORT_CACHE_ENTRIES = 32
+
+    # Lucratividade com rateio de custos fixos (app/profitability.py): resultados guardados por worker,
+    # por período e base de rateio, enquanto ensaios e lançamentos não mudarem.
+    PROFITABILITY_CACHE_ENTRIES = 32
+
+    # API JSON (/api/v1, blueprint opcional "api"): além da sessão logada, aceita
+    # "Authorization: Bearer <API_TOKEN>" para integrações.
+    API_TOKEN = os.environ.get('API_TOKEN')
+    # Estúdio (id ou slug) acessado com o API_TOKEN
+    API_TENANT = os.environ.get('API_TENANT', '1')
+
+    # Trilha de auditoria de ensaios, lançamentos e metas (app/audit.py, /auditoria)
+    AUDIT_ENABLED = os.environ.get('AUDIT_ENABLED', '1').lower() not in ('0', 'false', 'no', '')
+
+    # Arquivo e lixeira (app/archive.py, `flask archive`): anos fechados mantidos na tabela quente além
+    # do atual, e dias na lixeira antes do `flask archive purge`
+    ARCHIVE_KEEP_YEARS = int(os.environ.get('ARCHIVE_KEEP_YEARS', 1))
+    ARCHIVE_TRASH_DAYS = int(os.environ.get('ARCHIVE_TRASH_DAYS', 30))
+
+    # Canal SSE (app/blueprints/events.py)
+    SSE_POLL_INTERVAL = 2
+    SSE_HEARTBEAT_INTERVAL = 15
+    SSE_MAX_DURATION = 300
+    # Streams simultâneos por processo; deve ficar abaixo de GUNICORN_THREADS (gunicorn.conf.py)
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 8))
@@ -3,17 +3,41 @@ import os
 # Lista exata de arquivos baseada na nova arquitetura PhatosApp (v2.0)
 files_to_read = [
     'run.py',
+    'config.py',
+    'app/archive.py',
+    'app/assets.py',
+    'app/audit.py',
+    'app/backup.py',
+    'app/change_events.py',
+    'app/client_analytics.py',
+    'app/cohort_report.py',
     'app/fields.py',
     'app/finance_service.py',
+    'app/http_cache.py',
+    'app/instrumentation.py',
+    'app/ledger_service.py',
+    'app/ratelimit_storage.py',
+    'app/read_routing.py',
+    'app/query_budget.py',
+    'app/session_service.py',
+    'app/tenancy.py',
+    'app/goal_service.py',
     'app/forms.py',
+    'app/metrics.py',
+    'app/pivot.py',
+    'app/profitability.py',
     'app/models.py',
     'app/__init__.py',
+    'app/blueprints/api.py',
+    'app/blueprints/audit.py',
     'app/blueprints/auth.py',
     'app/blueprints/config.py',
     'app/blueprints/crm.py',
+    'app/blueprints/events.py',
     'app/blueprints/finance.py',
     'app/blueprints/goals.py',
     'app/blueprints/kanban.py',
+    'app/blueprints/monitoring.py',
     'app/blueprints/reports.py',
     'app/blueprints/sessions.py',
     'app/static/css/custom.css',
@@ -23,6 +47,7 @@ files_to_read = [
     'app/templates/add_edit_session_type.html',
     'app/templates/add_session.html',
     'app/templates/add_transaction.html',
+    'app/templates/audit_history.html',
     'app/templates/base.html',
     'app/templates/clients.html',
     'app/templates/client_details.html',
@@ -32,6 +57,8 @@ files_to_read = [
     'app/templates/goal_details.html',
     'app/templates/index.html',
     'app/templates/kanban.html',
+    'app/templates/kanban_card.html',
+    'app/templates/lixeira.html',
     'app/templates/login.html',
     'app/templates/metas.html',
     'app/templates/pricing.html',
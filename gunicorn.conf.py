@@ -0,0 +1,25 @@
+# gunicorn.conf.py
+# Carregado automaticamente pelo gunicorn (diretório de trabalho). Mantém o diretório de métricas
+# do Prometheus (PROMETHEUS_MULTIPROC_DIR) consistente entre os workers. Os backups agendados rodam
+# fora do gunicorn, em processo próprio (`flask backup schedule`, ver app/backup.py).
+import os
+import shutil
+
+# Obrigatório: o canal SSE (/eventos/stream) mantém a requisição aberta por até SSE_MAX_DURATION.
+# Com workers gthread cada stream ocupa só uma thread e o worker continua respondendo ao mestre;
+# com o worker síncrono padrão ele ficaria preso e seria morto após `timeout` segundos.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+def on_starting(server):
+    """Limpa os arquivos de métricas de execuções anteriores antes de subir os workers."""
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+def child_exit(server, worker):
+    """Descarta os valores instantâneos do worker que saiu (contadores e histogramas continuam somados)."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,41 @@
+"""Indice de saldo diario (DailyBalance)
+
+Revision ID: 3f6b2c9d1e47
+Revises: 00a0dda388c8
+Create Date: 2025-11-25 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b2c9d1e47'
+down_revision = '00a0dda388c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_balance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('balance_date', sa.Date(), nullable=False),
+    sa.Column('net_change', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('daily_balance', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_daily_balance_balance_date'), ['balance_date'], unique=True)
+
+    # Popula o índice com o histórico existente (apenas lançamentos efetivados)
+    op.execute(
+        "INSERT INTO daily_balance (balance_date, net_change) "
+        "SELECT transaction_date, SUM(CASE WHEN transaction_type = 'entry' THEN value ELSE -value END) "
+        "FROM \"transaction\" WHERE status = 'efetivado' GROUP BY transaction_date"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('daily_balance', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_daily_balance_balance_date'))
+
+    op.drop_table('daily_balance')
@@ -0,0 +1,38 @@
+"""Total salvo desnormalizado em Goal
+
+Revision ID: 6e2d4b8a1f09
+Revises: d5a8f1c6b372
+Create Date: 2025-12-12 09:41:27.230815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2d4b8a1f09'
+down_revision = 'd5a8f1c6b372'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('saved_total', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False))
+
+    with op.batch_alter_table('goal_contribution', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_goal_contribution_goal_id'), ['goal_id'], unique=False)
+
+    # Popula o total com o histórico existente
+    op.execute(
+        "UPDATE goal SET saved_total = COALESCE("
+        "(SELECT SUM(value) FROM goal_contribution WHERE goal_contribution.goal_id = goal.id), 0)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('goal_contribution', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_goal_contribution_goal_id'))
+
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.drop_column('saved_total')
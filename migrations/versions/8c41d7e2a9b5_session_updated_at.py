@@ -0,0 +1,33 @@
+"""Session.updated_at para sync incremental do Kanban
+
+Revision ID: 8c41d7e2a9b5
+Revises: 3f6b2c9d1e47
+Create Date: 2025-12-02 16:41:08.215733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d7e2a9b5'
+down_revision = '3f6b2c9d1e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE session SET updated_at = CURRENT_TIMESTAMP")
+
+    with op.batch_alter_table('session', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_session_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('session', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_session_updated_at'))
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,89 @@
+"""Arquivo e lixeira: session_archive, transaction_archive e AUTOINCREMENT em session/transaction
+
+Revision ID: a3d7e5b9c281
+Revises: f2c8d4a6b190
+Create Date: 2026-10-19 14:37:05.118264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7e5b9c281'
+down_revision = 'f2c8d4a6b190'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('session_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('session_code', sa.String(length=128), nullable=False),
+    sa.Column('session_date', sa.Date(), nullable=False),
+    sa.Column('selection_completed_date', sa.Date(), nullable=True),
+    sa.Column('total_value', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('down_payment', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('session_cost', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('extra_photos_qty', sa.Integer(), nullable=False),
+    sa.Column('extra_photo_unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('printing_qty', sa.Integer(), nullable=False),
+    sa.Column('printing_unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('kanban_status', sa.String(length=50), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('session_type_id', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('session_archive', schema=None) as batch_op:
+        for column in ('client_id', 'deleted_at', 'session_code', 'session_date', 'session_type_id', 'updated_at'):
+            batch_op.create_index(batch_op.f(f'ix_session_archive_{column}'), [column], unique=False)
+
+    op.create_table('transaction_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('description', sa.String(length=256), nullable=True),
+    sa.Column('transaction_type', sa.String(length=10), nullable=False),
+    sa.Column('value', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('transaction_date', sa.Date(), nullable=False),
+    sa.Column('tags', sa.String(length=256), nullable=True),
+    sa.Column('session_id', sa.Integer(), nullable=True),
+    sa.Column('recurrence_id', sa.String(length=50), nullable=True),
+    sa.Column('recurrence_installment', sa.String(length=20), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('transaction_archive', schema=None) as batch_op:
+        for column in ('category', 'deleted_at', 'recurrence_id', 'session_id', 'transaction_date', 'transaction_type'):
+            batch_op.create_index(batch_op.f(f'ix_transaction_archive_{column}'), [column], unique=False)
+
+    # Ids de linhas arquivadas/na lixeira não podem ser reaproveitados (restauração devolve o id original):
+    # no SQLite isso exige AUTOINCREMENT, só definível recriando a tabela
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ('session', 'transaction'):
+            with op.batch_alter_table(table, schema=None, recreate='always',
+                                      table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+                pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ('session', 'transaction'):
+            with op.batch_alter_table(table, schema=None, recreate='always',
+                                      table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+                pass
+
+    with op.batch_alter_table('transaction_archive', schema=None) as batch_op:
+        for column in ('category', 'deleted_at', 'recurrence_id', 'session_id', 'transaction_date', 'transaction_type'):
+            batch_op.drop_index(batch_op.f(f'ix_transaction_archive_{column}'))
+    op.drop_table('transaction_archive')
+
+    with op.batch_alter_table('session_archive', schema=None) as batch_op:
+        for column in ('client_id', 'deleted_at', 'session_code', 'session_date', 'session_type_id', 'updated_at'):
+            batch_op.drop_index(batch_op.f(f'ix_session_archive_{column}'))
+    op.drop_table('session_archive')
@@ -0,0 +1,30 @@
+"""Contribuição de meta vinculada ao livro-caixa
+
+Revision ID: a93c5e7d2b14
+Revises: 6e2d4b8a1f09
+Create Date: 2025-12-15 14:22:53.906127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93c5e7d2b14'
+down_revision = '6e2d4b8a1f09'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('goal_contribution', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('transaction_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_goal_contribution_transaction_id'), ['transaction_id'], unique=False)
+        batch_op.create_foreign_key('fk_goal_contribution_transaction_id', 'transaction', ['transaction_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('goal_contribution', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_goal_contribution_transaction_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_goal_contribution_transaction_id'))
+        batch_op.drop_column('transaction_id')
@@ -0,0 +1,35 @@
+"""ChangeEvent para o canal SSE
+
+Revision ID: b27e90f4c3d1
+Revises: 8c41d7e2a9b5
+Create Date: 2025-12-05 09:27:44.061392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b27e90f4c3d1'
+down_revision = '8c41d7e2a9b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('event_type', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('change_event', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_change_event_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('change_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_change_event_created_at'))
+
+    op.drop_table('change_event')
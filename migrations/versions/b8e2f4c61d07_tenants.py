@@ -0,0 +1,203 @@
+"""Estúdios (tenant): tenant_id em todas as tabelas e índices compostos começando por ele
+
+Revision ID: b8e2f4c61d07
+Revises: a3d7e5b9c281
+Create Date: 2026-10-19 17:02:44.630918
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2f4c61d07'
+down_revision = 'a3d7e5b9c281'
+branch_labels = None
+depends_on = None
+
+# Os dados existentes passam a pertencer a este estúdio
+DEFAULT_TENANT_ID = 1
+
+# Restrições UNIQUE sem nome das tabelas antigas, nomeadas pela convenção para poderem ser removidas
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+# tabela -> (índices antigos, índices novos, colunas com UNIQUE antigo); índice = (nome, colunas, único)
+TABLES = {
+    'configuration': ([], [('ix_configuration_tenant_key', ['tenant_id', 'key'], True)], ['key']),
+    'user': ([], [('ix_user_tenant_username', ['tenant_id', 'username'], False)], []),
+    'client': (
+        [('ix_client_name', ['name'], True), ('ix_client_email', ['email'], False)],
+        [('ix_client_tenant_name', ['tenant_id', 'name'], True), ('ix_client_tenant_email', ['tenant_id', 'email'], False)],
+        [],
+    ),
+    'session_type': (
+        [],
+        [('ix_session_type_tenant_name', ['tenant_id', 'name'], True),
+         ('ix_session_type_tenant_abbreviation', ['tenant_id', 'abbreviation'], True)],
+        ['name', 'abbreviation'],
+    ),
+    'session': (
+        [('ix_session_session_code', ['session_code'], True), ('ix_session_session_date', ['session_date'], False),
+         ('ix_session_updated_at', ['updated_at'], False)],
+        [('ix_session_tenant_session_code', ['tenant_id', 'session_code'], True),
+         ('ix_session_tenant_session_date', ['tenant_id', 'session_date'], False),
+         ('ix_session_tenant_updated_at', ['tenant_id', 'updated_at'], False)],
+        [],
+    ),
+    'transaction': (
+        [(f'ix_transaction_{column}', [column], False)
+         for column in ('transaction_type', 'transaction_date', 'recurrence_id', 'category')],
+        [(f'ix_transaction_tenant_{column}', ['tenant_id', column], False)
+         for column in ('transaction_type', 'transaction_date', 'recurrence_id', 'category')],
+        [],
+    ),
+    'daily_balance': (
+        [('ix_daily_balance_balance_date', ['balance_date'], True)],
+        [('ix_daily_balance_tenant_balance_date', ['tenant_id', 'balance_date'], True)],
+        [],
+    ),
+    'change_event': ([], [('ix_change_event_tenant_id_id', ['tenant_id', 'id'], False)], []),
+    'audit_log': (
+        [('ix_audit_log_entity', ['entity_type', 'entity_id', 'id'], False),
+         ('ix_audit_log_changed_at', ['changed_at'], False)],
+        [('ix_audit_log_entity', ['tenant_id', 'entity_type', 'entity_id', 'id'], False),
+         ('ix_audit_log_tenant_changed_at', ['tenant_id', 'changed_at'], False)],
+        [],
+    ),
+    'client_metrics': (
+        [('ix_client_metrics_segment', ['segment'], False)],
+        [('ix_client_metrics_tenant_segment', ['tenant_id', 'segment'], False)],
+        [],
+    ),
+    'interaction_log': (
+        [('ix_interaction_log_interaction_date', ['interaction_date'], False)],
+        [('ix_interaction_log_tenant_interaction_date', ['tenant_id', 'interaction_date'], False)],
+        [],
+    ),
+    'goal': ([], [('ix_goal_tenant_status', ['tenant_id', 'status'], False)], []),
+    'goal_contribution': (
+        [('ix_goal_contribution_goal_id', ['goal_id'], False)],
+        [('ix_goal_contribution_tenant_goal_id', ['tenant_id', 'goal_id'], False)],
+        [],
+    ),
+}
+
+# Tabelas de arquivo: sem chave estrangeira, só a coluna e os índices
+ARCHIVE_TABLES = {
+    'session_archive': ('client_id', 'deleted_at', 'session_code', 'session_date', 'session_type_id', 'updated_at'),
+    'transaction_archive': ('category', 'deleted_at', 'recurrence_id', 'session_id', 'transaction_date', 'transaction_type'),
+}
+
+# AUTOINCREMENT (ver a3d7e5b9c281) precisa ser repetido a cada recriação da tabela no SQLite
+AUTOINCREMENT_TABLES = ('session', 'transaction')
+
+AUDIT_OPERATIONS = ('UPDATE', 'DELETE')
+
+
+def _table_kwargs(table):
+    return {'sqlite_autoincrement': True} if table in AUTOINCREMENT_TABLES else {}
+
+
+def _drop_audit_triggers():
+    if op.get_bind().dialect.name == 'sqlite':
+        for operation in AUDIT_OPERATIONS:
+            op.execute(f'DROP TRIGGER IF EXISTS audit_log_no_{operation.lower()}')
+
+
+def _create_audit_triggers():
+    if op.get_bind().dialect.name == 'sqlite':
+        for operation in AUDIT_OPERATIONS:
+            op.execute(
+                f"CREATE TRIGGER audit_log_no_{operation.lower()} BEFORE {operation} ON audit_log "
+                f"BEGIN SELECT RAISE(ABORT, 'audit_log aceita apenas inserções'); END"
+            )
+
+
+def upgrade():
+    tenant = op.create_table('tenant',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=128), nullable=False),
+    sa.Column('slug', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    op.bulk_insert(tenant, [{'id': DEFAULT_TENANT_ID, 'name': 'Estúdio', 'slug': 'estudio', 'created_at': datetime.utcnow()}])
+
+    # A recriação do audit_log (batch) levaria os triggers junto
+    _drop_audit_triggers()
+    for table, (old_indexes, new_indexes, old_unique) in TABLES.items():
+        # 1) coluna preenchida com o estúdio padrão; 2) recriação sem o padrão, com a FK e os índices novos
+        op.add_column(table, sa.Column('tenant_id', sa.Integer(), nullable=False, server_default=str(DEFAULT_TENANT_ID)))
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION,
+                                  table_kwargs=_table_kwargs(table)) as batch_op:
+            batch_op.alter_column('tenant_id', existing_type=sa.Integer(), existing_nullable=False, server_default=None)
+            batch_op.create_foreign_key(f'fk_{table}_tenant_id', 'tenant', ['tenant_id'], ['id'])
+            for column in old_unique:
+                batch_op.drop_constraint(f'uq_{table}_{column}', type_='unique')
+            for name, _, _ in old_indexes:
+                batch_op.drop_index(name)
+            for name, columns, unique in new_indexes:
+                batch_op.create_index(name, columns, unique=unique)
+    _create_audit_triggers()
+
+    # data_version: chave primária passa a ser (estúdio, tabela)
+    op.create_table('_data_version_new',
+    sa.Column('tenant_id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenant.id'], name='fk_data_version_tenant_id'),
+    sa.PrimaryKeyConstraint('tenant_id', 'table_name')
+    )
+    op.execute(f'INSERT INTO _data_version_new (tenant_id, table_name, version) '
+               f'SELECT {DEFAULT_TENANT_ID}, table_name, version FROM data_version')
+    op.drop_table('data_version')
+    op.rename_table('_data_version_new', 'data_version')
+
+    for table, columns in ARCHIVE_TABLES.items():
+        op.add_column(table, sa.Column('tenant_id', sa.Integer(), nullable=False, server_default=str(DEFAULT_TENANT_ID)))
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('tenant_id', existing_type=sa.Integer(), existing_nullable=False, server_default=None)
+            for column in columns:
+                batch_op.drop_index(f'ix_{table}_{column}')
+                batch_op.create_index(f'ix_{table}_tenant_{column}', ['tenant_id', column], unique=False)
+
+
+def downgrade():
+    # Volta a um único estúdio: só os dados do estúdio padrão cabem nas restrições globais antigas
+    for table in (*ARCHIVE_TABLES, 'data_version', *reversed(TABLES)):
+        if table != 'audit_log':
+            op.execute(sa.text(f'DELETE FROM "{table}" WHERE tenant_id != :tenant_id').bindparams(tenant_id=DEFAULT_TENANT_ID))
+
+    for table, columns in ARCHIVE_TABLES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.drop_index(f'ix_{table}_tenant_{column}')
+                batch_op.create_index(f'ix_{table}_{column}', [column], unique=False)
+            batch_op.drop_column('tenant_id')
+
+    op.create_table('_data_version_old',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute('INSERT INTO _data_version_old (table_name, version) SELECT table_name, version FROM data_version')
+    op.drop_table('data_version')
+    op.rename_table('_data_version_old', 'data_version')
+
+    _drop_audit_triggers()
+    for table, (old_indexes, new_indexes, old_unique) in TABLES.items():
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION,
+                                  table_kwargs=_table_kwargs(table)) as batch_op:
+            for name, _, _ in new_indexes:
+                batch_op.drop_index(name)
+            for name, columns, unique in old_indexes:
+                batch_op.create_index(name, columns, unique=unique)
+            for column in old_unique:
+                batch_op.create_unique_constraint(f'uq_{table}_{column}', [column])
+            batch_op.drop_constraint(f'fk_{table}_tenant_id', type_='foreignkey')
+            batch_op.drop_column('tenant_id')
+    _create_audit_triggers()
+
+    op.drop_table('tenant')
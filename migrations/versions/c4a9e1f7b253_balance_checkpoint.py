@@ -0,0 +1,66 @@
+"""BalanceCheckpoint: saldo acumulado no fim de cada mês fechado
+
+Revision ID: c4a9e1f7b253
+Revises: b8e2f4c61d07
+Create Date: 2026-10-20 09:41:18.207551
+
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e1f7b253'
+down_revision = 'b8e2f4c61d07'
+branch_labels = None
+depends_on = None
+
+
+def _month_end(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def upgrade():
+    checkpoint = op.create_table('balance_checkpoint',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('checkpoint_date', sa.Date(), nullable=False),
+    sa.Column('closing_balance', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('tenant_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenant.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('balance_checkpoint', schema=None) as batch_op:
+        batch_op.create_index('ix_balance_checkpoint_tenant_checkpoint_date', ['tenant_id', 'checkpoint_date'], unique=True)
+
+    # Checkpoints dos meses já fechados, a partir do índice diário de cada estúdio
+    daily = sa.table('daily_balance', sa.column('tenant_id', sa.Integer), sa.column('balance_date', sa.Date),
+                     sa.column('net_change', sa.Numeric(12, 2)))
+    last_closed = date.today().replace(day=1) - timedelta(days=1)
+    rows = op.get_bind().execute(
+        sa.select(daily.c.tenant_id, daily.c.balance_date, daily.c.net_change)
+        .where(daily.c.balance_date <= last_closed)
+        .order_by(daily.c.tenant_id, daily.c.balance_date)
+    ).all()
+    checkpoints = []
+    for index, (tenant_id, day, net_change) in enumerate(rows):
+        if index == 0 or rows[index - 1].tenant_id != tenant_id:
+            running, month_end = Decimal('0.00'), _month_end(day)
+        while day > month_end:
+            checkpoints.append({'tenant_id': tenant_id, 'checkpoint_date': month_end, 'closing_balance': running})
+            month_end = _month_end(month_end + timedelta(days=1))
+        running += net_change
+        if index == len(rows) - 1 or rows[index + 1].tenant_id != tenant_id:
+            while month_end <= last_closed:
+                checkpoints.append({'tenant_id': tenant_id, 'checkpoint_date': month_end, 'closing_balance': running})
+                month_end = _month_end(month_end + timedelta(days=1))
+    if checkpoints:
+        op.bulk_insert(checkpoint, checkpoints)
+
+
+def downgrade():
+    with op.batch_alter_table('balance_checkpoint', schema=None) as batch_op:
+        batch_op.drop_index('ix_balance_checkpoint_tenant_checkpoint_date')
+
+    op.drop_table('balance_checkpoint')
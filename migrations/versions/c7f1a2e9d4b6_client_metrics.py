@@ -0,0 +1,44 @@
+"""Retrato RFM/LTV por cliente (ClientMetrics)
+
+Revision ID: c7f1a2e9d4b6
+Revises: a93c5e7d2b14
+Create Date: 2025-12-18 11:05:42.617390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f1a2e9d4b6'
+down_revision = 'a93c5e7d2b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('client_metrics',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('first_session_date', sa.Date(), nullable=True),
+    sa.Column('last_session_date', sa.Date(), nullable=True),
+    sa.Column('frequency', sa.Integer(), nullable=False),
+    sa.Column('monetary', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('lifetime_value', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('r_score', sa.Integer(), nullable=False),
+    sa.Column('f_score', sa.Integer(), nullable=False),
+    sa.Column('m_score', sa.Integer(), nullable=False),
+    sa.Column('segment', sa.String(length=20), nullable=False),
+    sa.Column('source_version', sa.String(length=64), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['client.id'], ),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+    with op.batch_alter_table('client_metrics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_client_metrics_segment'), ['segment'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('client_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_client_metrics_segment'))
+
+    op.drop_table('client_metrics')
@@ -0,0 +1,28 @@
+"""DataVersion para ETags e cache HTTP
+
+Revision ID: d5a8f1c6b372
+Revises: b27e90f4c3d1
+Create Date: 2025-12-09 10:14:08.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a8f1c6b372'
+down_revision = 'b27e90f4c3d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,47 @@
+"""Transaction: um lançamento por categoria gerenciada de cada ensaio (índice único parcial)
+
+Revision ID: d7b3f5a2c816
+Revises: c4a9e1f7b253
+Create Date: 2026-10-20 10:26:53.914402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b3f5a2c816'
+down_revision = 'c4a9e1f7b253'
+branch_labels = None
+depends_on = None
+
+SESSION_LEDGER_CATEGORIES = ('session_down_payment', 'session_settlement', 'session_extra_photos',
+                             'session_printing', 'session_cost')
+
+
+def upgrade():
+    # Duplicatas já gravadas (salvamentos simultâneos) continuam no livro-caixa, mas como lançamentos manuais:
+    # o saldo não muda e o ensaio volta a gerenciar só o primeiro de cada categoria
+    transaction = sa.table('transaction', sa.column('id', sa.Integer), sa.column('tenant_id', sa.Integer),
+                           sa.column('session_id', sa.Integer), sa.column('category', sa.String))
+    first = (
+        sa.select(sa.func.min(transaction.c.id))
+        .where(transaction.c.session_id.isnot(None), transaction.c.category.in_(SESSION_LEDGER_CATEGORIES))
+        .group_by(transaction.c.tenant_id, transaction.c.session_id, transaction.c.category)
+    )
+    op.execute(
+        transaction.update()
+        .where(transaction.c.session_id.isnot(None), transaction.c.category.in_(SESSION_LEDGER_CATEGORIES),
+               transaction.c.id.notin_(first))
+        .values(category='manual')
+    )
+
+    where = sa.column('category').in_(SESSION_LEDGER_CATEGORIES)
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_tenant_session_category', ['tenant_id', 'session_id', 'category'],
+                              unique=True, sqlite_where=where, postgresql_where=where)
+
+
+def downgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_tenant_session_category')
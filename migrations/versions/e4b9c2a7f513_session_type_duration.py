@@ -0,0 +1,26 @@
+"""Duração estimada por tipo de ensaio (rateio de custos fixos)
+
+Revision ID: e4b9c2a7f513
+Revises: c7f1a2e9d4b6
+Create Date: 2026-01-08 10:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9c2a7f513'
+down_revision = 'c7f1a2e9d4b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('session_type', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duration_hours', sa.Numeric(precision=5, scale=1), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('session_type', schema=None) as batch_op:
+        batch_op.drop_column('duration_hours')
@@ -0,0 +1,53 @@
+"""AuditLog: trilha de auditoria somente de inserção
+
+Revision ID: f2c8d4a6b190
+Revises: e4b9c2a7f513
+Create Date: 2026-10-19 09:12:31.482907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8d4a6b190'
+down_revision = 'e4b9c2a7f513'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('audit_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.Column('changeset', sa.String(length=32), nullable=False),
+    sa.Column('entity_type', sa.String(length=32), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=10), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('origin', sa.String(length=64), nullable=True),
+    sa.Column('changes', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_audit_log_changed_at'), ['changed_at'], unique=False)
+        batch_op.create_index('ix_audit_log_entity', ['entity_type', 'entity_id', 'id'], unique=False)
+
+    # Somente inserção: o próprio banco recusa UPDATE e DELETE na trilha
+    if op.get_bind().dialect.name == 'sqlite':
+        for operation in ('UPDATE', 'DELETE'):
+            op.execute(
+                f"CREATE TRIGGER audit_log_no_{operation.lower()} BEFORE {operation} ON audit_log "
+                f"BEGIN SELECT RAISE(ABORT, 'audit_log aceita apenas inserções'); END"
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS audit_log_no_update')
+        op.execute('DROP TRIGGER IF EXISTS audit_log_no_delete')
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_log_entity')
+        batch_op.drop_index(batch_op.f('ix_audit_log_changed_at'))
+
+    op.drop_table('audit_log')
@@ -1,5 +1,7 @@
 # Este arquivo é o ponto de entrada da nossa aplicação.
-from app import app
+from app import create_app
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file